@@ -0,0 +1,332 @@
+"""
+Benchmark suite of duck
+
+Generates a synthetic repository with a configurable number of files, file size,
+history depth and edit pattern, then times the commands of duck and its core
+functions `getFileChangeLog` and `applyCommitToFile` and prints the wall time,
+peak RSS and throughput of each as JSON. Every measurement runs in its own
+process, so results of different versions of duck can be compared with
+`--baseline`.
+
+    python benchmarks/bench.py [--files N] [--file-size BYTES] [--depth N]
+                               [--edit-pattern PATTERN] [--runs N]
+                               [--output FILE] [--baseline FILE]
+"""
+
+from json import dumps, load, loads
+from os import makedirs, wait4, WEXITSTATUS
+from os.path import join, dirname, getsize, realpath
+from random import Random
+from shutil import copytree, rmtree
+from statistics import median
+from string import ascii_letters, digits
+from subprocess import Popen, run, DEVNULL, PIPE
+from tempfile import TemporaryDirectory
+from time import perf_counter
+import argparse
+import platform
+import sys
+
+ROOT = dirname(dirname(realpath(__file__)))
+DUCK = join(ROOT, "duck.py")
+EDIT_PATTERNS = ["append", "insert", "modify", "delete", "mixed"]
+FILES_PER_DIRECTORY = 100
+HOT_FILE = join("dir-0", "file-0.txt")
+ALPHABET = ascii_letters + digits + "     "
+
+
+def measure(command: list) -> dict:
+    """
+    Runs `command` and returns its wall time, peak RSS and standard output
+
+    PARAMETERS
+    ----------
+    - command : list[str]
+        - program and arguments to run
+
+    RETURNS
+    -------
+    - measurement : dict
+        - `seconds`, `peakRssKiB` and `stdout` of the process
+    """
+
+    start = perf_counter()
+    process = Popen(command, stdout=PIPE, stderr=PIPE, text=True)
+    stdout, stderr = process.stdout.read(), process.stderr.read()
+    # wait4 reports the resource usage of this process alone, unlike
+    # getrusage(RUSAGE_CHILDREN) which keeps the maximum of all the children
+    _, status, usage = wait4(process.pid, 0)
+    seconds = perf_counter() - start
+    process.returncode = WEXITSTATUS(status)
+    if process.returncode != 0:
+        sys.exit(f"{' '.join(command)} failed\n{stdout}{stderr}")
+    return {"seconds": seconds, "peakRssKiB": usage.ru_maxrss, "stdout": stdout}
+
+
+def duck(*args: str, path: str) -> dict:
+    """
+    Runs duck with `args` in the repository at `path` and returns its measurement
+    """
+
+    return measure([sys.executable, DUCK, *args, "--path", path])
+
+
+def randomLine(rng: Random) -> str:
+    return "".join(rng.choices(ALPHABET, k=rng.randint(10, 70))) + "\n"
+
+
+def generateTree(path: str, files: int, fileSize: int, rng: Random) -> list:
+    """
+    Writes `files` text files of about `fileSize` bytes each under `path`
+
+    RETURNS
+    -------
+    - filenames : list[str]
+        - relative paths of the written files
+    """
+
+    filenames = []
+    for i in range(files):
+        filename = join(f"dir-{i // FILES_PER_DIRECTORY}", f"file-{i}.txt")
+        makedirs(join(path, dirname(filename)), exist_ok=True)
+        lines, size = [], 0
+        while size < fileSize:
+            lines.append(randomLine(rng))
+            size += len(lines[-1])
+        with open(join(path, filename), "w") as file:
+            file.writelines(lines)
+        filenames.append(filename)
+    return filenames
+
+
+def editFile(filePath: str, pattern: str, edits: int, rng: Random) -> None:
+    """
+    Applies `edits` line edits of the kind `pattern` to the file at `filePath`
+    """
+
+    with open(filePath) as file:
+        lines = file.readlines()
+    for _ in range(edits):
+        kind = rng.choice(EDIT_PATTERNS[:-1]) if pattern == "mixed" else pattern
+        if kind == "append" or len(lines) == 0:
+            lines.append(randomLine(rng))
+        elif kind == "insert":
+            lines.insert(rng.randrange(len(lines) + 1), randomLine(rng))
+        elif kind == "modify":
+            lines[rng.randrange(len(lines))] = randomLine(rng)
+        elif kind == "delete":
+            del lines[rng.randrange(len(lines))]
+    with open(filePath, "w") as file:
+        file.writelines(lines)
+
+
+def editTree(path: str, filenames: list, arguments, rng: Random) -> None:
+    """
+    Edits the hot file and a random `--touch` fraction of the other files
+    """
+
+    touched = rng.sample(filenames[1:], int(len(filenames[1:]) * arguments.touch))
+    for filename in [filenames[0]] + touched:
+        editFile(join(path, filename), arguments.edit_pattern, arguments.edits, rng)
+
+
+def treeSize(path: str, filenames: list) -> int:
+    return sum(getsize(join(path, filename)) for filename in filenames)
+
+
+def runFunction(arguments) -> None:
+    """
+    Times a single call of a core function of duck on the hot file of the
+    repository at `--path` and prints its wall time and processed bytes as JSON,
+    or the first and latest commits of the repository for `--function timeline`
+    """
+
+    sys.path.insert(0, ROOT)
+    import duck
+
+    repo = duck.Repository.open(arguments.path)
+    first, head = repo.timeline[0], repo.head
+    if arguments.function == "timeline":
+        print(dumps({"first": first, "head": head}))
+        return
+    if arguments.function == "getFileChangeLog":
+        oldLines = duck.applyCommitToFile(HOT_FILE, first, arguments.path)
+        newLines = duck.applyCommitToFile(HOT_FILE, head, arguments.path)
+        start = perf_counter()
+        duck.getFileChangeLog(oldLines, newLines)
+        seconds = perf_counter() - start
+        size = sum(map(len, oldLines)) + sum(map(len, newLines))
+    else:
+        start = perf_counter()
+        lines = duck.applyCommitToFile(HOT_FILE, head, arguments.path)
+        seconds = perf_counter() - start
+        size = sum(map(len, lines))
+    print(dumps({"seconds": seconds, "bytes": size}))
+
+
+def summarize(measurements: list, size: int) -> dict:
+    """
+    Returns the median and minimum wall time, the maximum peak RSS and the
+    throughput at the median wall time of `measurements` processing `size` bytes
+    """
+
+    seconds = median(m["seconds"] for m in measurements)
+    return {
+        "seconds": seconds,
+        "minSeconds": min(m["seconds"] for m in measurements),
+        "peakRssKiB": max(m["peakRssKiB"] for m in measurements),
+        "bytesPerSecond": size / seconds if seconds > 0 else None,
+    }
+
+
+def benchmark(arguments) -> dict:
+    rng = Random(arguments.seed)
+    initArgs = ["--storage", arguments.storage, "--compression", arguments.compression]
+    results = dict()
+
+    with TemporaryDirectory() as tempDir:
+        tree, repo, scratch = (join(tempDir, name) for name in ["tree", "repo", "run"])
+        filenames = generateTree(tree, arguments.files, arguments.file_size, rng)
+        size = treeSize(tree, filenames)
+
+        def fresh(source: str) -> str:
+            rmtree(scratch, ignore_errors=True)
+            copytree(source, scratch, symlinks=True)
+            return scratch
+
+        runs = range(arguments.runs)
+        results["init"] = summarize(
+            [duck("init", *initArgs, path=fresh(tree)) for _ in runs], size
+        )
+
+        copytree(tree, repo)
+        duck("init", *initArgs, path=repo)
+        for depth in range(arguments.depth):
+            editTree(repo, filenames, arguments, rng)
+            duck("commit", f"commit-{depth}", path=repo)
+
+        # every run commits the same edits on a fresh copy of the repository
+        editSeed = rng.random()
+        measurements = []
+        for _ in runs:
+            editTree(fresh(repo), filenames, arguments, Random(editSeed))
+            measurements.append(duck("commit", "benchmark", path=scratch))
+        results["commit"] = summarize(measurements, treeSize(scratch, filenames))
+
+        results["status"] = summarize(
+            [duck("status", path=repo) for _ in runs], treeSize(repo, filenames)
+        )
+
+        dirty = join(tempDir, "dirty")
+        copytree(repo, dirty, symlinks=True)
+        editTree(dirty, filenames, arguments, Random(editSeed))
+        results["dirtyStatus"] = summarize(
+            [duck("status", path=dirty) for _ in runs], treeSize(dirty, filenames)
+        )
+        hotSize = getsize(join(dirty, HOT_FILE))
+        results["diff"] = summarize(
+            [duck("diff", HOT_FILE, path=dirty) for _ in runs], hotSize
+        )
+        results["log"] = summarize(
+            [duck("log", HOT_FILE, path=repo) for _ in runs], hotSize
+        )
+
+        timeline = loads(
+            measure(
+                [sys.executable, __file__, "--function", "timeline", "--path", repo]
+            )["stdout"]
+        )
+        results["info"] = summarize(
+            [duck("info", timeline["head"], path=repo) for _ in runs], size
+        )
+        first = timeline["first"]
+        results["rollback"] = summarize(
+            [duck("rollback", first, path=fresh(repo)) for _ in runs], size
+        )
+        results["gc"] = summarize(
+            [duck("gc", path=fresh(repo)) for _ in runs], treeSize(repo, filenames)
+        )
+
+        for function in ["getFileChangeLog", "applyCommitToFile"]:
+            measurements = []
+            for _ in runs:
+                measurement = measure(
+                    [sys.executable, __file__, "--function", function]
+                    + ["--path", repo]
+                )
+                measurement.update(loads(measurement["stdout"]))
+                measurements.append(measurement)
+            results[function] = summarize(measurements, measurements[0]["bytes"])
+        rmtree(scratch, ignore_errors=True)
+
+    return {
+        "duck": run(
+            ["git", "-C", ROOT, "describe", "--always", "--dirty"],
+            stdout=PIPE,
+            stderr=DEVNULL,
+            text=True,
+        ).stdout.strip(),
+        "python": platform.python_version(),
+        "parameters": {
+            "files": arguments.files,
+            "fileSize": arguments.file_size,
+            "depth": arguments.depth,
+            "editPattern": arguments.edit_pattern,
+            "edits": arguments.edits,
+            "touch": arguments.touch,
+            "storage": arguments.storage,
+            "compression": arguments.compression,
+            "runs": arguments.runs,
+            "seed": arguments.seed,
+        },
+        "repositoryBytes": size,
+        "results": results,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--file-size", type=int, default=4096, help="bytes per file")
+    parser.add_argument("--depth", type=int, default=20, help="commits of history")
+    parser.add_argument("--edit-pattern", choices=EDIT_PATTERNS, default="mixed")
+    parser.add_argument("--edits", type=int, default=5, help="lines edited per file")
+    parser.add_argument(
+        "--touch", type=float, default=0.1, help="fraction of files edited per commit"
+    )
+    parser.add_argument("--storage", choices=["json", "sqlite"], default="json")
+    parser.add_argument("--compression", default="zlib")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="file the JSON report is written to")
+    parser.add_argument(
+        "--baseline", help="JSON report of an earlier run to compare the results with"
+    )
+    parser.add_argument("--path", help=argparse.SUPPRESS)
+    parser.add_argument("--function", help=argparse.SUPPRESS)
+    arguments = parser.parse_args()
+
+    if arguments.function is not None:
+        runFunction(arguments)
+        return
+
+    report = benchmark(arguments)
+    if arguments.baseline is not None:
+        with open(arguments.baseline) as file:
+            baseline = load(file)["results"]
+        # > 1 is slower than the baseline
+        report["relativeToBaseline"] = {
+            name: result["seconds"] / baseline[name]["seconds"]
+            for name, result in report["results"].items()
+            if name in baseline and baseline[name]["seconds"] > 0
+        }
+
+    if arguments.output is None:
+        print(dumps(report, indent=4))
+    else:
+        with open(arguments.output, "w") as file:
+            file.write(dumps(report, indent=4) + "\n")
+
+
+if __name__ == "__main__":
+    main()
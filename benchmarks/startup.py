@@ -0,0 +1,95 @@
+"""
+Startup benchmark of duck
+
+Times `status` in a clean repository, with and without `--porcelain`, and the
+import time of the modules duck loads, then prints the results as JSON.
+
+    python benchmarks/startup.py [--runs N]
+"""
+
+from json import dumps
+from os.path import join, dirname, realpath
+from statistics import median
+from subprocess import run, DEVNULL, PIPE
+from tempfile import TemporaryDirectory
+from time import perf_counter
+import argparse
+import sys
+
+DUCK = join(dirname(dirname(realpath(__file__))), "duck.py")
+TRACKED_MODULES = ["typer", "rich", "rich.console", "rich.table", "inquirer"]
+
+
+def duck(*args: str, path: str) -> None:
+    """
+    Runs duck with `args` in the repository at `path`
+    """
+
+    run([sys.executable, DUCK, *args, "--path", path], check=True, stdout=DEVNULL)
+
+
+def timeCommand(args: list, path: str, runs: int) -> float:
+    """
+    Returns the median wall time in seconds of running duck with `args`
+    """
+
+    times = []
+    for _ in range(runs):
+        start = perf_counter()
+        duck(*args, path=path)
+        times.append(perf_counter() - start)
+    return median(times)
+
+
+def importTimes(path: str) -> dict:
+    """
+    Returns the cumulative import time in milliseconds of the tracked modules
+    loaded by `status --porcelain` and of all the modules, parsed from
+    `python -X importtime`
+    """
+
+    times = {"total": 0.0}
+    report = run(
+        [sys.executable, "-X", "importtime", DUCK, "--porcelain", "status"]
+        + ["--path", path],
+        check=True,
+        stdout=DEVNULL,
+        stderr=PIPE,
+        text=True,
+    ).stderr
+    for line in report.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, module = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        # nested imports are indented, their time is part of their importer's
+        if not module[1:].startswith(" "):
+            times["total"] += int(cumulative) / 1000
+        if module.strip() in TRACKED_MODULES:
+            times[module.strip()] = int(cumulative) / 1000
+    return times
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=10)
+    arguments = parser.parse_args()
+
+    with TemporaryDirectory() as path:
+        with open(join(path, "file.txt"), "w") as file:
+            file.write("duck\n")
+        duck("init", path=path)
+        result = {
+            "runs": arguments.runs,
+            "statusSeconds": timeCommand(["status"], path, arguments.runs),
+            "porcelainStatusSeconds": timeCommand(
+                ["--porcelain", "status"], path, arguments.runs
+            ),
+            "importMilliseconds": importTimes(path),
+        }
+    print(dumps(result, indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,48 @@
-from json import dump, load
-from shutil import rmtree, copyfile
-from os import getcwd, mkdir, listdir
-from os.path import isfile, join, exists
+from json import dumps, load, loads
+from shutil import rmtree, copyfileobj
+from os import getcwd, mkdir, makedirs, listdir, stat, fstat, replace, remove, getpid
+from os import scandir, rmdir, read as osRead, close as closeFd
+from os import fsync, open as osOpen, close as osClose, O_RDONLY, cpu_count
+from os import link, sendfile
+from os.path import join, exists, realpath, dirname, isfile, basename
+from hashlib import sha256
+from time import perf_counter
+from functools import wraps
+from atexit import register as atExit
 from typer import Typer, Argument, Option
 from typing_extensions import Annotated
 from typing import Optional
-from inquirer import List as inquirerList, prompt as inquirerPrompt
-from rich import print as richPrint
-from rich.console import Console
-from rich.table import Table
-
+from collections import OrderedDict
+from collections.abc import Mapping
+from fnmatch import fnmatchcase
+from array import array
+from bisect import bisect_left, bisect_right
+from io import BytesIO, TextIOWrapper
+from struct import Struct
+from signal import signal, SIGTERM
+from zlib import crc32
+import re
+import sys
 
 LOG_FILE_NAME = "duck.log.json"
+INDEX_FILE_NAME = "index"
+JOURNAL_FILE_NAME = "duck.journal"
+HISTORY_FILE_NAME = "history"
+DATABASE_FILE_NAME = "duck.db"
+CONFIG_FILE_NAME = "duck.config.json"
+IGNORE_FILE_NAME = ".duckignore"
+WATCH_SOCKET_NAME = "watch.sock"
 EXECUTABLE = "python duck.py"
 PATH = getcwd()
 LOG = dict()
+# plain text output without loading rich, set by `--porcelain`
+PORCELAIN = False
+# timings and counters of the running command, set by `--profile`, see `Profile`
+PROFILE = None
+MARKUP_TAG = re.compile(r"\[[a-z#/@][^\[]*?\]")
+# stands in for the `[` of text escaped in porcelain mode until the markup is
+# stripped, see `escapeMarkup`
+PORCELAIN_BRACKET = "\ue000"
 app = Typer(rich_markup_mode="rich")
 
 # log constants
@@ -26,18 +54,290 @@ COMMITS = "commits"
 NEW = "new"
 OLD = "old"
 CHANGES = "changes"
+HASHES = "hashes"
+# `hashes` only lists the files the commit touched, see `Repository.getManifest`
+PARTIAL = "partial"
+BLOBS = "blobs"
+KEYFRAMES = "keyframes"
+CHUNKS = "chunks"
+OBJECTS = "objects"
+PACKS = "packs"
+BLAME = "blame"
 ADD = "add"
 DEL = "del"
 COM = "com"
+HUNKS = "hunks"
 INIT = "commit-init"
 INITIAL_COMMIT = "initial commit"
+SEQUENCE = "sequence"
 
+# journal constants
+OPERATION = "op"
+SHA = "sha"
+COMMIT = "commit"
+ROLLBACK = "rollback"
 
-def getFileChangeLog(
-    oldFileLines: list, newFileLines: list, includeCommon: bool = False
-) -> dict:
+# index constants
+TIMESTAMP = "timestamp"
+SIZE = "size"
+MTIME = "mtime_ns"
+INODE = "inode"
+HASH = "hash"
+REFRESHED = "refreshed"
+HASH_CHUNK_SIZE = 1 << 20
+
+# directories of the objects stored since the last commit record, see `syncObject`
+UNSYNCED_DIRECTORIES = set()
+
+# worker process constants, see `mapInProcesses`
+PARALLEL_MIN_TASKS = 2
+
+# config constants
+KEYFRAME_INTERVAL = "keyframeInterval"
+KEYFRAME_DELTA_SIZE = "keyframeDeltaSize"
+CACHE_SIZE = "cacheSize"
+JOURNAL_COMPACT_EVERY = "journalCompactEvery"
+COMPRESSION = "compression"
+COMPRESSION_LEVEL = "compressionLevel"
+STORAGE = "storage"
+SNAPSHOT = "snapshot"
+CHUNK_THRESHOLD = "chunkThreshold"
+DEFAULT_CONFIG = {
+    # a full snapshot of a file is stored after this many deltas
+    KEYFRAME_INTERVAL: 32,
+    # or once the deltas since the last snapshot add up to this many bytes
+    KEYFRAME_DELTA_SIZE: 1 << 20,
+    # bytes of reconstructed file versions kept in memory
+    CACHE_SIZE: 64 << 20,
+    # journal records after which they are compacted into the log file
+    JOURNAL_COMPACT_EVERY: 256,
+    # codec and level used for stored files and the log file
+    COMPRESSION: "zlib",
+    COMPRESSION_LEVEL: 6,
+    # where the commits are kept, see `Repository` and `SqliteRepository`
+    STORAGE: "json",
+    # how uncompressed objects are written, see `storeObject`
+    SNAPSHOT: "copy",
+    # files at least this many bytes long, or binary, are stored in chunks
+    CHUNK_THRESHOLD: 8 << 20,
+}
+
+# chunking constants, see `getChunkBoundaries`
+CHUNK_MIN_SIZE = 64 << 10
+CHUNK_MAX_SIZE = 1 << 20
+CHUNK_WINDOW = 32
+CHUNK_MASK = (1 << 9) - 1
+CHUNK_ANCHOR = re.compile(rb"[\x00\n]")
+# a NUL byte in the first bytes marks a file as binary, like git does
+BINARY_SNIFF_SIZE = 8000
+
+# snapshot constants
+COPY = "copy"
+REFLINK = "reflink"
+HARDLINK = "hardlink"
+SNAPSHOTS = [COPY, REFLINK, HARDLINK]
+# ioctl(2) request cloning a whole file on btrfs and xfs, see ioctl_ficlone(2)
+FICLONE = 0x40049409
+
+# storage constants
+JSON = "json"
+SQLITE = "sqlite"
+STORAGES = [JSON, SQLITE]
+# kinds of hash manifest of a commit in the database, see `insertCommit`
+NO_MANIFEST, FULL_MANIFEST, PARTIAL_MANIFEST = 0, 1, 2
+DATABASE_SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE commits (
+    position INTEGER PRIMARY KEY,
+    sha TEXT NOT NULL UNIQUE,
+    message TEXT NOT NULL,
+    manifest INTEGER NOT NULL
+);
+CREATE TABLE files (
+    position INTEGER NOT NULL,
+    filename TEXT NOT NULL,
+    change TEXT,
+    hash TEXT,
+    blob TEXT,
+    keyframe INTEGER NOT NULL,
+    delta TEXT,
+    chunks TEXT,
+    PRIMARY KEY (position, filename)
+) WITHOUT ROWID;
+CREATE INDEX filesByName ON files (filename, position);
+"""
+
+# compression constants
+NONE = "none"
+ZLIB = "zlib"
+LZMA = "lzma"
+# stored files are suffixed by the codec they are compressed with
+CODEC_SUFFIXES = {NONE: "", ZLIB: ".gz", LZMA: ".xz"}
+CODEC_IDS = list(CODEC_SUFFIXES)
+# marks an object modified through a hardlink that could not be rebuilt
+LOST_SUFFIX = ".lost"
+GZIP_MAGIC = b"\x1f\x8b"
+XZ_MAGIC = b"\xfd7zXZ\x00"
+
+# fsck constants
+PROBLEM = "problem"
+
+# watch constants
+COMMAND = "command"
+CHANGES_BY_FILE = "changes"
+CHANGE_LOG = "changeLog"
+FILENAME = "file"
+WATCH_TIMEOUT = 5
+WATCH_POLL_INTERVAL = 1.0
+# inotify(7) flags
+IN_MODIFY = 0x2
+IN_ATTRIB = 0x4
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_FROM = 0x40
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_DELETE_SELF = 0x400
+IN_MOVE_SELF = 0x800
+IN_Q_OVERFLOW = 0x4000
+IN_IGNORED = 0x8000
+IN_ONLYDIR = 0x1000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+IN_WATCH_MASK = (
+    IN_MODIFY
+    | IN_ATTRIB
+    | IN_CLOSE_WRITE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE
+    | IN_DELETE_SELF
+    | IN_MOVE_SELF
+    | IN_ONLYDIR
+)
+INOTIFY_EVENT = Struct("iIII")
+
+# pack constants
+PACK_MAGIC = b"DUCKPACK"
+PACK_INDEX_MAGIC = b"DUCKIDX1"
+# sha256, offset and length in the pack, codec id
+PACK_INDEX_ENTRY = Struct(">32sQQB")
+PACK_INDEX_COUNT = Struct(">Q")
+
+
+class DuckError(Exception):
     """
-    Compares old and new file content and spits out the change log
+    Error raised by duck, e.g. for an unknown commit; the commands print its
+    message and exit with status 1 instead of raising it
+    """
+
+
+class NotARepositoryError(DuckError):
+    """
+    Error raised for a path that is not an initialized duck repository, see
+    `openRepository`
+    """
+
+
+class LostObjectError(DuckError):
+    """
+    Error raised for an object modified through a hardlink of the working tree
+    that could not be rebuilt, see `repairLinkedObject`
+    """
+
+
+class Profile:
+    """
+    Wall time spent in each phase of a command and counters of the work it did,
+    collected when `--profile` is given; phases may nest, so the time of a phase
+    includes the phases it calls, and the work of the worker processes started
+    for `--jobs` is only covered by the phases waiting for them
+    """
+
+    def __init__(self) -> None:
+        self.start = perf_counter()
+        # phase -> [calls, seconds]
+        self.phases = dict()
+        self.counters = dict()
+        self.activePhases = set()
+
+    def count(self, counter: str, amount: int = 1) -> None:
+        self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def toDict(self) -> dict:
+        return {
+            "seconds": perf_counter() - self.start,
+            "phases": {
+                phase: {"calls": calls, "seconds": seconds}
+                for phase, (calls, seconds) in self.phases.items()
+            },
+            "counters": self.counters,
+        }
+
+    def report(self) -> None:
+        """
+        Prints the phases, slowest first, and the counters
+        """
+
+        total = perf_counter() - self.start
+        rows = [
+            [phase, str(calls), f"{seconds:.4f}", f"{100 * seconds / total:.1f}%"]
+            for phase, (calls, seconds) in sorted(
+                self.phases.items(), key=lambda item: -item[1][1]
+            )
+        ]
+        printTable(
+            ["phase", "calls", "seconds", "share"],
+            rows + [["[bold]total[/bold]", "", f"{total:.4f}", "100.0%"]],
+        )
+        printTable(
+            ["counter", "value"],
+            [[counter, str(value)] for counter, value in sorted(self.counters.items())],
+        )
+
+
+def profiled(phase: str):
+    """
+    Decorator timing every call of a function as the phase `phase` of the
+    running command, see `Profile`; recursive calls are timed once
+    """
+
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            profile = PROFILE
+            if profile is None or phase in profile.activePhases:
+                return function(*args, **kwargs)
+            profile.activePhases.add(phase)
+            start = perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                profile.activePhases.discard(phase)
+                timing = profile.phases.setdefault(phase, [0, 0.0])
+                timing[0] += 1
+                timing[1] += perf_counter() - start
+
+        return wrapper
+
+    return decorator
+
+
+def profileCount(counter: str, amount: int = 1) -> None:
+    """
+    Adds `amount` to the counter `counter` of the running command, see `Profile`
+    """
+
+    if PROFILE is not None:
+        PROFILE.count(counter, amount)
+
+
+def _lcsMatchingBlocks(oldFileLines: list, newFileLines: list) -> list:
+    """
+    Reference diff engine: finds the longest common subsequence using the
+    classic O(n·m) dynamic programming table
 
     PARAMETERS
     ----------
@@ -45,13 +345,11 @@ def getFileChangeLog(
         - list of '\\n' seperated lines of old file
     - newFileLines : list[str]
         - list of '\\n' seperated lines of updated file
-    - includeCommon : bool
-        - flag for including common lines in change log
 
     RETURNS
     -------
-    - log : dict
-        - dict containing list of new/old lines
+    - blocks : list[tuple[int, int, int]]
+        - ordered list of (oldStart, newStart, length) runs of common lines
     """
 
     lenOld, lenNew = len(oldFileLines), len(newFileLines)
@@ -66,19 +364,396 @@ def getFileChangeLog(
                 else max(dp[i - 1][j], dp[i][j - 1])
             )
 
-    # finding the common lines between both versions of the file
-    common = ["" for _ in range(dp[lenOld][lenNew])]
-    ptrOld, ptrNew, ptrCom = lenOld, lenNew, dp[lenOld][lenNew] - 1
-    while ptrOld > 0 and ptrNew > 0 and ptrCom >= 0:
+    # walking back through the table collecting the matched line pairs
+    pairs = []
+    ptrOld, ptrNew = lenOld, lenNew
+    while ptrOld > 0 and ptrNew > 0:
         if oldFileLines[ptrOld - 1] == newFileLines[ptrNew - 1]:
-            common[ptrCom] = oldFileLines[ptrOld - 1]
+            pairs.append((ptrOld - 1, ptrNew - 1))
             ptrOld -= 1
-            ptrCom -= 1
             ptrNew -= 1
         elif dp[ptrOld - 1][ptrNew] > dp[ptrOld][ptrNew - 1]:
             ptrOld -= 1
         else:
             ptrNew -= 1
+    pairs.reverse()
+
+    blocks = []
+    for oldIndex, newIndex in pairs:
+        _appendMatchingBlock(blocks, oldIndex, newIndex, 1)
+    return blocks
+
+
+def _myersMatchingBlocks(oldFileLines: list, newFileLines: list) -> list:
+    """
+    Default diff engine: Myers' O((N+M)·D) algorithm using the linear space
+    refinement, i.e. recursively splitting the edit graph at the middle snake
+
+    PARAMETERS
+    ----------
+    - oldFileLines : list[str]
+        - list of '\\n' seperated lines of old file
+    - newFileLines : list[str]
+        - list of '\\n' seperated lines of updated file
+
+    RETURNS
+    -------
+    - blocks : list[tuple[int, int, int]]
+        - ordered list of (oldStart, newStart, length) runs of common lines
+    """
+
+    blocks = []
+
+    def findPath(left: int, top: int, right: int, bottom: int) -> None:
+        if left == right or top == bottom:
+            return
+        snake = _myersMiddleSnake(oldFileLines, newFileLines, left, top, right, bottom)
+        (startOld, startNew), (finishOld, finishNew), forward = snake
+        findPath(left, top, startOld, startNew)
+        # the snake is a single edit followed (forward) or preceded (backward)
+        # by a diagonal run of common lines
+        length = min(finishOld - startOld, finishNew - startNew)
+        if forward:
+            _appendMatchingBlock(blocks, finishOld - length, finishNew - length, length)
+        else:
+            _appendMatchingBlock(blocks, startOld, startNew, length)
+        findPath(finishOld, finishNew, right, bottom)
+
+    findPath(0, 0, len(oldFileLines), len(newFileLines))
+    return blocks
+
+
+def _myersMiddleSnake(
+    oldFileLines: list, newFileLines: list, left: int, top: int, right: int, bottom: int
+) -> tuple:
+    """
+    Searches the box `[left, right) x [top, bottom)` of the edit graph from both
+    corners at once and returns the snake where the two searches overlap
+
+    RETURNS
+    -------
+    - snake : tuple[tuple[int, int], tuple[int, int], bool]
+        - start point, finish point and whether it was found by the forward search
+    """
+
+    width, height = right - left, bottom - top
+    delta = width - height
+    odd = delta % 2 != 0
+    limit = (width + height + 1) // 2
+    # only O(D) sized frontiers are kept, negative diagonals wrap around
+    forwardX = [0] * (2 * limit + 1)
+    backwardY = [0] * (2 * limit + 1)
+    forwardX[1] = left
+    backwardY[1] = bottom
+
+    for d in range(limit + 1):
+        # forward search from the top left corner
+        for k in range(d, -d - 1, -2):
+            if k == -d or (k != d and forwardX[k - 1] < forwardX[k + 1]):
+                prevX = x = forwardX[k + 1]
+            else:
+                prevX = forwardX[k - 1]
+                x = prevX + 1
+            y = top + (x - left) - k
+            prevY = y if (d == 0 or x != prevX) else y - 1
+            while x < right and y < bottom and oldFileLines[x] == newFileLines[y]:
+                x += 1
+                y += 1
+            forwardX[k] = x
+            c = k - delta
+            if odd and -(d - 1) <= c <= d - 1 and y >= backwardY[c]:
+                return (prevX, prevY), (x, y), True
+
+        # backward search from the bottom right corner
+        for c in range(d, -d - 1, -2):
+            k = c + delta
+            if c == -d or (c != d and backwardY[c - 1] > backwardY[c + 1]):
+                prevY = y = backwardY[c + 1]
+            else:
+                prevY = backwardY[c - 1]
+                y = prevY - 1
+            x = left + (y - top) + k
+            prevX = x if (d == 0 or y != prevY) else x + 1
+            while x > left and y > top and oldFileLines[x - 1] == newFileLines[y - 1]:
+                x -= 1
+                y -= 1
+            backwardY[c] = y
+            if not odd and -d <= k <= d and x <= forwardX[k]:
+                return (x, y), (prevX, prevY), False
+
+    # unreachable: both searches always meet within `limit` steps
+    raise RuntimeError("middle snake not found")
+
+
+def _appendMatchingBlock(
+    blocks: list, oldStart: int, newStart: int, length: int
+) -> None:
+    """
+    Appends a run of common lines, merging it with the previous run if adjacent
+    """
+
+    if length <= 0:
+        return
+    if blocks:
+        lastOld, lastNew, lastLength = blocks[-1]
+        if lastOld + lastLength == oldStart and lastNew + lastLength == newStart:
+            blocks[-1] = (lastOld, lastNew, lastLength + length)
+            return
+    blocks.append((oldStart, newStart, length))
+
+
+# selectable diff engines; "lcs" is kept as the reference implementation
+DIFF_ALGORITHMS = {
+    "myers": _myersMatchingBlocks,
+    "lcs": _lcsMatchingBlocks,
+}
+DEFAULT_DIFF_ALGORITHM = "myers"
+# unchanged lines shown around each change by `diff --unified`
+DEFAULT_DIFF_CONTEXT = 3
+# lines of `diff` rendered by rich at once
+DIFF_PRINT_BATCH = 1024
+# ANSI colors of the lines of `diff --unified` written to a terminal
+DIFF_COLORS = {"-": "\x1b[31m", "+": "\x1b[32m", "@": "\x1b[36m"}
+ANSI_RESET = "\x1b[0m"
+BLAME_COLOR = "\x1b[33m"
+# signs of the bar printed by `diff --stat`
+DIFF_STAT_WIDTH = 50
+
+
+def getMatchingBlocks(
+    oldFileLines: list, newFileLines: list, algorithm: str = DEFAULT_DIFF_ALGORITHM
+) -> list:
+    """
+    Runs the diff engine `algorithm` on both versions of the file
+
+    The common prefix and suffix are stripped first and the remaining lines are
+    interned into integer ids, so the engine only compares small ints within
+    the changed window.
+
+    RETURNS
+    -------
+    - blocks : list[tuple[int, int, int]]
+        - ordered list of (oldStart, newStart, length) runs of common lines
+    """
+
+    if algorithm not in DIFF_ALGORITHMS:
+        raise ValueError(f"Unknown diff algorithm `{algorithm}`")
+
+    lenOld, lenNew = len(oldFileLines), len(newFileLines)
+    prefix = 0
+    while (
+        prefix < lenOld
+        and prefix < lenNew
+        and oldFileLines[prefix] == newFileLines[prefix]
+    ):
+        prefix += 1
+    suffix = 0
+    while (
+        suffix < lenOld - prefix
+        and suffix < lenNew - prefix
+        and oldFileLines[lenOld - 1 - suffix] == newFileLines[lenNew - 1 - suffix]
+    ):
+        suffix += 1
+
+    lineIds = dict()
+    oldIds = array(
+        "i",
+        (
+            lineIds.setdefault(line, len(lineIds))
+            for line in oldFileLines[prefix : lenOld - suffix]
+        ),
+    )
+    newIds = array(
+        "i",
+        (
+            lineIds.setdefault(line, len(lineIds))
+            for line in newFileLines[prefix : lenNew - suffix]
+        ),
+    )
+
+    blocks = []
+    _appendMatchingBlock(blocks, 0, 0, prefix)
+    if len(oldIds) > 0 and len(newIds) > 0:
+        for oldStart, newStart, length in DIFF_ALGORITHMS[algorithm](oldIds, newIds):
+            _appendMatchingBlock(blocks, oldStart + prefix, newStart + prefix, length)
+    _appendMatchingBlock(blocks, lenOld - suffix, lenNew - suffix, suffix)
+    return blocks
+
+
+@profiled("diff lines")
+def getFileDelta(
+    oldFileLines: list, newFileLines: list, algorithm: str = DEFAULT_DIFF_ALGORITHM
+) -> dict:
+    """
+    Compares old and new file content and spits out the delta stored in the log
+    file, a list of hunks turning the old file into the new one in one pass:
+
+    - positive int `n` : copy the next `n` lines of the old file
+    - negative int `-n` : skip the next `n` lines of the old file
+    - list of str : insert these lines
+
+    PARAMETERS
+    ----------
+    - oldFileLines : list[str]
+        - list of '\\n' seperated lines of old file
+    - newFileLines : list[str]
+        - list of '\\n' seperated lines of updated file
+    - algorithm : str
+        - default = `DEFAULT_DIFF_ALGORITHM`
+        - name of the diff engine in `DIFF_ALGORITHMS`
+
+    RETURNS
+    -------
+    - delta : dict
+        - dict containing the list of hunks
+    """
+
+    profileCount("lines diffed", len(oldFileLines) + len(newFileLines))
+    blocks = getMatchingBlocks(oldFileLines, newFileLines, algorithm)
+    hunks = []
+    ptrOld, ptrNew = 0, 0
+    for oldStart, newStart, length in blocks + [
+        (len(oldFileLines), len(newFileLines), 0)
+    ]:
+        if oldStart > ptrOld:
+            hunks.append(ptrOld - oldStart)
+        if newStart > ptrNew:
+            hunks.append(newFileLines[ptrNew:newStart])
+        if length > 0:
+            hunks.append(length)
+        ptrOld, ptrNew = oldStart + length, newStart + length
+    return {HUNKS: hunks}
+
+
+def applyFileDelta(fileLines: list, fileChangeLog: dict) -> list:
+    """
+    Applies a delta stored in the log file to a version of the file
+
+    PARAMETERS
+    ----------
+    - fileLines : list[str]
+        - list of '\\n' seperated lines of the file before the commit
+    - fileChangeLog : dict
+        - delta made by `getFileDelta`, or an `add`/`del` change log made by
+          `getFileChangeLog` as stored by older versions of duck
+
+    RETURNS
+    -------
+    - fileLines : list[str]
+        - list of '\\n' seperated lines of the file after the commit
+    """
+
+    newFileLines = []
+    if HUNKS in fileChangeLog:
+        position = 0
+        for hunk in fileChangeLog[HUNKS]:
+            if isinstance(hunk, list):
+                newFileLines.extend(hunk)
+            elif hunk > 0:
+                newFileLines.extend(fileLines[position : position + hunk])
+                position += hunk
+            else:
+                position -= hunk
+        return newFileLines
+
+    # compatibility with `add`/`del` change logs, merged in a single pass as well
+    deletedLines = {int(change) for change in fileChangeLog[DEL]}
+    addedLines = {int(change): line for change, line in fileChangeLog[ADD].items()}
+    common = (fileLines[i] for i in range(len(fileLines)) if i not in deletedLines)
+    for i in range(len(fileLines) - len(deletedLines) + len(addedLines)):
+        newFileLines.append(addedLines[i] if i in addedLines else next(common))
+    return newFileLines
+
+
+def getFileDeltaCounts(fileChangeLog: dict) -> tuple:
+    """
+    Returns the number of deleted and added lines of a delta stored in the log
+    file, see `applyFileDelta`
+    """
+
+    if HUNKS not in fileChangeLog:
+        return len(fileChangeLog[DEL]), len(fileChangeLog[ADD])
+    deletedCount, addedCount = 0, 0
+    for hunk in fileChangeLog[HUNKS]:
+        if isinstance(hunk, list):
+            addedCount += len(hunk)
+        elif hunk < 0:
+            deletedCount -= hunk
+    return deletedCount, addedCount
+
+
+def applyProvenanceDelta(provenance: list, fileChangeLog: dict, commitSha: str) -> list:
+    """
+    Applies a delta stored in the log file to the provenance of a version of
+    the file, like `applyFileDelta` does to its lines
+
+    PARAMETERS
+    ----------
+    - provenance : list[str]
+        - sha of the commit that introduced each line of the file before the commit
+    - fileChangeLog : dict
+        - delta made by `getFileDelta` or `getFileChangeLog`, see `applyFileDelta`
+    - commitSha : str
+        - sha of the commit the delta was stored by
+
+    RETURNS
+    -------
+    - provenance : list[str]
+        - sha of the commit that introduced each line of the file after the commit
+    """
+
+    newProvenance = []
+    if HUNKS in fileChangeLog:
+        position = 0
+        for hunk in fileChangeLog[HUNKS]:
+            if isinstance(hunk, list):
+                newProvenance.extend([commitSha] * len(hunk))
+            elif hunk > 0:
+                newProvenance.extend(provenance[position : position + hunk])
+                position += hunk
+            else:
+                position -= hunk
+        return newProvenance
+
+    deletedLines = {int(change) for change in fileChangeLog[DEL]}
+    addedLines = {int(change) for change in fileChangeLog[ADD]}
+    common = (provenance[i] for i in range(len(provenance)) if i not in deletedLines)
+    for i in range(len(provenance) - len(deletedLines) + len(addedLines)):
+        newProvenance.append(commitSha if i in addedLines else next(common))
+    return newProvenance
+
+
+@profiled("diff lines")
+def getFileChangeLog(
+    oldFileLines: list,
+    newFileLines: list,
+    includeCommon: bool = False,
+    algorithm: str = DEFAULT_DIFF_ALGORITHM,
+) -> dict:
+    """
+    Compares old and new file content and spits out the change log
+
+    PARAMETERS
+    ----------
+    - oldFileLines : list[str]
+        - list of '\\n' seperated lines of old file
+    - newFileLines : list[str]
+        - list of '\\n' seperated lines of updated file
+    - includeCommon : bool
+        - flag for including common lines in change log
+    - algorithm : str
+        - default = `DEFAULT_DIFF_ALGORITHM`
+        - name of the diff engine in `DIFF_ALGORITHMS`
+
+    RETURNS
+    -------
+    - log : dict
+        - dict containing list of new/old lines
+    """
+
+    profileCount("lines diffed", len(oldFileLines) + len(newFileLines))
+    blocks = getMatchingBlocks(oldFileLines, newFileLines, algorithm)
+    lenOld, lenNew = len(oldFileLines), len(newFileLines)
 
     # {
     #     "add": {(lineNumber -> line), ...},
@@ -87,38 +762,164 @@ def getFileChangeLog(
     # }
     fileChangeLog = dict()
 
-    if includeCommon:
-        fileChangeLog[COM] = common
-
-    # dict of deleted lines
+    # lines in between two consecutive common runs are either deleted from the
+    # old file or added to the new file
     # {(lineNumber -> line), ...}
-    delLog = dict()
-    ptrCom = 0
-    for i in range(lenOld):
-        if ptrCom == len(common):
+    common, delLog, addLog = [], dict(), dict()
+    ptrOld, ptrNew = 0, 0
+    for oldStart, newStart, length in blocks + [(lenOld, lenNew, 0)]:
+        for i in range(ptrOld, oldStart):
             delLog[i] = oldFileLines[i]
-        elif oldFileLines[i] == common[ptrCom]:
-            ptrCom += 1
-        else:
-            delLog[i] = oldFileLines[i]
-    fileChangeLog[DEL] = delLog
-
-    # dict of newly added lines
-    # {(lineNumber -> line), ...}
-    addLog = dict()
-    ptrCom = 0
-    for i in range(lenNew):
-        if i >= len(common):
-            addLog[i] = newFileLines[i]
-        elif newFileLines[i] == common[ptrCom]:
-            ptrCom += 1
-        else:
+        for i in range(ptrNew, newStart):
             addLog[i] = newFileLines[i]
+        common.extend(oldFileLines[oldStart : oldStart + length])
+        ptrOld, ptrNew = oldStart + length, newStart + length
+
+    if includeCommon:
+        fileChangeLog[COM] = common
+    fileChangeLog[DEL] = delLog
     fileChangeLog[ADD] = addLog
 
     return fileChangeLog
 
 
+def iterChangeLogLines(fileChangeLog: dict):
+    """
+    Yields the lines of a change log made by `getFileChangeLog` with
+    `includeCommon`, in the order `diff` prints them, as `(kind, line)` pairs
+    where kind is 0 for common, 1 for deleted and 2 for added lines
+    """
+
+    common = iter(fileChangeLog[COM])
+    deleted, added = fileChangeLog[DEL], fileChangeLog[ADD]
+    oldLength = len(fileChangeLog[COM]) + len(deleted)
+
+    # the old file is the common lines with the deleted ones at their old line
+    # numbers, the added lines go at their new line numbers in between
+    def oldLines():
+        for i in range(oldLength):
+            yield (1, deleted[i]) if i in deleted else (0, next(common))
+
+    old = oldLines()
+    for position in range(oldLength + len(added)):
+        yield (2, added[position]) if position in added else next(old)
+
+
+def _formatUnifiedRange(start: int, stop: int) -> str:
+    # like `diff -u`, an empty range is given by the line before it
+    length = stop - start
+    if length == 1:
+        return str(start + 1)
+    return f"{start + 1 if length else start},{length}"
+
+
+def getUnifiedDiff(
+    oldFileLines: list,
+    newFileLines: list,
+    context: int = DEFAULT_DIFF_CONTEXT,
+    algorithm: str = DEFAULT_DIFF_ALGORITHM,
+):
+    """
+    Compares old and new file content and yields the hunks of a unified diff
+    one at a time, so the output is never held in memory as a whole
+
+    PARAMETERS
+    ----------
+    - oldFileLines : list[str]
+        - list of '\\n' seperated lines of old file
+    - newFileLines : list[str]
+        - list of '\\n' seperated lines of updated file
+    - context : int
+        - default = `DEFAULT_DIFF_CONTEXT`
+        - number of unchanged lines shown around each change
+    - algorithm : str
+        - default = `DEFAULT_DIFF_ALGORITHM`
+        - name of the diff engine in `DIFF_ALGORITHMS`
+
+    RETURNS
+    -------
+    - hunks : Iterator[list[str]]
+        - lines of each hunk, starting with its `@@ -l,s +l,s @@` header
+    """
+
+    blocks = getMatchingBlocks(oldFileLines, newFileLines, algorithm)
+    lenOld, lenNew = len(oldFileLines), len(newFileLines)
+
+    def opcodes():
+        # (changed, oldStart, oldStop, newStart, newStop) runs covering both files
+        ptrOld, ptrNew = 0, 0
+        for oldStart, newStart, length in blocks + [(lenOld, lenNew, 0)]:
+            if oldStart > ptrOld or newStart > ptrNew:
+                yield (True, ptrOld, oldStart, ptrNew, newStart)
+            if length > 0:
+                yield (False, oldStart, oldStart + length, newStart, newStart + length)
+            ptrOld, ptrNew = oldStart + length, newStart + length
+
+    def formatHunk(group: list) -> list:
+        lines = [
+            f"@@ -{_formatUnifiedRange(group[0][1], group[-1][2])}"
+            f" +{_formatUnifiedRange(group[0][3], group[-1][4])} @@\n"
+        ]
+        for changed, oldStart, oldStop, newStart, newStop in group:
+            if not changed:
+                lines.extend(" " + line for line in oldFileLines[oldStart:oldStop])
+                continue
+            lines.extend("-" + line for line in oldFileLines[oldStart:oldStop])
+            lines.extend("+" + line for line in newFileLines[newStart:newStop])
+        # a last line without a line break
+        for i, line in enumerate(lines):
+            if not line.endswith("\n"):
+                lines[i] = line + "\n\\ No newline at end of file\n"
+        return lines
+
+    # groups changes closer than two contexts apart into one hunk, like
+    # `difflib.SequenceMatcher.get_grouped_opcodes`
+    group = []
+    for changed, oldStart, oldStop, newStart, newStop in opcodes():
+        if not changed:
+            if not group:
+                # the unchanged lines before the first change
+                oldStart = max(oldStart, oldStop - context)
+                newStart = max(newStart, newStop - context)
+            elif oldStop - oldStart > 2 * context:
+                group.append(
+                    (False, oldStart, oldStart + context, newStart, newStart + context)
+                )
+                yield formatHunk(group)
+                group = []
+                oldStart, newStart = oldStop - context, newStop - context
+        group.append((changed, oldStart, oldStop, newStart, newStop))
+    if group and not (len(group) == 1 and not group[0][0]):
+        changed, oldStart, oldStop, newStart, newStop = group[-1]
+        if not changed:
+            group[-1] = (
+                False,
+                oldStart,
+                min(oldStop, oldStart + context),
+                newStart,
+                min(newStop, newStart + context),
+            )
+        yield formatHunk(group)
+
+
+def getDiffStat(
+    oldFileLines: list, newFileLines: list, algorithm: str = DEFAULT_DIFF_ALGORITHM
+) -> tuple:
+    """
+    Counts the deleted and added lines between old and new file content
+    without building a diff
+
+    RETURNS
+    -------
+    - counts : tuple[int, int]
+        - number of deleted and added lines
+    """
+
+    blocks = getMatchingBlocks(oldFileLines, newFileLines, algorithm)
+    commonCount = sum(length for _, _, length in blocks)
+    return len(oldFileLines) - commonCount, len(newFileLines) - commonCount
+
+
 def doesFileExistsInThisCommit(
     filename: str, commitSha: str, duckLogFile: dict
 ) -> bool:
@@ -139,69 +940,4367 @@ def doesFileExistsInThisCommit(
     - flag : bool
         - whether file exists or not
     """
-    return (
-        filename in duckLogFile[COMMITS][commitSha][FILES][CHANGES]
-        or filename in duckLogFile[COMMITS][commitSha][FILES][NEW]
-    )
+    timeline = duckLogFile[TIMELINE]
+    for position in range(timeline.index(commitSha), -1, -1):
+        commitDict = duckLogFile[COMMITS][timeline[position]]
+        commitFiles = commitDict[FILES]
+        if not commitFiles.get(PARTIAL):
+            return filename in getCommitFiles(commitDict)
+        # a partial manifest only tells about the files the commit touched
+        if filename in commitFiles[OLD]:
+            return False
+        if filename in commitFiles[HASHES]:
+            return True
+    return False
 
 
-def applyCommitToFile(filename: str, commitSha: str, path: str = PATH) -> list:
+def getCommitFiles(commitDict: dict) -> set:
     """
-    Returns the version of the file `filename` during the commit `commitSha`
+    Returns the names of all the files present in the directory during a commit
+    with a full hash manifest or none, see `Repository.getCommitFiles` for the
+    commits with a `PARTIAL` one
 
     PARAMETERS
     ----------
-    - filename : str
-        - name of the file
-    - commitSha : str
-        - sha of the commit
-    - path : str
-        - default = `PATH` = `getcwd()`
-        - path the duck repository
+    - commitDict : dict
+        - entry of the commit in the log file `.duck/duck.log.json`
 
     RETURNS
     -------
-    - fileLines : list[str]
-        - list of '\\n' seperated lines of the file `filename`
+    - files : set[str]
+        - names of the files
+    """
+
+    # commits without a hash manifest list every present file in either `new` or `changes`
+    if HASHES in commitDict[FILES]:
+        return set(commitDict[FILES][HASHES])
+    return set(commitDict[FILES][NEW]) | set(commitDict[FILES][CHANGES])
+
+
+def getStoredFileHash(
+    filename: str, commitSha: str, duckLogFile: dict
+) -> Optional[str]:
+    """
+    Returns the hash of the object holding the full copy of the file `filename`
+    stored by the commit `commitSha`, i.e. the commit in which the file was
+    newly added or a keyframe of it was stored
+
+    RETURNS
+    -------
+    - fileHash : str | None
+        - hash of the object, `None` for copies under `.duck/commits` stored by
+          old repositories, see `getStoredFilePath`
+    """
+
+    commitFiles = duckLogFile[COMMITS][commitSha][FILES]
+    if filename in commitFiles.get(HASHES, dict()):
+        return commitFiles[HASHES][filename]
+    return commitFiles.get(BLOBS, dict()).get(filename)
+
+
+def getStoredFilePath(filename: str, commitSha: str, path: str = PATH) -> str:
+    """
+    Returns the path of the full copy of the file `filename` stored under
+    `.duck/commits` by the commit `commitSha` of an old repository, without the
+    codec suffix, see `findStoredFile`
+    """
+
+    return join(path, ".duck", COMMITS, commitSha, filename)
+
+
+def openStoredFile(
+    filename: str, commitSha: str, duckLogFile: dict, path: str = PATH, mode="rb"
+):
+    """
+    Opens the full copy of the file `filename` stored by the commit `commitSha`
+    for reading, decompressing it on the fly
+
+    PARAMETERS
+    ----------
+    - filename : str
+        - name of the file
+    - commitSha : str
+        - sha of the commit
+    - duckLogFile : dict
+        - log file located at `.duck/duck.log.json`
+    - path : str
+        - default = `PATH` = `getcwd()`
+        - path the duck repository
+    - mode : str
+        - "rb" or "rt"
+    """
+
+    fileHash = getStoredFileHash(filename, commitSha, duckLogFile)
+    if fileHash is not None:
+        return openObject(fileHash, path, mode)
+    stored = findStoredFile(getStoredFilePath(filename, commitSha, path))
+    if stored is None:
+        raise FileNotFoundError(getStoredFilePath(filename, commitSha, path))
+    return openCompressed(stored[0], mode, stored[1])
+
+
+def normalizeLegacyCommits(log: dict, path: str = PATH) -> None:
+    """
+    Removes the files without a stored copy from `new` of the commits without
+    a hash manifest, in place
+
+    Old versions of duck appended the changed files of the head to its `new`
+    list on every commit, so such commits list files under `new` whose content
+    is only stored as a delta; they are changed files, their deltas have to be
+    replayed on top of an earlier copy.
+    """
+
+    for commitSha in log[TIMELINE]:
+        commitFiles = log[COMMITS][commitSha][FILES]
+        if HASHES in commitFiles:
+            continue
+        blobs = commitFiles.get(BLOBS, dict())
+        commitFiles[NEW] = [
+            file
+            for file in commitFiles[NEW]
+            if file in blobs
+            or file not in commitFiles[CHANGES]
+            or findStoredFile(getStoredFilePath(file, commitSha, path)) is not None
+        ]
+    return None
+
+
+def getFileChange(filename: str, commitDict: dict) -> Optional[str]:
+    """
+    Returns how the commit `commitDict` touched the file `filename`
+
+    RETURNS
+    -------
+    - change : str | None
+        - "A" if it was newly added, "M" if changed, "D" if deleted and `None`
+          if it was left untouched
+    """
+
+    commitFiles = commitDict[FILES]
+    if filename in commitFiles[NEW]:
+        return "A"
+    if filename in commitFiles[CHANGES] or filename in commitFiles.get(CHUNKS, ()):
+        return "M"
+    if filename in commitFiles[OLD]:
+        return "D"
+    return None
+
+
+def getChangeLogSize(fileChangeLog: dict) -> int:
+    """
+    Returns the number of bytes of lines stored in a delta, see `applyFileDelta`
+    """
+
+    if HUNKS in fileChangeLog:
+        return sum(
+            sum(len(line) for line in hunk) if isinstance(hunk, list) else 1
+            for hunk in fileChangeLog[HUNKS]
+        )
+    return sum(len(line) for line in fileChangeLog[ADD].values()) + sum(
+        len(line) for line in fileChangeLog[DEL].values()
+    )
+
+
+def applyCommitToFile(filename: str, commitSha: str, path: str = PATH) -> list:
+    """
+    Returns the version of the file `filename` during the commit `commitSha`
+
+    PARAMETERS
+    ----------
+    - filename : str
+        - name of the file
+    - commitSha : str
+        - sha of the commit
+    - path : str
+        - default = `PATH` = `getcwd()`
+        - path the duck repository
+
+    RETURNS
+    -------
+    - fileLines : list[str]
+        - list of '\\n' seperated lines of the file `filename`
+    """
+
+    return Repository.open(path).getFile(filename, commitSha)
+
+
+class Repository:
+    """
+    In memory view of the duck repository at `path`; the log file is parsed once
+    per process and reconstructed file versions are kept in a size bounded LRU
+    cache keyed by `(filename, commitSha)`
+
+    The log file `.duck/duck.log.json` is a checkpoint, every later commit and
+    rollback is appended as one record to the journal `.duck/duck.journal` and
+    folded into a new checkpoint every `journalCompactEvery` records.
+
+    Use `Repository.open` to share one instance between all the callers.
+    """
+
+    _openRepositories = dict()
+
+    @profiled("load log")
+    def __init__(self, path: str = PATH) -> None:
+        self.path = path
+        self.duckDirPath = join(path, ".duck")
+        self.logFilePath = join(self.duckDirPath, LOG_FILE_NAME)
+        self.journalFilePath = join(self.duckDirPath, JOURNAL_FILE_NAME)
+        self.historyFilePath = join(self.duckDirPath, HISTORY_FILE_NAME)
+        self.log = readLogFile(self.logFilePath)
+        normalizeLegacyCommits(self.log, path)
+        self.config = loadConfig(path)
+        self._fileCache = OrderedDict()
+        self._fileCacheSize = 0
+        self._journalRecords = 0
+        self._positions = {
+            commitSha: position for position, commitSha in enumerate(self.log[TIMELINE])
+        }
+        self._readHistory()
+        self._replayJournal()
+        if self._history is not None and self._historySequence != self.log.get(
+            SEQUENCE, 0
+        ):
+            self._history = None
+
+    def _replayJournal(self) -> None:
+        """
+        Applies the journal records that are not part of the checkpoint yet
+        """
+
+        try:
+            with open(self.journalFilePath, "rb") as file:
+                journal = file.read()
+        except OSError:
+            return
+        profileCount("bytes read", len(journal))
+
+        validLength = 0
+        for line in journal.splitlines(keepends=True):
+            # a crash during an append leaves a partial last record behind
+            try:
+                record = loads(line)
+            except ValueError:
+                break
+            if not line.endswith(b"\n"):
+                break
+            validLength += len(line)
+            self._journalRecords += 1
+            if record[SEQUENCE] <= self.log.get(SEQUENCE, 0):
+                continue
+            self._applyRecord(record)
+
+        if validLength != len(journal):
+            with open(self.journalFilePath, "r+b") as file:
+                file.truncate(validLength)
+
+    def _applyRecord(self, record: dict) -> None:
+        # the saved history may already include the record, see `_readHistory`
+        updateHistory = (
+            self._history is not None and record[SEQUENCE] > self._historySequence
+        )
+        if record[OPERATION] == COMMIT:
+            self.log[COMMITS][record[SHA]] = record[COMMIT]
+            self.log[TIMELINE].append(record[SHA])
+            self._positions[record[SHA]] = len(self.log[TIMELINE]) - 1
+            if updateHistory:
+                self._addToHistory(len(self.log[TIMELINE]) - 1)
+        else:
+            position = self.getPosition(record[SHA]) + 1
+            for commitSha in self.log[TIMELINE][position:]:
+                del self._positions[commitSha]
+            self.log[TIMELINE] = self.log[TIMELINE][:position]
+            self.log[COMMITS] = {
+                sha: self.log[COMMITS][sha] for sha in self.log[TIMELINE]
+            }
+            if updateHistory:
+                self._truncateHistory(position)
+        if updateHistory:
+            self._historySequence = record[SEQUENCE]
+        self.log[HEAD] = record[SHA]
+        self.log[SEQUENCE] = record[SEQUENCE]
+
+    def _addToHistory(self, position: int) -> None:
+        commitSha = self.log[TIMELINE][position]
+        commitFiles = self.log[COMMITS][commitSha][FILES]
+        touchedFiles = set(commitFiles[NEW]) | set(commitFiles[CHANGES])
+        touchedFiles |= set(commitFiles[OLD]) | set(commitFiles.get(CHUNKS, ()))
+        for file in touchedFiles:
+            self._history.setdefault(file, []).append(position)
+
+    def _truncateHistory(self, position: int) -> None:
+        # forgetting the commits from `position` on, i.e. rolled back
+        for file in list(self._history):
+            history = self._history[file]
+            del history[bisect_left(history, position) :]
+            if not history:
+                del self._history[file]
+
+    def _readHistory(self) -> None:
+        """
+        Reads the history saved at `.duck/history` by `_writeHistory`, unless it
+        is older than the checkpoint; the journal records it does not include
+        are applied to it as they are replayed
+        """
+
+        self._history = None
+        try:
+            with open(self.historyFilePath, "r") as file:
+                saved = load(file)
+        except (OSError, ValueError):
+            return None
+        if saved[SEQUENCE] < self.log.get(SEQUENCE, 0):
+            return None
+        self._history = saved[FILES]
+        self._historySequence = saved[SEQUENCE]
+        return None
+
+    @profiled("write log")
+    def _writeHistory(self) -> None:
+        atomicWrite(
+            self.historyFilePath,
+            dumps({SEQUENCE: self._historySequence, FILES: self._history}).encode(),
+            sync=False,
+        )
+
+    def _loadHistory(self) -> None:
+        """
+        Indexes the timeline positions of the commits touching each file; the
+        index is saved under `.duck/history` with every checkpoint and kept up
+        to date by every later commit and rollback, it is only rebuilt in a
+        single pass over the log if it is missing or stale
+        """
+
+        if self._history is not None:
+            return None
+        self._history = dict()
+        self._historySequence = self.log.get(SEQUENCE, 0)
+        for position in range(len(self.log[TIMELINE])):
+            self._addToHistory(position)
+        self._writeHistory()
+        return None
+
+    def getPosition(self, commitSha: str) -> int:
+        """
+        Returns the position of the commit `commitSha` in the timeline
+        """
+
+        if commitSha not in self._positions:
+            raise ValueError(f"{commitSha} is not in the timeline")
+        return self._positions[commitSha]
+
+    def getFileHistory(self, filename: str) -> list:
+        """
+        Returns the timeline positions of the commits that added, changed or
+        deleted the file `filename`, oldest first
+        """
+
+        self._loadHistory()
+        return self._history.get(filename, [])
+
+    def hasFile(self, filename: str, commitSha: str) -> bool:
+        """
+        Checks whether the file `filename` exists in the commit `commitSha`
+        """
+
+        if commitSha not in self.log[COMMITS]:
+            return False
+        history = self.getFileHistory(filename)
+        touches = bisect_right(history, self.getPosition(commitSha))
+        if touches == 0:
+            return False
+        lastCommit = self.log[COMMITS][self.log[TIMELINE][history[touches - 1]]]
+        return getFileChange(filename, lastCommit) != "D"
+
+    def getFileChunks(self, filename: str, commitSha: str) -> Optional[list]:
+        """
+        Returns the hashes of the chunks of the version of the file `filename`
+        during the commit `commitSha`, see `storeChunks`
+
+        RETURNS
+        -------
+        - chunkHashes : list[str] | None
+            - `None` if that version is stored as lines
+        """
+
+        history = self.getFileHistory(filename)
+        touches = bisect_right(history, self.getPosition(commitSha))
+        if touches == 0:
+            return None
+        lastCommit = self.log[COMMITS][self.log[TIMELINE][history[touches - 1]]]
+        return lastCommit[FILES].get(CHUNKS, dict()).get(filename)
+
+    def getFileDeltaChain(self, filename: str, commitSha: str) -> tuple:
+        """
+        Finds the nearest commit at or before `commitSha` that stores a full copy
+        of the file `filename` (the commit adding it or a keyframe), and the
+        commits whose changes have to be replayed on top of it
+
+        Only the commits touching the file are visited, see `getFileHistory`.
+
+        RETURNS
+        -------
+        - chain : tuple[int, list[int]]
+            - timeline position of the stored copy and timeline positions of the
+              deltas
+        """
+
+        history = self.getFileHistory(filename)
+        deltaCommitIndices = []
+        for touch in range(
+            bisect_right(history, self.getPosition(commitSha)) - 1, -1, -1
+        ):
+            baseIndex = history[touch]
+            commitFiles = self.log[COMMITS][self.log[TIMELINE][baseIndex]][FILES]
+            if filename in commitFiles[NEW] or filename in commitFiles.get(
+                KEYFRAMES, []
+            ):
+                break
+            if filename in commitFiles[CHANGES]:
+                deltaCommitIndices.append(baseIndex)
+        deltaCommitIndices.reverse()
+        return baseIndex, deltaCommitIndices
+
+    @profiled("write log")
+    def _appendRecord(self, record: dict, indent: bool = False) -> None:
+        """
+        Durably appends a record to the journal and applies it, compacting the
+        journal into the checkpoint once it holds `journalCompactEvery` records
+        """
+
+        syncObjectDirectories()
+        record[SEQUENCE] = self.log.get(SEQUENCE, 0) + 1
+        data = dumps(record).encode() + b"\n"
+        profileCount("bytes written", len(data))
+        with open(self.journalFilePath, "ab") as file:
+            file.write(data)
+            file.flush()
+            fsync(file.fileno())
+        self._journalRecords += 1
+        self._applyRecord(record)
+        if self._journalRecords >= self.config[JOURNAL_COMPACT_EVERY]:
+            self.save(indent)
+
+    @classmethod
+    def open(cls, path: str = PATH, reload: bool = False) -> "Repository":
+        """
+        Returns the shared instance of the duck repository at `path`, a
+        `SqliteRepository` if its commits are stored in SQLite
+
+        PARAMETERS
+        ----------
+        - path : str
+            - default = `PATH` = `getcwd()`
+            - path the duck repository
+        - reload : bool
+            - flag for discarding the shared instance and reading the log file again
+        """
+
+        key = realpath(path)
+        if reload or key not in Repository._openRepositories:
+            if loadConfig(path)[STORAGE] == SQLITE:
+                Repository._openRepositories[key] = SqliteRepository(path)
+            else:
+                Repository._openRepositories[key] = Repository(path)
+        return Repository._openRepositories[key]
+
+    @classmethod
+    def create(cls, path: str, log: dict, indent: bool = False) -> "Repository":
+        """
+        Writes the log file, or the database, of a freshly initialized duck
+        repository at `path` and returns its shared instance
+        """
+
+        config = loadConfig(path)
+        syncObjectDirectories()
+        if config[STORAGE] == SQLITE:
+            writeDatabase(log, path)
+        else:
+            atomicWrite(
+                join(path, ".duck", LOG_FILE_NAME), encodeLogFile(log, config, indent)
+            )
+        return cls.open(path, reload=True)
+
+    @property
+    def head(self) -> str:
+        return self.log[HEAD]
+
+    @property
+    def timeline(self) -> list:
+        return self.log[TIMELINE]
+
+    @property
+    def commits(self) -> dict:
+        return self.log[COMMITS]
+
+    @profiled("write log")
+    def save(self, indent: bool = False) -> None:
+        """
+        Compacts the journal, i.e. atomically writes the whole log as a new
+        checkpoint `.duck/duck.log.json` and empties the journal
+        """
+
+        syncObjectDirectories()
+        atomicWrite(self.logFilePath, encodeLogFile(self.log, self.config, indent))
+        if self._history is not None:
+            self._writeHistory()
+        # records already in the checkpoint are skipped by their sequence number,
+        # so a crash before the journal is emptied is harmless
+        atomicWrite(self.journalFilePath, b"")
+        self._journalRecords = 0
+
+    def addCommit(self, commitSha: str, commitDict: dict, indent: bool = False) -> None:
+        """
+        Appends the commit `commitSha` to the timeline and moves the head to it
+        """
+
+        self._appendRecord(
+            {OPERATION: COMMIT, SHA: commitSha, COMMIT: commitDict}, indent
+        )
+
+    def rollbackTo(self, commitSha: str, indent: bool = False) -> list:
+        """
+        Moves the head to the commit `commitSha` and forgets every commit after it
+
+        RETURNS
+        -------
+        - deletedCommits : list[str]
+            - shas of the forgotten commits
+        """
+
+        position = self.getPosition(commitSha) + 1
+        deletedCommits = self.log[TIMELINE][position:]
+        self._appendRecord({OPERATION: ROLLBACK, SHA: commitSha}, indent)
+        self._evictCommits(deletedCommits)
+        return deletedCommits
+
+    def _evictCommits(self, deletedCommits: list) -> None:
+        # commit shas are reused by later commits, their cached versions are stale
+        deleted = set(deletedCommits)
+        for key in [key for key in self._fileCache if key[1] in deleted]:
+            self._fileCacheSize -= self._fileCache.pop(key)[1]
+
+    def exportLog(self) -> dict:
+        """
+        Returns the whole log, in the format of `.duck/duck.log.json`
+        """
+
+        return self.log
+
+    def getFilenames(self) -> list:
+        """
+        Returns the names of all the files ever committed, sorted
+        """
+
+        self._loadHistory()
+        return sorted(self._history)
+
+    def getFileHash(self, filename: str, commitSha: str) -> Optional[str]:
+        """
+        Returns the content hash of the version of the file `filename` during
+        the commit `commitSha`, `None` if no hash manifest records it
+
+        A `PARTIAL` manifest only lists the files the commit touched, the hash
+        of the others is recorded by the latest commit that touched them.
+        """
+
+        commitFiles = self.commits[commitSha][FILES]
+        if filename in commitFiles.get(HASHES, dict()):
+            return commitFiles[HASHES][filename]
+        if not commitFiles.get(PARTIAL):
+            return None
+        history = self.getFileHistory(filename)
+        touches = bisect_right(history, self.getPosition(commitSha))
+        if touches == 0:
+            return None
+        lastCommit = self.log[COMMITS][self.log[TIMELINE][history[touches - 1]]]
+        return lastCommit[FILES].get(HASHES, dict()).get(filename)
+
+    def getCommitFiles(self, commitSha: str) -> set:
+        """
+        Returns the names of all the files present during the commit
+        `commitSha`, see `getCommitFiles`
+        """
+
+        commitDict = self.commits[commitSha]
+        if not commitDict[FILES].get(PARTIAL):
+            return getCommitFiles(commitDict)
+        return {
+            filename
+            for filename in self.getFilenames()
+            if self.hasFile(filename, commitSha)
+        }
+
+    def getManifest(self, commitSha: str) -> dict:
+        """
+        Returns the content hash of every file present during the commit
+        `commitSha` that a hash manifest records, see `getFileHash`
+        """
+
+        commitFiles = self.commits[commitSha][FILES]
+        if not commitFiles.get(PARTIAL):
+            return dict(commitFiles.get(HASHES, dict()))
+        manifest = dict()
+        for filename in self.getCommitFiles(commitSha):
+            fileHash = self.getFileHash(filename, commitSha)
+            if fileHash is not None:
+                manifest[filename] = fileHash
+        return manifest
+
+    def getMessage(self, commitSha: str) -> str:
+        """
+        Returns the message of the commit `commitSha`
+        """
+
+        return self.commits[commitSha][MESSAGE]
+
+    def getFileChange(self, filename: str, commitSha: str) -> Optional[str]:
+        """
+        Returns how the commit `commitSha` touched the file `filename`, see
+        `getFileChange`
+        """
+
+        return getFileChange(filename, self.commits[commitSha])
+
+    def getStoredDelta(self, filename: str, commitSha: str) -> dict:
+        """
+        Returns the delta of the file `filename` stored by the commit `commitSha`,
+        see `applyFileDelta`
+        """
+
+        return self.commits[commitSha][FILES][CHANGES][filename]
+
+    def openStoredFile(self, filename: str, commitSha: str, mode: str = "rb"):
+        """
+        Opens the full copy of the file `filename` stored by the commit
+        `commitSha`, see `openStoredFile`
+        """
+
+        return openStoredFile(filename, commitSha, self.log, self.path, mode)
+
+    def getReferencedHashes(self) -> set:
+        """
+        Returns the hashes of all the objects the commits refer to
+        """
+
+        referencedHashes = set()
+        for commitSha in self.timeline:
+            commitFiles = self.commits[commitSha][FILES]
+            referencedHashes.update(commitFiles.get(HASHES, dict()).values())
+            referencedHashes.update(commitFiles.get(BLOBS, dict()).values())
+            for chunkHashes in commitFiles.get(CHUNKS, dict()).values():
+                referencedHashes.update(chunkHashes)
+        return referencedHashes
+
+    def getStoredHashes(self) -> set:
+        """
+        Returns the hashes of the objects the commits need to restore their
+        files, unlike `getReferencedHashes` without the hashes of the versions
+        stored as deltas
+        """
+
+        storedHashes = set()
+        for commitSha in self.timeline:
+            commitFiles = self.commits[commitSha][FILES]
+            hashes = commitFiles.get(HASHES) or dict()
+            chunks = commitFiles.get(CHUNKS, dict())
+            for filename in commitFiles[NEW] + commitFiles.get(KEYFRAMES, []):
+                if filename in hashes and filename not in chunks:
+                    storedHashes.add(hashes[filename])
+            storedHashes.update(commitFiles.get(BLOBS, dict()).values())
+            for chunkHashes in chunks.values():
+                storedHashes.update(chunkHashes)
+        return storedHashes
+
+    @profiled("replay deltas")
+    def getFile(self, filename: str, commitSha: str) -> list:
+        """
+        Returns the version of the file `filename` during the commit `commitSha`
+
+        PARAMETERS
+        ----------
+        - filename : str
+            - name of the file
+        - commitSha : str
+            - sha of the commit
+
+        RETURNS
+        -------
+        - fileLines : list[str]
+            - list of '\\n' seperated lines of the file `filename`
+        """
+
+        cached = self._getCachedFile(filename, commitSha)
+        if cached is not None:
+            return list(cached)
+
+        if self.getFileChunks(filename, commitSha) is not None:
+            raise DuckError(f"{filename} is a binary or large file stored in chunks")
+        if not self.hasFile(filename, commitSha):
+            raise DuckError(f"{filename} does not exist in commit `{commitSha}`")
+
+        timeline = self.timeline
+        firstCommitIndex, deltaCommitIndices = self.getFileDeltaChain(
+            filename, commitSha
+        )
+
+        # resuming from the latest version in the chain that is still cached
+        lines = None
+        for position in range(len(deltaCommitIndices) - 1, -1, -1):
+            lines = self._getCachedFile(
+                filename, timeline[deltaCommitIndices[position]]
+            )
+            if lines is not None:
+                lines = list(lines)
+                deltaCommitIndices = deltaCommitIndices[position + 1 :]
+                break
+        if lines is None:
+            with self.openStoredFile(
+                filename, timeline[firstCommitIndex], "rt"
+            ) as file:
+                lines = file.readlines()
+            if PROFILE is not None:
+                profileCount("bytes read", sum(map(len, lines)))
+
+        # applying changes at each commit from first commit to this commit
+        profileCount("deltas replayed", len(deltaCommitIndices))
+        for i in deltaCommitIndices:
+            fileChangeLog = self.getStoredDelta(filename, timeline[i])
+            lines = applyFileDelta(lines, fileChangeLog)
+
+        self._putCachedFile(filename, commitSha, lines)
+        return list(lines)
+
+    @profiled("replay deltas")
+    def getFiles(self, filenames: list, commitSha: str) -> dict:
+        """
+        Returns the versions of the files `filenames` during the commit
+        `commitSha`, like `getFile` but replaying the deltas of all of them in a
+        single walk over the timeline
+
+        PARAMETERS
+        ----------
+        - filenames : list[str]
+            - names of the files, none of them stored in chunks
+        - commitSha : str
+            - sha of the commit
+
+        RETURNS
+        -------
+        - files : dict[str, list[str]]
+            - lines of each file
+        """
+
+        timeline = self.timeline
+        files = dict()
+        # timeline position -> files whose delta at that commit is replayed
+        replays = dict()
+        for filename in filenames:
+            cached = self._getCachedFile(filename, commitSha)
+            if cached is not None:
+                files[filename] = list(cached)
+                continue
+            if not self.hasFile(filename, commitSha):
+                raise DuckError(f"{filename} does not exist in commit `{commitSha}`")
+            firstCommitIndex, deltaCommitIndices = self.getFileDeltaChain(
+                filename, commitSha
+            )
+            with self.openStoredFile(
+                filename, timeline[firstCommitIndex], "rt"
+            ) as file:
+                files[filename] = file.readlines()
+            for position in deltaCommitIndices:
+                replays.setdefault(position, []).append(filename)
+
+        for position in sorted(replays):
+            profileCount("deltas replayed", len(replays[position]))
+            for filename in replays[position]:
+                files[filename] = applyFileDelta(
+                    files[filename], self.getStoredDelta(filename, timeline[position])
+                )
+        return files
+
+    def _getCachedFile(self, filename: str, commitSha: str) -> Optional[tuple]:
+        entry = self._fileCache.get((filename, commitSha))
+        if entry is None:
+            return None
+        self._fileCache.move_to_end((filename, commitSha))
+        return entry[0]
+
+    def _putCachedFile(self, filename: str, commitSha: str, lines: list) -> None:
+        size = sum(len(line) for line in lines)
+        if size > self.config[CACHE_SIZE]:
+            return
+        self._fileCache[(filename, commitSha)] = (tuple(lines), size)
+        self._fileCacheSize += size
+        # evicting the least recently used versions
+        while self._fileCacheSize > self.config[CACHE_SIZE]:
+            self._fileCacheSize -= self._fileCache.popitem(last=False)[1][1]
+
+
+class SqliteCommits(Mapping):
+    """
+    Commits of a `SqliteRepository` by sha, each one is read from the database
+    on its first access
+    """
+
+    def __init__(self, repo: "SqliteRepository") -> None:
+        self.repo = repo
+        self._commits = dict()
+
+    def __getitem__(self, commitSha: str) -> dict:
+        if commitSha not in self._commits:
+            if commitSha not in self.repo._positions:
+                raise KeyError(commitSha)
+            self._commits[commitSha] = self.repo._readCommit(commitSha)
+        return self._commits[commitSha]
+
+    def __contains__(self, commitSha: object) -> bool:
+        return commitSha in self.repo._positions
+
+    def __iter__(self):
+        return iter(self.repo.timeline)
+
+    def __len__(self) -> int:
+        return len(self.repo.timeline)
+
+    def forget(self, commitShas: list) -> None:
+        for commitSha in commitShas:
+            self._commits.pop(commitSha, None)
+
+
+class SqliteRepository(Repository):
+    """
+    Duck repository keeping its commits in the SQLite database `.duck/duck.db`
+    instead of the log file, see `Repository`
+
+    Every commit and every file entry of a commit is a row of an indexed table,
+    so reading a commit or the history of a file only touches the rows involved
+    instead of parsing the whole history. `log` is a view of the database whose
+    commits are read on their first access.
+    """
+
+    @profiled("load log")
+    def __init__(self, path: str = PATH) -> None:
+        self.path = path
+        self.duckDirPath = join(path, ".duck")
+        self.databasePath = join(self.duckDirPath, DATABASE_FILE_NAME)
+        self.config = loadConfig(path)
+        self._fileCache = OrderedDict()
+        self._fileCacheSize = 0
+        self._connection = None
+        timeline = [
+            sha for (sha,) in self.execute("SELECT sha FROM commits ORDER BY position")
+        ]
+        self._positions = {sha: position for position, sha in enumerate(timeline)}
+        (head,) = self.execute(
+            "SELECT value FROM meta WHERE key = ?", (HEAD,)
+        ).fetchone()
+        self.log = {HEAD: head, TIMELINE: timeline, COMMITS: SqliteCommits(self)}
+
+    @property
+    def connection(self):
+        # connections must not be shared with the processes forked by `diffFiles`
+        if self._connection is None or self._connectionPid != getpid():
+            import sqlite3
+
+            self._connection = sqlite3.connect(self.databasePath)
+            self._connection.execute("PRAGMA synchronous = FULL")
+            self._connectionPid = getpid()
+        return self._connection
+
+    def execute(self, query: str, parameters: tuple = ()):
+        return self.connection.execute(query, parameters)
+
+    @profiled("load log")
+    def _readCommit(self, commitSha: str) -> dict:
+        profileCount("commits read")
+        position = self._positions[commitSha]
+        message, manifest = self.execute(
+            "SELECT message, manifest FROM commits WHERE position = ?", (position,)
+        ).fetchone()
+        files = {NEW: [], OLD: [], CHANGES: dict()}
+        if manifest != NO_MANIFEST:
+            files[HASHES] = dict()
+            files[KEYFRAMES] = []
+        if manifest == PARTIAL_MANIFEST:
+            files[PARTIAL] = True
+        blobs = dict()
+        for filename, change, fileHash, blob, keyframe, delta, chunks in self.execute(
+            "SELECT filename, change, hash, blob, keyframe, delta, chunks FROM files"
+            " WHERE position = ? ORDER BY filename",
+            (position,),
+        ):
+            if change == "A":
+                files[NEW].append(filename)
+            elif change == "D":
+                files[OLD].append(filename)
+            elif delta is not None:
+                files[CHANGES][filename] = loads(delta)
+            if chunks is not None:
+                files.setdefault(CHUNKS, dict())[filename] = loads(chunks)
+            if fileHash is not None:
+                files[HASHES][filename] = fileHash
+            if keyframe:
+                files[KEYFRAMES].append(filename)
+            if blob is not None:
+                blobs[filename] = blob
+        if blobs:
+            files[BLOBS] = blobs
+        return {MESSAGE: message, FILES: files}
+
+    def save(self, indent: bool = False) -> None:
+        """
+        Only flushes the stored objects, every commit and rollback is a
+        transaction of its own
+        """
+
+        syncObjectDirectories()
+        return None
+
+    def addCommit(self, commitSha: str, commitDict: dict, indent: bool = False) -> None:
+        position = len(self.timeline)
+        syncObjectDirectories()
+        with self.connection:
+            insertCommit(self.connection, position, commitSha, commitDict)
+            self.execute("REPLACE INTO meta VALUES (?, ?)", (HEAD, commitSha))
+        self.log[TIMELINE].append(commitSha)
+        self.log[HEAD] = commitSha
+        self._positions[commitSha] = position
+
+    def rollbackTo(self, commitSha: str, indent: bool = False) -> list:
+        position = self.getPosition(commitSha) + 1
+        deletedCommits = self.timeline[position:]
+        with self.connection:
+            self.execute("DELETE FROM files WHERE position >= ?", (position,))
+            self.execute("DELETE FROM commits WHERE position >= ?", (position,))
+            self.execute("REPLACE INTO meta VALUES (?, ?)", (HEAD, commitSha))
+        del self.log[TIMELINE][position:]
+        self.log[HEAD] = commitSha
+        for deletedSha in deletedCommits:
+            self._positions.pop(deletedSha)
+        self.log[COMMITS].forget(deletedCommits)
+        self._evictCommits(deletedCommits)
+        return deletedCommits
+
+    def exportLog(self) -> dict:
+        return {
+            HEAD: self.head,
+            TIMELINE: list(self.timeline),
+            COMMITS: {
+                commitSha: self.commits[commitSha] for commitSha in self.timeline
+            },
+        }
+
+    def getPosition(self, commitSha: str) -> int:
+        if commitSha not in self._positions:
+            raise ValueError(f"{commitSha} is not in the timeline")
+        return self._positions[commitSha]
+
+    def getFileHistory(self, filename: str) -> list:
+        return [
+            position
+            for (position,) in self.execute(
+                "SELECT position FROM files WHERE filename = ? AND change IS NOT NULL"
+                " ORDER BY position",
+                (filename,),
+            )
+        ]
+
+    def hasFile(self, filename: str, commitSha: str) -> bool:
+        if commitSha not in self._positions:
+            return False
+        row = self.execute(
+            "SELECT change FROM files WHERE filename = ? AND position <= ?"
+            " AND change IS NOT NULL ORDER BY position DESC LIMIT 1",
+            (filename, self._positions[commitSha]),
+        ).fetchone()
+        return row is not None and row[0] != "D"
+
+    def getFileChunks(self, filename: str, commitSha: str) -> Optional[list]:
+        if commitSha not in self._positions:
+            return None
+        row = self.execute(
+            "SELECT chunks FROM files WHERE filename = ? AND position <= ?"
+            " AND change IS NOT NULL ORDER BY position DESC LIMIT 1",
+            (filename, self._positions[commitSha]),
+        ).fetchone()
+        return None if row is None or row[0] is None else loads(row[0])
+
+    def getFileDeltaChain(self, filename: str, commitSha: str) -> tuple:
+        deltaCommitIndices = []
+        for baseIndex, change, keyframe in self.execute(
+            "SELECT position, change, keyframe FROM files WHERE filename = ?"
+            " AND position <= ? AND change IS NOT NULL ORDER BY position DESC",
+            (filename, self.getPosition(commitSha)),
+        ):
+            if change == "A" or keyframe:
+                break
+            if change == "M":
+                deltaCommitIndices.append(baseIndex)
+        deltaCommitIndices.reverse()
+        return baseIndex, deltaCommitIndices
+
+    def getMessage(self, commitSha: str) -> str:
+        (message,) = self.execute(
+            "SELECT message FROM commits WHERE position = ?",
+            (self.getPosition(commitSha),),
+        ).fetchone()
+        return message
+
+    def _getFileRow(self, filename: str, commitSha: str) -> tuple:
+        row = self.execute(
+            "SELECT change, hash, blob, delta FROM files"
+            " WHERE position = ? AND filename = ?",
+            (self.getPosition(commitSha), filename),
+        ).fetchone()
+        return row if row is not None else (None, None, None, None)
+
+    def getFilenames(self) -> list:
+        return [
+            filename
+            for (filename,) in self.execute(
+                "SELECT DISTINCT filename FROM files WHERE change IS NOT NULL"
+                " ORDER BY filename"
+            )
+        ]
+
+    def getFileHash(self, filename: str, commitSha: str) -> Optional[str]:
+        # the row of the commit itself in a full manifest, else the latest touch
+        position = self.getPosition(commitSha)
+        row = self.execute(
+            "SELECT hash FROM files WHERE filename = ? AND position <= ?"
+            " AND (change IS NOT NULL OR position = ?)"
+            " ORDER BY position DESC LIMIT 1",
+            (filename, position, position),
+        ).fetchone()
+        return None if row is None else row[0]
+
+    def _getLatestRows(self, commitSha: str) -> list:
+        position = self.getPosition(commitSha)
+        return self.execute(
+            "SELECT filename, change, hash FROM files JOIN ("
+            " SELECT filename, MAX(position) AS position FROM files"
+            " WHERE position <= ? AND (change IS NOT NULL OR position = ?)"
+            " GROUP BY filename"
+            ") USING (filename, position)",
+            (position, position),
+        ).fetchall()
+
+    def getCommitFiles(self, commitSha: str) -> set:
+        return {
+            filename
+            for filename, change, _ in self._getLatestRows(commitSha)
+            if change != "D"
+        }
+
+    def getManifest(self, commitSha: str) -> dict:
+        return {
+            filename: fileHash
+            for filename, change, fileHash in self._getLatestRows(commitSha)
+            if change != "D" and fileHash is not None
+        }
+
+    def getFileChange(self, filename: str, commitSha: str) -> Optional[str]:
+        return self._getFileRow(filename, commitSha)[0]
+
+    def getStoredDelta(self, filename: str, commitSha: str) -> dict:
+        delta = self._getFileRow(filename, commitSha)[3]
+        if delta is None:
+            raise KeyError(filename)
+        return loads(delta)
+
+    def openStoredFile(self, filename: str, commitSha: str, mode: str = "rb"):
+        _, fileHash, blob, _ = self._getFileRow(filename, commitSha)
+        if fileHash is None:
+            fileHash = blob
+        if fileHash is None:
+            raise FileNotFoundError(filename)
+        return openObject(fileHash, self.path, mode)
+
+    def getReferencedHashes(self) -> set:
+        referencedHashes = {
+            fileHash
+            for (fileHash,) in self.execute(
+                "SELECT hash FROM files WHERE hash IS NOT NULL"
+                " UNION SELECT blob FROM files WHERE blob IS NOT NULL"
+            )
+        }
+        for (chunks,) in self.execute(
+            "SELECT chunks FROM files WHERE chunks IS NOT NULL"
+        ):
+            referencedHashes.update(loads(chunks))
+        return referencedHashes
+
+    def getStoredHashes(self) -> set:
+        storedHashes = {
+            fileHash
+            for (fileHash,) in self.execute(
+                "SELECT hash FROM files WHERE hash IS NOT NULL AND chunks IS NULL"
+                " AND (change = 'A' OR keyframe = 1)"
+                " UNION SELECT blob FROM files WHERE blob IS NOT NULL"
+            )
+        }
+        for (chunks,) in self.execute(
+            "SELECT chunks FROM files WHERE chunks IS NOT NULL"
+        ):
+            storedHashes.update(loads(chunks))
+        return storedHashes
+
+
+@profiled("write log")
+def insertCommit(connection, position: int, commitSha: str, commitDict: dict) -> None:
+    """
+    Inserts the commit `commitDict` at the timeline position `position` of the
+    database of a `SqliteRepository`
+    """
+
+    commitFiles = commitDict[FILES]
+    hashes = commitFiles.get(HASHES)
+    blobs = commitFiles.get(BLOBS, dict())
+    chunks = commitFiles.get(CHUNKS, dict())
+    keyframes = set(commitFiles.get(KEYFRAMES, []))
+    filenames = set(commitFiles[NEW]) | set(commitFiles[OLD]) | set(chunks)
+    filenames |= set(commitFiles[CHANGES]) | set(hashes or ()) | set(blobs)
+    if hashes is None:
+        manifest = NO_MANIFEST
+    elif commitFiles.get(PARTIAL):
+        manifest = PARTIAL_MANIFEST
+    else:
+        manifest = FULL_MANIFEST
+    connection.execute(
+        "INSERT INTO commits VALUES (?, ?, ?, ?)",
+        (position, commitSha, commitDict[MESSAGE], manifest),
+    )
+    connection.executemany(
+        "INSERT INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        [
+            (
+                position,
+                filename,
+                getFileChange(filename, commitDict),
+                (hashes or dict()).get(filename),
+                blobs.get(filename),
+                int(filename in keyframes),
+                (
+                    dumps(commitFiles[CHANGES][filename])
+                    if filename in commitFiles[CHANGES]
+                    else None
+                ),
+                dumps(chunks[filename]) if filename in chunks else None,
+            )
+            for filename in sorted(filenames)
+        ],
+    )
+
+
+def writeDatabase(log: dict, path: str = PATH) -> None:
+    """
+    Atomically writes the whole log `log` as the database `.duck/duck.db` of a
+    `SqliteRepository`
+    """
+
+    import sqlite3
+
+    databasePath = join(path, ".duck", DATABASE_FILE_NAME)
+    tempPath = f"{databasePath}.tmp-{getpid()}"
+    if exists(tempPath):
+        remove(tempPath)
+    connection = sqlite3.connect(tempPath)
+    try:
+        with connection:
+            connection.executescript(DATABASE_SCHEMA)
+            for position, commitSha in enumerate(log[TIMELINE]):
+                insertCommit(connection, position, commitSha, log[COMMITS][commitSha])
+            connection.execute("INSERT INTO meta VALUES (?, ?)", (HEAD, log[HEAD]))
+    finally:
+        connection.close()
+    replace(tempPath, databasePath)
+    syncDirectory(dirname(databasePath))
+
+
+def storeLegacyCopies(repo: Repository) -> int:
+    """
+    Moves the copies under `.duck/commits` stored by repositories created before
+    the object store into it; the commits refer to them by hash under `blobs`
+    from now on, the log still has to be saved
+
+    RETURNS
+    -------
+    - count : int
+        - number of moved copies
+    """
+
+    if not exists(join(repo.path, ".duck", COMMITS)):
+        return 0
+    count = 0
+    for commitSha in repo.timeline:
+        for file in repo.commits[commitSha][FILES][NEW]:
+            stored = findStoredFile(getStoredFilePath(file, commitSha, repo.path))
+            if getStoredFileHash(file, commitSha, repo.log) or stored is None:
+                continue
+            with openCompressed(stored[0], "rb", stored[1]) as source:
+                fileHash = storeObjectFrom(source, repo.path, repo.config)
+            repo.commits[commitSha][FILES].setdefault(BLOBS, dict())[file] = fileHash
+            count += 1
+    return count
+
+
+def isRepository(path: str = PATH) -> bool:
+    """
+    Checks whether the directory at `path` is an initialized duck repository
+    """
+
+    duckDirPath = join(path, ".duck")
+    return exists(join(duckDirPath, LOG_FILE_NAME)) or exists(
+        join(duckDirPath, DATABASE_FILE_NAME)
+    )
+
+
+def loadIgnorePatterns(path: str = PATH) -> list:
+    """
+    Loads the glob patterns of `.duckignore` in the duck repository at `path`
+
+    Blank lines and lines starting with '#' are skipped. A pattern ending with
+    '/' only matches directories, a pattern containing another '/' is matched
+    against the whole path relative to `path`, any other pattern is matched
+    against the name of the file or directory at any depth.
+
+    RETURNS
+    -------
+    - patterns : list[tuple[str, bool, bool]]
+        - pattern, whether it only matches directories and whether it is anchored
+    """
+
+    patterns = []
+    try:
+        with open(join(path, IGNORE_FILE_NAME), "r") as file:
+            lines = file.read().splitlines()
+    except OSError:
+        return patterns
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        directoryOnly = line.endswith("/")
+        line = line.rstrip("/")
+        anchored = "/" in line
+        patterns.append((line.lstrip("/"), directoryOnly, anchored))
+    return patterns
+
+
+def isIgnored(relativePath: str, name: str, isDirectory: bool, patterns: list) -> bool:
+    """
+    Checks whether the file or directory at `relativePath` matches any of the
+    `.duckignore` patterns, see `loadIgnorePatterns`
+    """
+
+    for pattern, directoryOnly, anchored in patterns:
+        if directoryOnly and not isDirectory:
+            continue
+        if fnmatchcase(relativePath if anchored else name, pattern):
+            return True
+    return False
+
+
+@profiled("scan tree")
+def scanTree(path: str = PATH) -> set:
+    """
+    Recursively lists the files of the directory at `path`, leaving out `.duck`
+    and everything matched by `.duckignore`; ignored directories are pruned
+    without being descended into
+
+    PARAMETERS
+    ----------
+    - path : str
+        - default = `PATH` = `getcwd()`
+        - path the duck repository
+
+    RETURNS
+    -------
+    - files : set[str]
+        - paths of the files relative to `path`, separated by '/'
+    """
+
+    patterns = loadIgnorePatterns(path)
+    files = set()
+    pendingDirs = [""]
+    while pendingDirs:
+        relativeDir = pendingDirs.pop()
+        with scandir(join(path, relativeDir) if relativeDir else path) as entries:
+            for entry in entries:
+                relativePath = (
+                    f"{relativeDir}/{entry.name}" if relativeDir else entry.name
+                )
+                # the type of the entry comes from the directory listing, no stat needed
+                if entry.is_dir(follow_symlinks=False):
+                    if relativePath == ".duck" or isIgnored(
+                        relativePath, entry.name, True, patterns
+                    ):
+                        continue
+                    pendingDirs.append(relativePath)
+                elif entry.is_file() and not isIgnored(
+                    relativePath, entry.name, False, patterns
+                ):
+                    files.add(relativePath)
+    profileCount("files scanned", len(files))
+    return files
+
+
+@profiled("hash files")
+def hashFile(filePath: str) -> str:
+    """
+    Returns the sha256 hex digest of the content of the file at `filePath`
+    """
+
+    fileHash = sha256()
+    with open(filePath, "rb") as file:
+        for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b""):
+            fileHash.update(chunk)
+        profileCount("files hashed")
+        profileCount("bytes read", file.tell())
+    return fileHash.hexdigest()
+
+
+def getIndexEntry(filePath: str, fileHash: str) -> dict:
+    """
+    Builds the index entry of the file at `filePath` from its stat data
+
+    PARAMETERS
+    ----------
+    - filePath : str
+        - path of the file
+    - fileHash : str
+        - content hash of the file, see `hashFile`
+
+    RETURNS
+    -------
+    - entry : dict
+        - size, mtime_ns, inode and content hash of the file
+    """
+
+    fileStat = stat(filePath)
+    return {
+        SIZE: fileStat.st_size,
+        MTIME: fileStat.st_mtime_ns,
+        INODE: fileStat.st_ino,
+        HASH: fileHash,
+    }
+
+
+@profiled("index")
+def loadIndex(path: str = PATH) -> dict:
+    """
+    Loads the stat index `.duck/index` of the duck repository at `path`
+
+    PARAMETERS
+    ----------
+    - path : str
+        - default = `PATH` = `getcwd()`
+        - path the duck repository
+
+    RETURNS
+    -------
+    - index : dict
+        - index written by the last `init`, `commit` or `rollback`, empty if there is none;
+          its `TIMESTAMP` is the mtime of the index file, see `isFileUnchanged`
+    """
+
+    try:
+        with open(join(path, ".duck", INDEX_FILE_NAME), "r") as file:
+            index = load(file)
+            # like git, the index file is stamped by the same clock as the files
+            index[TIMESTAMP] = fstat(file.fileno()).st_mtime_ns
+            return index
+    except (OSError, ValueError):
+        return {TIMESTAMP: 0, FILES: dict()}
+
+
+@profiled("index")
+def writeIndex(entries: dict, path: str = PATH) -> None:
+    """
+    Writes the stat index `.duck/index` of the duck repository at `path`
+
+    PARAMETERS
+    ----------
+    - entries : dict
+        - index entry of each file, see `getIndexEntry`
+    - path : str
+        - default = `PATH` = `getcwd()`
+        - path the duck repository
+    """
+
+    # the mtime of the file is its timestamp, see `loadIndex`
+    atomicWrite(
+        join(path, ".duck", INDEX_FILE_NAME),
+        dumps({FILES: entries}).encode(),
+        sync=False,
+    )
+
+
+def getBlamePath(filename: str, commitSha: str, path: str = PATH) -> str:
+    """
+    Returns the path of the cached provenance of the file `filename` as of the
+    commit `commitSha`, under `.duck/blame/<commitSha>/`
+    """
+
+    return join(path, ".duck", BLAME, commitSha, sha256(filename.encode()).hexdigest())
+
+
+@profiled("blame cache")
+def loadBlame(filename: str, commitSha: str, path: str = PATH) -> Optional[list]:
+    """
+    Loads the cached provenance of the file `filename` as of the commit
+    `commitSha`, see `writeBlame`
+
+    RETURNS
+    -------
+    - provenance : list[str] | None
+        - sha of the commit that introduced each line, `None` if not cached
+    """
+
+    try:
+        with open(getBlamePath(filename, commitSha, path), "r") as file:
+            runs = load(file)
+    except (OSError, ValueError):
+        return None
+    provenance = []
+    for lineSha, count in runs:
+        provenance.extend([lineSha] * count)
+    return provenance
+
+
+@profiled("blame cache")
+def writeBlame(
+    filename: str, commitSha: str, provenance: list, path: str = PATH
+) -> None:
+    """
+    Caches the provenance of the file `filename` as of the commit `commitSha`
+    as runs of `[sha, count]`, consecutive lines mostly come from the same commit
+    """
+
+    runs = []
+    for lineSha in provenance:
+        if len(runs) != 0 and runs[-1][0] == lineSha:
+            runs[-1][1] += 1
+        else:
+            runs.append([lineSha, 1])
+    blamePath = getBlamePath(filename, commitSha, path)
+    makedirs(dirname(blamePath), exist_ok=True)
+    atomicWrite(blamePath, dumps(runs).encode(), sync=False)
+
+
+def atomicWrite(filePath: str, data: bytes, sync: bool = True) -> None:
+    """
+    Replaces the file at `filePath` with `data` through a temporary file and a
+    rename, so readers never see a partially written file
+
+    PARAMETERS
+    ----------
+    - filePath : str
+        - path of the file
+    - data : bytes
+        - new content of the file
+    - sync : bool
+        - flag for flushing the file and its directory to the disk before returning
+    """
+
+    profileCount("bytes written", len(data))
+    tempPath = f"{filePath}.tmp-{getpid()}"
+    with open(tempPath, "wb") as file:
+        file.write(data)
+        if sync:
+            file.flush()
+            fsync(file.fileno())
+    replace(tempPath, filePath)
+    if sync:
+        syncDirectory(dirname(filePath))
+
+
+def syncDirectory(dirPath: str) -> None:
+    """
+    Flushes the directory entries of `dirPath` to the disk, where supported
+    """
+
+    try:
+        dirFd = osOpen(dirPath, O_RDONLY)
+    except OSError:
+        return
+    try:
+        fsync(dirFd)
+    except OSError:
+        pass
+    finally:
+        osClose(dirFd)
+
+
+def syncObject(objectPath: str) -> None:
+    """
+    Flushes the stored object at `objectPath` to the disk; its directory is
+    flushed before the next commit record refers to it, see
+    `syncObjectDirectories`
+    """
+
+    fileFd = osOpen(objectPath, O_RDONLY)
+    try:
+        fsync(fileFd)
+    finally:
+        osClose(fileFd)
+    # the directory of the prefix may have been created for it
+    UNSYNCED_DIRECTORIES.add(dirname(objectPath))
+    UNSYNCED_DIRECTORIES.add(dirname(dirname(objectPath)))
+
+
+def syncObjectDirectories() -> None:
+    """
+    Flushes the directories of the objects stored since the last call to the
+    disk, so a record written after it never refers to a missing object
+    """
+
+    for dirPath in sorted(UNSYNCED_DIRECTORIES, reverse=True):
+        syncDirectory(dirPath)
+    UNSYNCED_DIRECTORIES.clear()
+
+
+def isFileUnchanged(filename: str, index: dict, path: str = PATH) -> bool:
+    """
+    Checks whether the file `filename` is unchanged since the index was written,
+    without reading it if its stat data still matches
+
+    PARAMETERS
+    ----------
+    - filename : str
+        - name of the file
+    - index : dict
+        - index loaded using `loadIndex`; refreshed in place and flagged with
+          `REFRESHED` if the stat data changed but the content did not
+    - path : str
+        - default = `PATH` = `getcwd()`
+        - path the duck repository
+
+    RETURNS
+    -------
+    - flag : bool
+        - whether the file matches the version recorded in the index
+    """
+
+    entry = index[FILES].get(filename)
+    if entry is None:
+        return False
+    filePath = join(path, filename)
+    fileStat = stat(filePath)
+    if fileStat.st_size != entry[SIZE]:
+        return False
+    # files modified no earlier than the index file was written are racy, they
+    # could have changed again within the same mtime, so their content is compared
+    if (
+        fileStat.st_mtime_ns == entry[MTIME]
+        and fileStat.st_ino == entry[INODE]
+        and entry[MTIME] < index[TIMESTAMP]
+    ):
+        return True
+    if hashFile(filePath) != entry[HASH]:
+        return False
+    index[FILES][filename] = getIndexEntry(filePath, entry[HASH])
+    index[REFRESHED] = True
+    return True
+
+
+def loadConfig(path: str = PATH) -> dict:
+    """
+    Loads the settings `.duck/duck.config.json` of the duck repository at `path`,
+    falling back to `DEFAULT_CONFIG` for missing settings
+    """
+
+    config = dict(DEFAULT_CONFIG)
+    try:
+        with open(join(path, ".duck", CONFIG_FILE_NAME), "r") as file:
+            config.update(load(file))
+    except (OSError, ValueError):
+        pass
+    return config
+
+
+def writeConfig(config: dict, path: str = PATH) -> None:
+    """
+    Writes the settings `.duck/duck.config.json` of the duck repository at `path`
+    """
+
+    atomicWrite(join(path, ".duck", CONFIG_FILE_NAME), dumps(config, indent=4).encode())
+
+
+@profiled("diff files")
+def diffFiles(filenames: list, commitSha: str, path: str = PATH, jobs: int = 1) -> list:
+    """
+    Diffs the working copies of the files `filenames` against their versions
+    during the commit `commitSha`, spreading the work over `jobs` processes
+
+    PARAMETERS
+    ----------
+    - filenames : list[str]
+        - names of the files
+    - commitSha : str
+        - sha of the commit
+    - path : str
+        - default = `PATH` = `getcwd()`
+        - path the duck repository
+    - jobs : int
+        - number of worker processes, the files are diffed in this process if 1
+
+    RETURNS
+    -------
+    - deltas : list[dict | None]
+        - delta of each file (see `getFileDelta`), in the order of `filenames`;
+          `None` if its version was lost, see `repairLinkedObject`
+    """
+
+    tasks = [(filename, commitSha, path) for filename in filenames]
+    return mapInProcesses(_diffFileTask, tasks, jobs)
+
+
+def mapInProcesses(function, tasks: list, jobs: int = 1) -> list:
+    """
+    Applies `function` to every task of `tasks` in `jobs` worker processes, or
+    in this process if 1
+
+    RETURNS
+    -------
+    - results : list
+        - result of each task, in the order of `tasks`
+    """
+
+    # starting the workers costs more than a single task
+    if jobs <= 1 or len(tasks) < PARALLEL_MIN_TASKS:
+        return [function(task) for task in tasks]
+    from concurrent.futures import ProcessPoolExecutor
+
+    # forked workers inherit the already loaded `Repository`
+    with ProcessPoolExecutor(max_workers=min(jobs, len(tasks))) as executor:
+        chunkSize = max(1, len(tasks) // (jobs * 4))
+        return list(executor.map(function, tasks, chunksize=chunkSize))
+
+
+def getStatus(
+    repo: "Repository",
+    thisFiles: set,
+    index: dict,
+    candidates: Optional[set] = None,
+    jobs: int = 1,
+) -> dict:
+    """
+    Compares the working copies of the files with their versions in the latest
+    commit
+
+    PARAMETERS
+    ----------
+    - repo : Repository
+        - the duck repository
+    - thisFiles : set[str]
+        - files currently in the repository, see `scanTree`
+    - index : dict
+        - index loaded using `loadIndex`, see `isFileUnchanged`
+    - candidates : set[str] | None
+        - default = `None`
+        - only these files are compared if given
+    - jobs : int
+        - number of worker processes used for diffing, see `diffFiles`
+
+    RETURNS
+    -------
+    - changes : dict[str, str]
+        - "A" for newly added, "D" for deleted and "M" for changed files
+    """
+
+    head = repo.head
+    if candidates is None:
+        headFiles = repo.getCommitFiles(head)
+        itrFiles = thisFiles | headFiles
+    else:
+        headFiles = {file for file in candidates if repo.hasFile(file, head)}
+        itrFiles = (thisFiles | headFiles) & candidates
+    changes = dict()
+
+    diffableFiles = []
+    for file in sorted(itrFiles):
+        if file in thisFiles:
+            if file in headFiles:
+                if isFileUnchanged(file, index, repo.path):
+                    continue
+                if repo.getFileHash(file, head) == hashFile(join(repo.path, file)):
+                    continue
+                # files stored in chunks are never diffed line by line
+                if repo.getFileChunks(file, head) is not None or isChunkedFile(
+                    join(repo.path, file), repo.config
+                ):
+                    changes[file] = "M"
+                    continue
+                diffableFiles.append(file)
+            else:
+                changes[file] = "A"
+        elif file in headFiles:
+            changes[file] = "D"
+
+    for file, fileChangeLog in zip(
+        diffableFiles, diffFiles(diffableFiles, head, repo.path, jobs)
+    ):
+        if fileChangeLog is None or getFileDeltaCounts(fileChangeLog) != (0, 0):
+            changes[file] = "M"
+
+    return changes
+
+
+def _diffFileTask(task: tuple) -> Optional[dict]:
+    filename, commitSha, path = task
+    with open(join(path, filename)) as file:
+        thisFileLines = file.readlines()
+    try:
+        fileLines = Repository.open(path).getFile(filename, commitSha)
+    except LostObjectError:
+        return None
+    return getFileDelta(fileLines, thisFileLines)
+
+
+def checkFileHistory(repo: "Repository", filename: str, every: int = 1) -> tuple:
+    """
+    Rebuilds the versions of the file `filename` one after the other along the
+    timeline, each from the previous one, and compares them with the content
+    hashes recorded by their commits
+
+    PARAMETERS
+    ----------
+    - repo : Repository
+        - the duck repository
+    - filename : str
+        - name of the file
+    - every : int
+        - only the versions at every `every`th commit and the latest commit are
+          hashed, the deltas in between are still applied
+
+    RETURNS
+    -------
+    - result : tuple[int, list[dict]]
+        - number of versions checked and the `sha`, `file` and `problem` of
+          each version that could not be rebuilt or does not match its hash
+    """
+
+    timeline = repo.timeline
+    lines, broken = None, False
+    checkedCount, problems = 0, []
+    for position in repo.getFileHistory(filename):
+        commitSha = timeline[position]
+        change = repo.getFileChange(filename, commitSha)
+        if change == "D":
+            lines, broken = None, False
+            continue
+        recordedHash = repo.getFileHash(filename, commitSha)
+        chunkHashes = repo.getFileChunks(filename, commitSha)
+        sampled = position % every == 0 or position == len(timeline) - 1
+        fileHash = None
+        try:
+            if chunkHashes is not None:
+                lines = None
+                if sampled:
+                    digest = sha256()
+                    for chunkHash in chunkHashes:
+                        with openObject(chunkHash, repo.path) as file:
+                            digest.update(file.read())
+                    fileHash = digest.hexdigest()
+            elif change == "A" or (lines is None and hasObject(recordedHash or "")):
+                # a keyframe lets the rebuild resume after a broken delta
+                with repo.openStoredFile(filename, commitSha) as file:
+                    data = file.read()
+                lines = TextIOWrapper(BytesIO(data)).readlines()
+                fileHash = sha256(data).hexdigest()
+            elif lines is None:
+                if broken:
+                    continue
+                raise ValueError("there is no earlier version to apply its delta to")
+            else:
+                lines = applyFileDelta(lines, repo.getStoredDelta(filename, commitSha))
+                if sampled:
+                    fileHash = sha256("".join(lines).encode()).hexdigest()
+        except Exception as exception:
+            lines, broken = None, True
+            problems.append(
+                {
+                    SHA: commitSha,
+                    FILENAME: filename,
+                    PROBLEM: f"can not be rebuilt: {exception!r}",
+                }
+            )
+            continue
+        broken = False
+        if fileHash is None:
+            continue
+        checkedCount += 1
+        if recordedHash is not None and fileHash != recordedHash:
+            problems.append(
+                {
+                    SHA: commitSha,
+                    FILENAME: filename,
+                    PROBLEM: "content does not match the recorded hash",
+                }
+            )
+    return checkedCount, problems
+
+
+def _checkFileTask(task: tuple) -> tuple:
+    filename, path, every = task
+    return checkFileHistory(Repository.open(path), filename, every)
+
+
+def checkObject(fileHash: str, path: str = PATH) -> Optional[str]:
+    """
+    Checks that the stored object with the hash `fileHash`, loose or packed,
+    still decompresses to content with that hash
+
+    RETURNS
+    -------
+    - problem : str | None
+        - what is wrong with the object, `None` if nothing
+    """
+
+    digest = sha256()
+    try:
+        with openObject(fileHash, path) as file:
+            for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b""):
+                digest.update(chunk)
+    except FileNotFoundError:
+        return "object is missing"
+    except LostObjectError:
+        return "object was modified through a hardlink of the working tree and is lost"
+    except Exception as exception:
+        return f"object can not be read: {exception!r}"
+    if digest.hexdigest() != fileHash:
+        return "object content does not match its hash"
+    return None
+
+
+def _checkObjectTask(task: tuple) -> Optional[str]:
+    return checkObject(*task)
+
+
+def checkManifests(repo: "Repository") -> list:
+    """
+    Checks that the hash manifest of every commit lists exactly the files
+    present during it, and that the files the commit did not touch kept the
+    hashes of the previous commit; a `PARTIAL` manifest has to list exactly
+    the files the commit touched
+
+    RETURNS
+    -------
+    - problems : list[dict]
+        - `sha`, `file` and `problem` of each inconsistency
+    """
+
+    problems = []
+    files, hashes = set(), dict()
+    for commitSha in repo.timeline:
+        commitDict = repo.commits[commitSha]
+        commitFiles = commitDict[FILES]
+        touchedFiles = set(commitFiles[NEW]) | set(commitFiles[CHANGES])
+        touchedFiles |= set(commitFiles.get(CHUNKS, ()))
+        files = (files - set(commitFiles[OLD])) | set(commitFiles[NEW])
+        if HASHES not in commitFiles:
+            files, hashes = getCommitFiles(commitDict), dict()
+            continue
+        manifest = commitFiles[HASHES]
+        if commitFiles.get(PARTIAL):
+            for file in sorted((touchedFiles & files) - set(manifest)):
+                problems.append(
+                    {
+                        SHA: commitSha,
+                        FILENAME: file,
+                        PROBLEM: "missing from the manifest",
+                    }
+                )
+            for file in sorted(set(manifest) - (touchedFiles & files)):
+                problems.append(
+                    {
+                        SHA: commitSha,
+                        FILENAME: file,
+                        PROBLEM: "in the manifest but not touched by the commit",
+                    }
+                )
+            hashes = {file: hashes[file] for file in files if file in hashes}
+            hashes.update(manifest)
+            continue
+        for file in sorted(files - set(manifest)):
+            problems.append(
+                {SHA: commitSha, FILENAME: file, PROBLEM: "missing from the manifest"}
+            )
+        for file in sorted(set(manifest) - files):
+            problems.append(
+                {
+                    SHA: commitSha,
+                    FILENAME: file,
+                    PROBLEM: "in the manifest but not part of the commit",
+                }
+            )
+        for file, fileHash in manifest.items():
+            if file in hashes and file not in touchedFiles and hashes[file] != fileHash:
+                problems.append(
+                    {
+                        SHA: commitSha,
+                        FILENAME: file,
+                        PROBLEM: "hash changed although the commit did not touch the file",
+                    }
+                )
+        hashes = manifest
+    return problems
+
+
+def isRestoredByReplay(filename: str, commitSha: str, repo: "Repository") -> bool:
+    """
+    Checks whether `restoreFile` has to replay deltas to rebuild the version of
+    the file `filename` during the commit `commitSha`, i.e. no full copy of it
+    is stored
+    """
+
+    fileHash = repo.getFileHash(filename, commitSha)
+    if fileHash is not None and hasObject(fileHash, repo.path):
+        return False
+    if repo.getFileChunks(filename, commitSha) is not None:
+        return False
+    return filename not in repo.commits[commitSha][FILES][NEW]
+
+
+@profiled("restore files")
+def restoreFile(
+    filename: str,
+    commitSha: str,
+    filePath: str,
+    repo: "Repository",
+    fileLines: Optional[list] = None,
+) -> None:
+    """
+    Atomically replaces the file at `filePath` with the version of the file
+    `filename` during the commit `commitSha`
+
+    PARAMETERS
+    ----------
+    - filename : str
+        - name of the file
+    - commitSha : str
+        - sha of the commit
+    - filePath : str
+        - path the file is written to
+    - repo : Repository
+        - the duck repository
+    - fileLines : list[str] | None
+        - default = `None`
+        - lines of that version if already rebuilt, see `Repository.getFiles`
+    """
+
+    commitFiles = repo.commits[commitSha][FILES]
+    fileHash = repo.getFileHash(filename, commitSha)
+    makedirs(dirname(filePath), exist_ok=True)
+    tempPath = f"{filePath}.tmp-{getpid()}"
+    # any stored object with the same content can be copied instead of replaying deltas
+    chunkHashes = repo.getFileChunks(filename, commitSha)
+    if fileHash is not None and hasObject(fileHash, repo.path):
+        copyObject(fileHash, tempPath, repo.path, repo.config[SNAPSHOT])
+    elif chunkHashes is not None:
+        with open(tempPath, "wb") as target:
+            for chunkHash in chunkHashes:
+                with openObject(chunkHash, repo.path) as source:
+                    copyfileobj(source, target, HASH_CHUNK_SIZE)
+    elif filename in commitFiles[NEW]:
+        with repo.openStoredFile(filename, commitSha) as source:
+            with open(tempPath, "wb") as target:
+                copyfileobj(source, target, HASH_CHUNK_SIZE)
+    else:
+        if fileLines is None:
+            fileLines = repo.getFile(filename, commitSha)
+        with open(tempPath, "w") as file:
+            file.writelines(fileLines)
+    profileCount("files restored")
+    if PROFILE is not None:
+        profileCount("bytes written", stat(tempPath).st_size)
+    replace(tempPath, filePath)
+
+
+def removeEmptyDirectories(removedFiles: list, path: str = PATH) -> None:
+    """
+    Removes the directories left empty after deleting the files `removedFiles`
+    """
+
+    for file in removedFiles:
+        dirPath = dirname(file)
+        while dirPath:
+            try:
+                rmdir(join(path, dirPath))
+            except OSError:
+                break
+            dirPath = dirname(dirPath)
+
+
+def getObjectPath(fileHash: str, path: str = PATH) -> str:
+    """
+    Returns the path of the object with the content hash `fileHash`, i.e.
+    `.duck/objects/<first 2 hex digits>/<remaining hex digits>`
+    """
+
+    return join(path, ".duck", OBJECTS, fileHash[:2], fileHash[2:])
+
+
+def findStoredFile(storedPath: str) -> Optional[tuple]:
+    """
+    Finds the stored file `storedPath` whatever codec it is compressed with
+
+    RETURNS
+    -------
+    - stored : tuple[str, str] | None
+        - actual path of the file and its codec, `None` if it is not stored
+    """
+
+    for codec, suffix in CODEC_SUFFIXES.items():
+        if exists(storedPath + suffix):
+            return storedPath + suffix, codec
+    return None
+
+
+def openCompressed(filePath: str, mode: str, codec: str, level: int = 6):
+    """
+    Opens the file at `filePath` through the streaming (de)compressor of `codec`
+
+    PARAMETERS
+    ----------
+    - filePath : str
+        - path of the file
+    - mode : str
+        - mode as in `open`, i.e. "rb", "rt" or "wb"
+    - codec : str
+        - one of `CODEC_SUFFIXES`
+    - level : int
+        - compression level, only used for writing
+    """
+
+    writing = "w" in mode
+    # the codecs are only imported by repositories that use them
+    if codec == ZLIB:
+        import gzip
+
+        if writing:
+            return gzip.open(filePath, mode, compresslevel=level)
+        return gzip.open(filePath, mode)
+    if codec == LZMA:
+        import lzma
+
+        if writing:
+            return lzma.open(filePath, mode, preset=level)
+        return lzma.open(filePath, mode)
+    return open(filePath, mode)
+
+
+def decompress(data: bytes, codec: str) -> bytes:
+    """
+    Decompresses a whole stored file compressed with `codec`
+    """
+
+    if codec == ZLIB:
+        import gzip
+
+        return gzip.decompress(data)
+    if codec == LZMA:
+        import lzma
+
+        return lzma.decompress(data)
+    return data
+
+
+def compress(data: bytes, config: dict) -> bytes:
+    """
+    Compresses a whole stored file with the codec and level in `config`
+    """
+
+    if config[COMPRESSION] == ZLIB:
+        import gzip
+
+        return gzip.compress(data, compresslevel=config[COMPRESSION_LEVEL], mtime=0)
+    if config[COMPRESSION] == LZMA:
+        import lzma
+
+        return lzma.compress(data, preset=config[COMPRESSION_LEVEL])
+    return data
+
+
+def openObject(fileHash: str, path: str = PATH, mode: str = "rb"):
+    """
+    Opens the object with the hash `fileHash` for reading, whether it is loose
+    under `.duck/objects` or in a pack under `.duck/packs`
+
+    PARAMETERS
+    ----------
+    - fileHash : str
+        - content hash of the object
+    - path : str
+        - default = `PATH` = `getcwd()`
+        - path the duck repository
+    - mode : str
+        - "rb" or "rt"
+    """
+
+    stored = findStoredFile(getObjectPath(fileHash, path))
+    if stored is not None:
+        if stored[1] == NONE and not repairLinkedObject(fileHash, stored[0], path):
+            return openObject(fileHash, path, mode)
+        return openCompressed(stored[0], mode, stored[1])
+    for pack in loadPacks(path):
+        data = pack.read(fileHash)
+        if data is not None:
+            return TextIOWrapper(BytesIO(data)) if "t" in mode else BytesIO(data)
+    # a loose object may have been moved into a pack opened after ours
+    if reloadChangedPacks(path):
+        return openObject(fileHash, path, mode)
+    if exists(getObjectPath(fileHash, path) + LOST_SUFFIX):
+        raise LostObjectError(
+            f"Object {fileHash} was modified through a hardlink of the working tree and is lost"
+        )
+    raise FileNotFoundError(getObjectPath(fileHash, path))
+
+
+def copyObject(
+    fileHash: str, filePath: str, path: str = PATH, snapshot: str = COPY
+) -> None:
+    """
+    Writes the decompressed content of the object with the hash `fileHash` to
+    `filePath`; uncompressed objects are cloned, or hardlinked if `snapshot` is
+    `HARDLINK`
+    """
+
+    stored = findStoredFile(getObjectPath(fileHash, path))
+    if stored is not None and stored[1] == NONE:
+        if not repairLinkedObject(fileHash, stored[0], path):
+            # raises a `LostObjectError`
+            openObject(fileHash, path)
+        if snapshot == HARDLINK:
+            link(stored[0], filePath)
+        else:
+            cloneFile(stored[0], filePath)
+        return
+    with openObject(fileHash, path) as source:
+        with open(filePath, "wb") as target:
+            copyfileobj(source, target, HASH_CHUNK_SIZE)
+
+
+def repairLinkedObject(fileHash: str, objectPath: str, path: str = PATH) -> bool:
+    """
+    Repairs the uncompressed object at `objectPath` if it is hardlinked to a
+    file of the working tree that was modified in place, which modified the
+    object as well; the other objects are never written after they are stored
+
+    The link is broken: the modified content is stored as an object of its own
+    and the object is rebuilt from the deltas of a version with the hash
+    `fileHash`, see `rebuildObject`, or replaced by an empty `LOST_SUFFIX`
+    marker if there is none, i.e. lost, and `openObject` raises a
+    `LostObjectError` for it.
+
+    RETURNS
+    -------
+    - intact : bool
+        - whether the object holds the content with the hash `fileHash` again
+    """
+
+    if stat(objectPath).st_nlink <= 1 or hashFile(objectPath) == fileHash:
+        return True
+    with open(objectPath, "rb") as source:
+        storeObjectFrom(source, path)
+    damagedPath = f"{objectPath}.damaged-{getpid()}"
+    try:
+        replace(objectPath, damagedPath)
+    except FileNotFoundError:
+        # repaired by another process in the meantime
+        return exists(objectPath)
+    remove(damagedPath)
+    profileCount("objects repaired")
+    data = rebuildObject(fileHash, path)
+    if data is None:
+        open(objectPath + LOST_SUFFIX, "wb").close()
+        return False
+    atomicWrite(objectPath, data)
+    return True
+
+
+def rebuildObject(fileHash: str, path: str = PATH) -> Optional[bytes]:
+    """
+    Rebuilds the content with the hash `fileHash` by replaying the delta of a
+    commit that changed a file to that content on top of the previous version
+
+    RETURNS
+    -------
+    - data : bytes | None
+        - the content, `None` if no version can be rebuilt without the object
+    """
+
+    repo = Repository.open(path)
+    timeline = repo.timeline
+    for filename in repo.getFilenames():
+        history = repo.getFileHistory(filename)
+        for touch in range(1, len(history)):
+            commitSha = timeline[history[touch]]
+            if (
+                repo.getFileHash(filename, commitSha) != fileHash
+                or repo.getFileChange(filename, commitSha) != "M"
+                or repo.getFileChunks(filename, commitSha) is not None
+            ):
+                continue
+            try:
+                lines = applyFileDelta(
+                    repo.getFile(filename, timeline[history[touch - 1]]),
+                    repo.getStoredDelta(filename, commitSha),
+                )
+            except (OSError, DuckError):
+                continue
+            data = "".join(lines).encode()
+            if sha256(data).hexdigest() == fileHash:
+                return data
+    return None
+
+
+def cloneFile(sourcePath: str, targetPath: str) -> str:
+    """
+    Copies the file at `sourcePath` to `targetPath` as cheaply as the file
+    system allows: a reflink sharing the data on btrfs and xfs, else an
+    in-kernel copy, else a plain copy
+
+    RETURNS
+    -------
+    - method : str
+        - "reflink", "copy_file_range", "sendfile" or "copy"
+    """
+
+    with open(sourcePath, "rb") as source, open(targetPath, "wb") as target:
+        try:
+            from fcntl import ioctl
+
+            ioctl(target.fileno(), FICLONE, source.fileno())
+            return REFLINK
+        except (ImportError, OSError):
+            pass
+        size = stat(sourcePath).st_size
+        methods = [
+            ("sendfile", lambda n: sendfile(target.fileno(), source.fileno(), None, n))
+        ]
+        try:
+            from os import copy_file_range
+
+            methods.insert(
+                0,
+                (
+                    "copy_file_range",
+                    lambda n: copy_file_range(source.fileno(), target.fileno(), n),
+                ),
+            )
+        except ImportError:
+            pass
+        for method, copyRange in methods:
+            try:
+                copied = 0
+                while copied < size:
+                    count = copyRange(size - copied)
+                    if count == 0:
+                        break
+                    copied += count
+                return method
+            except OSError:
+                # e.g. copy_file_range across file systems on old kernels
+                source.seek(0)
+                target.seek(0)
+                target.truncate()
+        copyfileobj(source, target, HASH_CHUNK_SIZE)
+        return COPY
+
+
+def hasObject(fileHash: str, path: str = PATH) -> bool:
+    """
+    Checks whether the object store of the duck repository at `path` holds the
+    content with the hash `fileHash`
+    """
+
+    if findStoredFile(getObjectPath(fileHash, path)) is not None:
+        return True
+    if any(pack.find(fileHash) is not None for pack in loadPacks(path)):
+        return True
+    return reloadChangedPacks(path) and any(
+        pack.find(fileHash) is not None for pack in loadPacks(path)
+    )
+
+
+class PackFile:
+    """
+    Read only view of a pack, i.e. the concatenated stored objects in
+    `.duck/packs/<name>.pack` and the index `.duck/packs/<name>.idx` listing the
+    hash, offset, length and codec of each of them sorted by hash
+
+    Both files are memory mapped, so looking up an object is a binary search
+    over the index that only touches the pages it needs.
+    """
+
+    def __init__(self, packPath: str) -> None:
+        from mmap import mmap, ACCESS_READ
+
+        self.packPath = packPath
+        self.indexPath = packPath[: -len(".pack")] + ".idx"
+        with open(self.indexPath, "rb") as file:
+            self._index = mmap(file.fileno(), 0, access=ACCESS_READ)
+        with open(self.packPath, "rb") as file:
+            self._pack = mmap(file.fileno(), 0, access=ACCESS_READ)
+        if (
+            self._index[: len(PACK_INDEX_MAGIC)] != PACK_INDEX_MAGIC
+            or self._pack[: len(PACK_MAGIC)] != PACK_MAGIC
+        ):
+            raise ValueError(f"{packPath} is not a duck pack")
+        (self.count,) = PACK_INDEX_COUNT.unpack_from(self._index, len(PACK_INDEX_MAGIC))
+        self._entriesOffset = len(PACK_INDEX_MAGIC) + PACK_INDEX_COUNT.size
+
+    def _entry(self, position: int) -> tuple:
+        return PACK_INDEX_ENTRY.unpack_from(
+            self._index, self._entriesOffset + position * PACK_INDEX_ENTRY.size
+        )
+
+    def find(self, fileHash: str) -> Optional[tuple]:
+        """
+        Looks up the object with the hash `fileHash`
+
+        RETURNS
+        -------
+        - entry : tuple[int, int, str] | None
+            - offset, length and codec of the object in the pack
+        """
+
+        key = bytes.fromhex(fileHash)
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            entryKey = self._entry(middle)[0]
+            if entryKey < key:
+                low = middle + 1
+            elif entryKey > key:
+                high = middle
+            else:
+                _, offset, length, codecId = self._entry(middle)
+                return offset, length, CODEC_IDS[codecId]
+        return None
+
+    def readRaw(self, fileHash: str) -> Optional[tuple]:
+        """
+        Returns the object with the hash `fileHash` as stored, with its codec
+        """
+
+        entry = self.find(fileHash)
+        if entry is None:
+            return None
+        offset, length, codec = entry
+        return self._pack[offset : offset + length], codec
+
+    def read(self, fileHash: str) -> Optional[bytes]:
+        """
+        Returns the decompressed object with the hash `fileHash`
+        """
+
+        raw = self.readRaw(fileHash)
+        return None if raw is None else decompress(*raw)
+
+    def hashes(self) -> list:
+        return [self._entry(i)[0].hex() for i in range(self.count)]
+
+    def close(self) -> None:
+        self._index.close()
+        self._pack.close()
+
+
+_openPacks = dict()
+
+
+def loadPacks(path: str = PATH, reload: bool = False) -> list:
+    """
+    Returns the packs of the duck repository at `path`, opened once per process
+    """
+
+    key = realpath(path)
+    if reload or key not in _openPacks:
+        for pack in _openPacks.pop(key, []):
+            pack.close()
+        packsDirPath = join(path, ".duck", PACKS)
+        _openPacks[key] = [
+            PackFile(join(packsDirPath, name)) for name in listPackNames(path)
+        ]
+    return _openPacks[key]
+
+
+def listPackNames(path: str = PATH) -> list:
+    """
+    Returns the sorted file names of the packs under `.duck/packs`
+    """
+
+    packsDirPath = join(path, ".duck", PACKS)
+    names = sorted(listdir(packsDirPath)) if exists(packsDirPath) else []
+    return [name for name in names if name.endswith(".pack")]
+
+
+def reloadChangedPacks(path: str = PATH) -> bool:
+    """
+    Reopens the packs of the duck repository at `path` if `duck gc` replaced
+    them since this process opened them, as it may while `duck watch` runs
+
+    RETURNS
+    -------
+    - reloaded : bool
+        - whether the packs changed and were reopened
+    """
+
+    packNames = [basename(pack.packPath) for pack in loadPacks(path)]
+    if packNames == listPackNames(path):
+        return False
+    loadPacks(path, reload=True)
+    return True
+
+
+@profiled("write packs")
+def writePack(objects: dict, path: str = PATH) -> Optional[str]:
+    """
+    Writes a new pack holding the given stored objects
+
+    PARAMETERS
+    ----------
+    - objects : dict
+        - hash -> (stored bytes, codec) of each object
+    - path : str
+        - default = `PATH` = `getcwd()`
+        - path the duck repository
+
+    RETURNS
+    -------
+    - packPath : str | None
+        - path of the pack, `None` if there was nothing to pack
+    """
+
+    if len(objects) == 0:
+        return None
+    packsDirPath = join(path, ".duck", PACKS)
+    makedirs(packsDirPath, exist_ok=True)
+    packHash = sha256()
+    for fileHash in sorted(objects):
+        packHash.update(bytes.fromhex(fileHash))
+    name = f"pack-{packHash.hexdigest()}"
+
+    entries = []
+    offset = len(PACK_MAGIC)
+    tempPackPath = join(packsDirPath, f"{name}.pack.tmp-{getpid()}")
+    with open(tempPackPath, "wb") as file:
+        file.write(PACK_MAGIC)
+        for fileHash in sorted(objects):
+            data, codec = objects[fileHash]
+            file.write(data)
+            entries.append(
+                PACK_INDEX_ENTRY.pack(
+                    bytes.fromhex(fileHash), offset, len(data), CODEC_IDS.index(codec)
+                )
+            )
+            offset += len(data)
+        file.flush()
+        fsync(file.fileno())
+    # the index is written last, a pack without one is never read
+    replace(tempPackPath, join(packsDirPath, f"{name}.pack"))
+    atomicWrite(
+        join(packsDirPath, f"{name}.idx"),
+        PACK_INDEX_MAGIC + PACK_INDEX_COUNT.pack(len(entries)) + b"".join(entries),
+    )
+    return join(packsDirPath, f"{name}.pack")
+
+
+def storeObject(filePath: str, path: str = PATH, config: Optional[dict] = None) -> str:
+    """
+    Stores the content of the file at `filePath` in the object store of the duck
+    repository at `path`; identical content is only ever written once
+
+    PARAMETERS
+    ----------
+    - filePath : str
+        - path of the file
+    - path : str
+        - default = `PATH` = `getcwd()`
+        - path the duck repository
+    - config : dict | None
+        - settings of the repository, loaded using `loadConfig` if not given
+
+    RETURNS
+    -------
+    - fileHash : str
+        - content hash of the file, see `hashFile`
+    """
+
+    if config is None:
+        config = loadConfig(path)
+    if config[COMPRESSION] == NONE and config[SNAPSHOT] != COPY:
+        return snapshotObject(filePath, path, config[SNAPSHOT])
+    with open(filePath, "rb") as source:
+        return storeObjectFrom(source, path, config)
+
+
+@profiled("store objects")
+def snapshotObject(filePath: str, path: str = PATH, snapshot: str = REFLINK) -> str:
+    """
+    Stores the file at `filePath` uncompressed without copying its bytes through
+    Python: `REFLINK` clones it (see `cloneFile`) and `HARDLINK` links it, which
+    is only safe for content that is replaced rather than modified in place,
+    see `repairLinkedObject`
+
+    RETURNS
+    -------
+    - fileHash : str
+        - content hash of the file, see `hashFile`
+    """
+
+    tempPath = join(path, ".duck", f"object.tmp-{getpid()}")
+    if exists(tempPath):
+        remove(tempPath)
+    if snapshot == HARDLINK:
+        try:
+            link(filePath, tempPath)
+        except OSError:
+            # e.g. a working tree on another file system
+            cloneFile(filePath, tempPath)
+    else:
+        cloneFile(filePath, tempPath)
+    # the clone can not change anymore, hashing it is safe from concurrent writes
+    fileHash = hashFile(tempPath)
+
+    if hasObject(fileHash, path):
+        remove(tempPath)
+    else:
+        makedirs(join(path, ".duck", OBJECTS, fileHash[:2]), exist_ok=True)
+        replace(tempPath, getObjectPath(fileHash, path))
+        syncObject(getObjectPath(fileHash, path))
+        profileCount("objects stored")
+    return fileHash
+
+
+@profiled("store objects")
+def storeObjectFrom(source, path: str = PATH, config: Optional[dict] = None) -> str:
+    """
+    Stores the content read from the binary file object `source` in the object
+    store, see `storeObject`
+    """
+
+    if config is None:
+        config = loadConfig(path)
+    codec = config[COMPRESSION]
+    objectsDirPath = join(path, ".duck", OBJECTS)
+    tempPath = join(path, ".duck", f"object.tmp-{getpid()}")
+    # hashing and compressing in a single pass, the object is only kept if it is new
+    fileHash = sha256()
+    with openCompressed(tempPath, "wb", codec, config[COMPRESSION_LEVEL]) as target:
+        for chunk in iter(lambda: source.read(HASH_CHUNK_SIZE), b""):
+            fileHash.update(chunk)
+            target.write(chunk)
+            profileCount("bytes read", len(chunk))
+    fileHash = fileHash.hexdigest()
+
+    if hasObject(fileHash, path):
+        remove(tempPath)
+    else:
+        profileCount("objects stored")
+        if PROFILE is not None:
+            profileCount("bytes written", stat(tempPath).st_size)
+        makedirs(join(objectsDirPath, fileHash[:2]), exist_ok=True)
+        replace(tempPath, getObjectPath(fileHash, path) + CODEC_SUFFIXES[codec])
+        syncObject(getObjectPath(fileHash, path) + CODEC_SUFFIXES[codec])
+    return fileHash
+
+
+def isChunkedFile(filePath: str, config: dict) -> bool:
+    """
+    Checks whether the file at `filePath` is stored in chunks instead of lines,
+    i.e. it is at least `chunkThreshold` bytes long or binary
+    """
+
+    if stat(filePath).st_size >= config[CHUNK_THRESHOLD]:
+        return True
+    with open(filePath, "rb") as file:
+        return b"\0" in file.read(BINARY_SNIFF_SIZE)
+
+
+def getChunkBoundaries(data) -> list:
+    """
+    Splits `data` into content defined chunks of `CHUNK_MIN_SIZE` to
+    `CHUNK_MAX_SIZE` bytes
+
+    A chunk ends after a NUL or newline byte whose preceding `CHUNK_WINDOW`
+    bytes hash to a multiple of `CHUNK_MASK + 1`. The boundaries only depend on
+    the bytes around them, so an edit only changes the chunks it touches and
+    the rest keep their hashes. Candidate bytes are found by the regex engine
+    and only those are hashed, a rolling hash over every byte would be far too
+    slow in Python; runs without any candidate are cut at `CHUNK_MAX_SIZE`.
+
+    PARAMETERS
+    ----------
+    - data : bytes | mmap
+        - content to split
+
+    RETURNS
+    -------
+    - boundaries : list[int]
+        - end offset of each chunk
+    """
+
+    boundaries = []
+    size = len(data)
+    start = 0
+    while start < size:
+        end = min(start + CHUNK_MAX_SIZE, size)
+        position = start + CHUNK_MIN_SIZE
+        while position < end:
+            match = CHUNK_ANCHOR.search(data, position, end)
+            if match is None:
+                break
+            position = match.end()
+            if crc32(data[position - CHUNK_WINDOW : position]) & CHUNK_MASK == 0:
+                end = position
+                break
+        boundaries.append(end)
+        start = end
+    return boundaries
+
+
+@profiled("store objects")
+def storeChunks(
+    filePath: str, path: str = PATH, config: Optional[dict] = None, store: bool = True
+) -> tuple:
+    """
+    Splits the file at `filePath` into chunks (see `getChunkBoundaries`) and
+    stores each distinct chunk as an object
+
+    PARAMETERS
+    ----------
+    - filePath : str
+        - path of the file
+    - path : str
+        - default = `PATH` = `getcwd()`
+        - path the duck repository
+    - config : dict | None
+        - settings of the repository, loaded using `loadConfig` if not given
+    - store : bool
+        - flag for only hashing the chunks without storing them
+
+    RETURNS
+    -------
+    - hashes : tuple[str, list[str]]
+        - content hash of the whole file and hashes of its chunks
+    """
+
+    from mmap import mmap, ACCESS_READ
+
+    if config is None:
+        config = loadConfig(path)
+    with open(filePath, "rb") as file:
+        if stat(filePath).st_size == 0:
+            return sha256().hexdigest(), []
+        data = mmap(file.fileno(), 0, access=ACCESS_READ)
+    try:
+        profileCount("bytes read", len(data))
+        fileHash = sha256(data).hexdigest()
+        chunkHashes = []
+        start = 0
+        for end in getChunkBoundaries(data):
+            chunk = data[start:end]
+            chunkHash = sha256(chunk).hexdigest()
+            if store and not hasObject(chunkHash, path):
+                profileCount("objects stored")
+                objectPath = getObjectPath(chunkHash, path)
+                makedirs(dirname(objectPath), exist_ok=True)
+                atomicWrite(
+                    objectPath + CODEC_SUFFIXES[config[COMPRESSION]],
+                    compress(chunk, config),
+                    sync=False,
+                )
+                syncObject(objectPath + CODEC_SUFFIXES[config[COMPRESSION]])
+            chunkHashes.append(chunkHash)
+            start = end
+    finally:
+        data.close()
+    return fileHash, chunkHashes
+
+
+def recompressStoredFile(storedPath: str, config: dict) -> bool:
+    """
+    Rewrites the stored file `storedPath` with the codec and level in `config`
+
+    RETURNS
+    -------
+    - flag : bool
+        - whether the file was found and rewritten
+    """
+
+    stored = findStoredFile(storedPath)
+    if stored is None:
+        return False
+    codec = config[COMPRESSION]
+    tempPath = f"{storedPath}.tmp-{getpid()}"
+    with openCompressed(stored[0], "rb", stored[1]) as source:
+        with openCompressed(tempPath, "wb", codec, config[COMPRESSION_LEVEL]) as target:
+            copyfileobj(source, target, HASH_CHUNK_SIZE)
+    replace(tempPath, storedPath + CODEC_SUFFIXES[codec])
+    if stored[0] != storedPath + CODEC_SUFFIXES[codec]:
+        # the old copy is only removed once the new one is on the disk
+        syncObject(storedPath + CODEC_SUFFIXES[codec])
+        syncObjectDirectories()
+        remove(stored[0])
+    return True
+
+
+def readLogFile(logFilePath: str) -> dict:
+    """
+    Reads the log file `.duck/duck.log.json`, which is plain JSON or JSON
+    compressed with one of the codecs in `CODEC_SUFFIXES`
+    """
+
+    with open(logFilePath, "rb") as file:
+        data = file.read()
+    profileCount("bytes read", len(data))
+    if data.startswith(GZIP_MAGIC):
+        data = decompress(data, ZLIB)
+    elif data.startswith(XZ_MAGIC):
+        data = decompress(data, LZMA)
+    return loads(data)
+
+
+def encodeLogFile(log: dict, config: dict, indent: bool = False) -> bytes:
+    """
+    Serializes the log file `.duck/duck.log.json` using the codec in `config`
+    """
+
+    return compress(dumps(log, indent=4 if indent else 0).encode(), config)
+
+
+class InotifyWatcher:
+    """
+    Watches the directories of a duck repository through inotify(7), along with
+    `.duck` itself for the commits and rollbacks made by other processes
+
+    Ignored directories are not watched, every directory created later is
+    watched once the tree is rescanned.
+    """
+
+    def __init__(self, path: str = PATH) -> None:
+        import ctypes
+        import ctypes.util
+
+        self.path = path
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.watchedDirs = dict()
+        self.watchTree()
+
+    def fileno(self) -> int:
+        return self.fd
+
+    def _addWatch(self, relativeDir: str) -> None:
+        dirPath = join(self.path, relativeDir) if relativeDir else self.path
+        wd = self._libc.inotify_add_watch(self.fd, dirPath.encode(), IN_WATCH_MASK)
+        # directories deleted in the meantime show up in the next rescan
+        if wd >= 0:
+            self.watchedDirs[wd] = relativeDir
+
+    def watchTree(self) -> None:
+        """
+        Watches every directory of the repository that is not ignored
+        """
+
+        patterns = loadIgnorePatterns(self.path)
+        self._addWatch(".duck")
+        pendingDirs = [""]
+        while pendingDirs:
+            relativeDir = pendingDirs.pop()
+            self._addWatch(relativeDir)
+            try:
+                entries = list(scandir(join(self.path, relativeDir)))
+            except OSError:
+                continue
+            for entry in entries:
+                relativePath = (
+                    f"{relativeDir}/{entry.name}" if relativeDir else entry.name
+                )
+                if (
+                    entry.is_dir(follow_symlinks=False)
+                    and relativePath != ".duck"
+                    and not isIgnored(relativePath, entry.name, True, patterns)
+                ):
+                    pendingDirs.append(relativePath)
+
+    def changes(self) -> tuple:
+        """
+        Reads the pending events without blocking
+
+        RETURNS
+        -------
+        - touchedFiles : set[str]
+            - files that were written, created, moved or deleted
+        - rescan : bool
+            - whether the whole tree has to be rescanned, i.e. a directory,
+              `.duckignore` or the log of the repository changed
+        """
+
+        touchedFiles, rescan = set(), False
+        while True:
+            try:
+                data = osRead(self.fd, 1 << 16)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = INOTIFY_EVENT.unpack_from(data, offset)
+                offset += INOTIFY_EVENT.size
+                name = data[offset : offset + length].rstrip(b"\0").decode()
+                offset += length
+                relativeDir = self.watchedDirs.get(wd)
+                if mask & IN_IGNORED:
+                    self.watchedDirs.pop(wd, None)
+                    continue
+                if mask & IN_Q_OVERFLOW or relativeDir is None:
+                    rescan = True
+                elif relativeDir == ".duck":
+                    if name in (
+                        LOG_FILE_NAME,
+                        JOURNAL_FILE_NAME,
+                        DATABASE_FILE_NAME,
+                        INDEX_FILE_NAME,
+                    ):
+                        rescan = True
+                elif mask & (IN_ISDIR | IN_DELETE_SELF | IN_MOVE_SELF):
+                    rescan = True
+                elif relativeDir == "" and name == IGNORE_FILE_NAME:
+                    rescan = True
+                elif name:
+                    touchedFiles.add(f"{relativeDir}/{name}" if relativeDir else name)
+        if rescan:
+            self.watchTree()
+        return touchedFiles, rescan
+
+    def close(self) -> None:
+        closeFd(self.fd)
+
+
+class PollingWatcher:
+    """
+    Watches a duck repository by comparing the stat data of its files between
+    calls, for platforms without inotify(7)
+    """
+
+    def __init__(self, path: str = PATH) -> None:
+        self.path = path
+        self.snapshot = self._snapshot()
+
+    def fileno(self) -> Optional[int]:
+        return None
+
+    def _snapshot(self) -> dict:
+        snapshot = dict()
+        metaFiles = [
+            join(".duck", name)
+            for name in (
+                LOG_FILE_NAME,
+                JOURNAL_FILE_NAME,
+                DATABASE_FILE_NAME,
+                INDEX_FILE_NAME,
+            )
+        ]
+        metaFiles.append(IGNORE_FILE_NAME)
+        for file in list(scanTree(self.path)) + metaFiles:
+            try:
+                fileStat = stat(join(self.path, file))
+            except OSError:
+                continue
+            snapshot[file] = (fileStat.st_mtime_ns, fileStat.st_size, fileStat.st_ino)
+        return snapshot
+
+    def changes(self) -> tuple:
+        """
+        Rescans the stat data of the tree, see `InotifyWatcher.changes`
+        """
+
+        snapshot = self._snapshot()
+        touchedFiles = {
+            file
+            for file in snapshot.keys() | self.snapshot.keys()
+            if snapshot.get(file) != self.snapshot.get(file)
+        }
+        self.snapshot = snapshot
+        rescan = any(
+            file == IGNORE_FILE_NAME or file.startswith(".duck")
+            for file in touchedFiles
+        )
+        return touchedFiles, rescan
+
+    def close(self) -> None:
+        return None
+
+
+class StatusCache:
+    """
+    Status and diffs of a duck repository kept up to date by `duck watch`
+
+    Only the files reported by the watcher are compared again, the whole tree
+    is only rescanned when the log, the index or `.duckignore` changes.
+    """
+
+    def __init__(self, path: str = PATH, jobs: int = 1) -> None:
+        self.path = path
+        self.jobs = jobs
+        self.failed = False
+        self.rescan()
+
+    def rescan(self) -> None:
+        self.failed = True
+        self.repo = Repository.open(self.path, reload=True)
+        # `duck gc` replaces the packs along with the log
+        loadPacks(self.path, reload=True)
+        self.patterns = loadIgnorePatterns(self.path)
+        self.index = loadIndex(self.path)
+        self.files = scanTree(self.path)
+        self.changes = getStatus(self.repo, self.files, self.index, jobs=self.jobs)
+        self.changeLogs = dict()
+        self.failed = False
+
+    def update(self, touchedFiles: set, rescan: bool) -> None:
+        """
+        Applies the changes reported by a watcher, see `InotifyWatcher.changes`;
+        after a failed update the whole tree is rescanned
+        """
+
+        if rescan or self.failed:
+            self.rescan()
+            return None
+        self.failed = True
+        for key in [key for key in self.changeLogs if key[0] in touchedFiles]:
+            del self.changeLogs[key]
+        for file in touchedFiles:
+            self.changes.pop(file, None)
+            if isfile(join(self.path, file)) and not isIgnored(
+                file, basename(file), False, self.patterns
+            ):
+                self.files.add(file)
+            else:
+                self.files.discard(file)
+        self.changes.update(getStatus(self.repo, self.files, self.index, touchedFiles))
+        self.failed = False
+        return None
+
+    def getChangeLog(self, filename: str, commitSha: str) -> dict:
+        """
+        Returns the changes of the file `filename` since the commit `commitSha`,
+        see `getFileChangeLog`
+        """
+
+        if not self.repo.hasFile(filename, commitSha):
+            raise KeyError(filename)
+        if self.repo.getFileChunks(filename, commitSha) is not None:
+            raise KeyError(filename)
+        if (filename, commitSha) not in self.changeLogs:
+            with open(join(self.path, filename)) as file:
+                curFileLines = file.readlines()
+            self.changeLogs[(filename, commitSha)] = getFileChangeLog(
+                oldFileLines=self.repo.getFile(filename, commitSha),
+                newFileLines=curFileLines,
+                includeCommon=True,
+            )
+        return self.changeLogs[(filename, commitSha)]
+
+    def handle(self, request: dict) -> dict:
+        """
+        Answers a request sent to `duck watch`, see `queryDaemon`
+        """
+
+        if self.failed:
+            raise DuckError("The status is out of date")
+        if request.get(COMMAND) == "status":
+            return {CHANGES_BY_FILE: self.changes}
+        if request.get(COMMAND) == "diff":
+            return {
+                CHANGE_LOG: self.getChangeLog(
+                    request[FILENAME], request.get(COMMIT, self.repo.head)
+                )
+            }
+        raise ValueError(f"unknown command {request.get(COMMAND)}")
+
+
+def queryDaemon(request: dict, path: str = PATH) -> Optional[dict]:
+    """
+    Sends `request` to the `duck watch` daemon of the duck repository at `path`
+
+    RETURNS
+    -------
+    - response : dict | None
+        - answer of the daemon, `None` if none is running or it failed to answer
+    """
+
+    socketPath = join(path, ".duck", WATCH_SOCKET_NAME)
+    if not exists(socketPath):
+        return None
+    from socket import socket, AF_UNIX, SOCK_STREAM
+
+    try:
+        with socket(AF_UNIX, SOCK_STREAM) as client:
+            client.settimeout(WATCH_TIMEOUT)
+            client.connect(socketPath)
+            client.sendall(dumps(request).encode() + b"\n")
+            data = b""
+            while not data.endswith(b"\n"):
+                chunk = client.recv(1 << 16)
+                if not chunk:
+                    return None
+                data += chunk
+        response = loads(data)
+    except (OSError, ValueError):
+        return None
+    return response if isinstance(response, dict) else None
+
+
+def _answerClient(client, cache: StatusCache) -> None:
+    with client:
+        client.settimeout(WATCH_TIMEOUT)
+        data = b""
+        while not data.endswith(b"\n"):
+            chunk = client.recv(1 << 16)
+            if not chunk:
+                return None
+            data += chunk
+        try:
+            response = cache.handle(loads(data))
+        except (OSError, ValueError, KeyError, DuckError):
+            response = {"error": True}
+        client.sendall(dumps(response).encode() + b"\n")
+    return None
+
+
+def openRepository(path: str = PATH) -> Repository:
+    """
+    Opens the duck repository at `path`, which can then be passed to any number
+    of calls of the library functions, e.g. `commitTree` and `readFile`
+
+    PARAMETERS
+    ----------
+    - path : str
+        - default = `PATH` = `getcwd()`
+        - path the duck repository
+
+    RETURNS
+    -------
+    - repo : Repository
+        - shared instance of the repository, see `Repository.open`
+
+    RAISES
+    ------
+    - NotARepositoryError
+        - if `path` was never initialized, see `initRepository`
+    """
+
+    if not isRepository(path):
+        raise NotARepositoryError(
+            f"First init the repository using `{EXECUTABLE} init`"
+        )
+    return Repository.open(path)
+
+
+def initRepository(
+    path: str = PATH, config: Optional[dict] = None, indent: bool = False
+) -> Repository:
+    """
+    Initializes the directory at `path` as a duck repository, storing all its
+    files as the initial commit; an existing `.duck` is replaced
+
+    PARAMETERS
+    ----------
+    - path : str
+        - default = `PATH` = `getcwd()`
+        - path the duck repository
+    - config : dict | None
+        - settings overriding `DEFAULT_CONFIG`
+    - indent : bool
+        - flag for indenting the log file
+
+    RETURNS
+    -------
+    - repo : Repository
+        - the initialized repository
+
+    RAISES
+    ------
+    - DuckError
+        - if `path` does not exist or a setting is not valid
+    """
+
+    config = dict(DEFAULT_CONFIG, **(config or dict()))
+    if not exists(path):
+        raise DuckError("Invalid path found")
+    if config[COMPRESSION] not in CODEC_SUFFIXES:
+        raise DuckError(f"Unknown compression codec `{config[COMPRESSION]}`")
+    if config[STORAGE] not in STORAGES:
+        raise DuckError(f"Unknown storage `{config[STORAGE]}`")
+    if config[SNAPSHOT] not in SNAPSHOTS:
+        raise DuckError(f"Unknown snapshot mode `{config[SNAPSHOT]}`")
+    if config[SNAPSHOT] != COPY and config[COMPRESSION] != NONE:
+        raise DuckError(
+            f"Snapshot mode `{config[SNAPSHOT]}` needs `--compression none`"
+        )
+    duckDirPath = join(path, ".duck")
+    try:
+        # deletes the ./duck dir if any
+        rmtree(duckDirPath, ignore_errors=False, onerror=None)
+    except:
+        pass
+
+    mkdir(duckDirPath)
+    mkdir(join(duckDirPath, OBJECTS))
+    writeConfig(config, path)
+
+    # storing files
+    hashes = dict()
+    chunks = dict()
+    indexEntries = dict()
+    for file in sorted(scanTree(path)):
+        originalPath = join(path, file)
+        if isChunkedFile(originalPath, config):
+            hashes[file], chunks[file] = storeChunks(originalPath, path, config)
+        else:
+            hashes[file] = storeObject(originalPath, path, config)
+        indexEntries[file] = getIndexEntry(originalPath, hashes[file])
+
+    duckLogFile = dict()
+    duckLogFile[HEAD] = INIT
+    duckLogFile[TIMELINE] = [INIT]
+    files = dict()
+    files[NEW] = list(hashes)
+    files[OLD] = []
+    files[CHANGES] = dict()
+    files[HASHES] = hashes
+    files[PARTIAL] = True
+    files[CHUNKS] = chunks
+    init = dict()
+    init[FILES] = files
+    init[MESSAGE] = INITIAL_COMMIT
+    commits = dict()
+    commits[INIT] = init
+    duckLogFile[COMMITS] = commits
+
+    # filling log
+    repo = Repository.create(path, duckLogFile, indent)
+
+    writeIndex(indexEntries, path)
+    return repo
+
+
+def writeTreeFiles(files: dict, path: str = PATH) -> None:
+    """
+    Writes the files `files` to the working tree of the duck repository at
+    `path`, see `commitTree`
+    """
+
+    for file, content in files.items():
+        filePath = join(path, file)
+        if content is None:
+            if exists(filePath):
+                remove(filePath)
+            continue
+        makedirs(dirname(filePath), exist_ok=True)
+        with open(filePath, "wb" if isinstance(content, bytes) else "w") as target:
+            target.write(content)
+    removeEmptyDirectories(
+        [file for file, content in files.items() if content is None], path
+    )
+
+
+def commitTree(
+    repo: Repository,
+    message: str,
+    files: Optional[dict] = None,
+    jobs: int = 1,
+    indent: bool = False,
+) -> dict:
+    """
+    Commits the current version of the working tree of the repository `repo`
+
+    PARAMETERS
+    ----------
+    - repo : Repository
+        - the duck repository, see `openRepository`
+    - message : str
+        - commit message
+    - files : dict[str, bytes | str | None] | None
+        - default = `None`
+        - content of the files changed since the latest commit, `None` for
+          deleted ones; they are written to the working tree and only they are
+          compared, so the tree is not scanned
+    - jobs : int
+        - number of worker processes used for diffing, see `diffFiles`
+    - indent : bool
+        - flag for indenting the log file
+
+    RETURNS
+    -------
+    - result : dict
+        - sha of the commit and the lists of `new`, `old` (deleted) and
+          `changes` (changed) files
+    """
+
+    path = repo.path
+    head = repo.head
+    timeline = repo.timeline
+
+    headFiles = repo.getCommitFiles(head)
+    headHashes = repo.getManifest(head)
+    newFiles = []
+    oldFiles = []
+
+    changeFiles = dict()
+    hashes = dict()
+    keyframes = []
+    chunks = dict()
+    commitName = f"commit-{len(timeline)}"
+    index = loadIndex(path)
+    config = repo.config
+    indexEntries = dict()
+
+    if files is None:
+        thisFiles = scanTree(path)
+        itrFiles = thisFiles | headFiles
+    else:
+        writeTreeFiles(files, path)
+        patterns = loadIgnorePatterns(path)
+        itrFiles = {
+            file
+            for file in files
+            if not isIgnored(file, basename(file), False, patterns)
+        }
+        thisFiles = {file for file in itrFiles if files[file] is not None}
+        # the other files are as they were in the latest commit
+        for file in headFiles - itrFiles:
+            thisFiles.add(file)
+            if file not in headHashes:
+                itrFiles.add(file)
+                continue
+            if file in index[FILES]:
+                indexEntries[file] = index[FILES][file]
+
+    diffableFiles = []
+    for file in sorted(itrFiles):
+        if file in thisFiles:
+            originalPath = join(path, file)
+            if file in headFiles:
+                if isFileUnchanged(file, index, path):
+                    indexEntries[file] = index[FILES][file]
+                    continue
+                fileHash = hashFile(originalPath)
+                # identical content needs no diff, only the touched files are
+                # listed in `changes` and the manifest
+                if fileHash == headHashes.get(file):
+                    indexEntries[file] = getIndexEntry(originalPath, fileHash)
+                    continue
+                # once stored in chunks a file stays so until it is deleted
+                if repo.getFileChunks(file, head) is not None or isChunkedFile(
+                    originalPath, config
+                ):
+                    hashes[file], chunks[file] = storeChunks(originalPath, path, config)
+                else:
+                    hashes[file] = fileHash
+                    diffableFiles.append(file)
+            else:
+                newFiles.append(file)
+                if isChunkedFile(originalPath, config):
+                    hashes[file], chunks[file] = storeChunks(originalPath, path, config)
+                else:
+                    hashes[file] = storeObject(originalPath, path, config)
+            indexEntries[file] = getIndexEntry(originalPath, hashes[file])
+        elif file in headFiles:
+            oldFiles.append(file)
+
+    for file, fileChangeLog in zip(
+        diffableFiles, diffFiles(diffableFiles, head, path, jobs)
+    ):
+        # without the previous version there is nothing to diff against, the
+        # file is stored in full as if it was added again
+        if fileChangeLog is None:
+            hashes[file] = storeObject(join(path, file), path, config)
+            newFiles.append(file)
+            continue
+        changeFiles[file] = fileChangeLog
+        # storing a full snapshot once the chain of deltas to replay gets too long
+        _, deltaCommitIndices = repo.getFileDeltaChain(file, head)
+        deltaSize = getChangeLogSize(fileChangeLog) + sum(
+            getChangeLogSize(repo.getStoredDelta(file, timeline[i]))
+            for i in deltaCommitIndices
+        )
+        if (
+            len(deltaCommitIndices) + 1 >= config[KEYFRAME_INTERVAL]
+            or deltaSize >= config[KEYFRAME_DELTA_SIZE]
+        ):
+            hashes[file] = storeObject(join(path, file), path, config)
+            keyframes.append(file)
+
+    thisCommitDict = dict()
+    thisCommitDict[MESSAGE] = message
+    thisCommitFilesDict = dict()
+    thisCommitFilesDict[NEW] = newFiles
+    thisCommitFilesDict[OLD] = oldFiles
+    thisCommitFilesDict[CHANGES] = changeFiles
+    thisCommitFilesDict[HASHES] = hashes
+    thisCommitFilesDict[PARTIAL] = True
+    thisCommitFilesDict[KEYFRAMES] = keyframes
+    thisCommitFilesDict[CHUNKS] = chunks
+    thisCommitDict[FILES] = thisCommitFilesDict
+    repo.addCommit(commitName, thisCommitDict, indent)
+    writeIndex(indexEntries, path)
+
+    return {
+        SHA: commitName,
+        NEW: [file for file in newFiles if file not in headFiles],
+        OLD: oldFiles,
+        CHANGES: sorted(set(changeFiles) | (set(chunks) | set(newFiles)) & headFiles),
+    }
+
+
+def commitSnapshots(
+    repo: Repository, snapshots: list, jobs: int = 1, indent: bool = False
+) -> list:
+    """
+    Commits a batch of snapshots of the working tree one after the other, see
+    `commitTree`
+
+    PARAMETERS
+    ----------
+    - repo : Repository
+        - the duck repository, see `openRepository`
+    - snapshots : list[tuple[str, dict]]
+        - commit message and changed files of each snapshot, in commit order
+    - jobs : int
+        - number of worker processes used for diffing, see `diffFiles`
+    - indent : bool
+        - flag for indenting the log file
+
+    RETURNS
+    -------
+    - results : list[dict]
+        - result of each commit, see `commitTree`
+    """
+
+    return [
+        commitTree(repo, message, files, jobs, indent) for message, files in snapshots
+    ]
+
+
+def rollbackTree(repo: Repository, commitSha: str, indent: bool = False) -> dict:
+    """
+    Rolls the working tree of the repository `repo` back to its version during
+    the commit `commitSha` and deletes every commit after that one
+
+    PARAMETERS
+    ----------
+    - repo : Repository
+        - the duck repository, see `openRepository`
+    - commitSha : str
+        - sha of the commit
+    - indent : bool
+        - flag for indenting the log file
+
+    RETURNS
+    -------
+    - result : dict
+        - sha of the commit and the lists of `removed`, `rewritten` and `lost`
+          files, the latter could not be restored and were left as they are
+
+    RAISES
+    ------
+    - DuckError
+        - if there is no commit `commitSha`
+    """
+
+    if commitSha not in repo.commits:
+        raise DuckError("Not a valid commit SHA")
+
+    path = repo.path
+    commitFiles = repo.getCommitFiles(commitSha)
+    commitHashes = repo.getManifest(commitSha)
+    thisFiles = scanTree(path)
+    index = loadIndex(path)
+    indexEntries = dict()
+
+    # deleting files that are not part of the commit, ignored files are left untouched
+    removedFiles = sorted(thisFiles - commitFiles)
+    for file in removedFiles:
+        remove(join(path, file))
+    removeEmptyDirectories(removedFiles, path)
+
+    # commits without a hash manifest are compared line by line
+    fileLines = repo.getFiles(
+        sorted(file for file in commitFiles & thisFiles if file not in commitHashes),
+        commitSha,
+    )
+
+    # only files whose content differs from the commit are rewritten, the rest
+    # keep their mtime
+    rewrittenFiles = []
+    for file in sorted(commitFiles):
+        filePath = join(path, file)
+        if file not in thisFiles:
+            rewrittenFiles.append(file)
+        elif file in commitHashes:
+            indexEntry = index[FILES].get(file)
+            if (
+                indexEntry is not None
+                and indexEntry[HASH] == commitHashes[file]
+                and isFileUnchanged(file, index, path)
+            ):
+                indexEntries[file] = index[FILES][file]
+            elif hashFile(filePath) == commitHashes[file]:
+                indexEntries[file] = getIndexEntry(filePath, commitHashes[file])
+            else:
+                rewrittenFiles.append(file)
+        else:
+            with open(filePath) as f:
+                sameContent = f.readlines() == fileLines[file]
+            if sameContent:
+                indexEntries[file] = getIndexEntry(filePath, hashFile(filePath))
+            else:
+                rewrittenFiles.append(file)
+
+    # the versions without a full copy are rebuilt in a single walk over the
+    # timeline instead of one per file
+    replayedFiles = [
+        file
+        for file in rewrittenFiles
+        if file not in fileLines and isRestoredByReplay(file, commitSha, repo)
+    ]
+    try:
+        fileLines.update(repo.getFiles(replayedFiles, commitSha))
+    except LostObjectError:
+        # rebuilt one by one, leaving the lost ones as they are
+        pass
+
+    lostFiles = []
+    for file in rewrittenFiles:
+        filePath = join(path, file)
+        try:
+            restoreFile(file, commitSha, filePath, repo, fileLines.get(file))
+        except LostObjectError:
+            # the working copy is kept, see `repairLinkedObject`
+            lostFiles.append(file)
+            continue
+        indexEntries[file] = getIndexEntry(
+            filePath, commitHashes[file] if file in commitHashes else hashFile(filePath)
+        )
+
+    deletableCommits = repo.rollbackTo(commitSha, indent)
+    for itr in deletableCommits:
+        try:
+            rmtree(join(path, ".duck", COMMITS, itr), ignore_errors=False, onerror=None)
+        except:
+            pass
+        # later commits reuse the sha, its cached provenance would be stale
+        rmtree(join(path, ".duck", BLAME, itr), ignore_errors=True)
+
+    writeIndex(indexEntries, path)
+    return {
+        SHA: commitSha,
+        "removed": removedFiles,
+        "rewritten": [file for file in rewrittenFiles if file not in lostFiles],
+        "lost": lostFiles,
+    }
+
+
+def readFile(repo: Repository, filename: str, commitSha: Optional[str] = None) -> bytes:
+    """
+    Returns the content of the file `filename` during the commit `commitSha`
+
+    PARAMETERS
+    ----------
+    - repo : Repository
+        - the duck repository, see `openRepository`
+    - filename : str
+        - name of the file
+    - commitSha : str | None
+        - default = `None`
+        - sha of the commit, the latest commit if not given
+
+    RETURNS
+    -------
+    - content : bytes
+        - content of the file
+
+    RAISES
+    ------
+    - DuckError
+        - if there is no commit `commitSha` or the file is not part of it
+    """
+
+    commitSha = repo.head if commitSha is None else commitSha
+    if commitSha not in repo.commits:
+        raise DuckError("Not a valid commit SHA")
+    if not repo.hasFile(filename, commitSha):
+        raise DuckError(f"{filename} does not exist in commit `{commitSha}`")
+
+    commitFiles = repo.commits[commitSha][FILES]
+    fileHash = repo.getFileHash(filename, commitSha)
+    chunkHashes = repo.getFileChunks(filename, commitSha)
+    if fileHash is not None and hasObject(fileHash, repo.path):
+        with openObject(fileHash, repo.path) as file:
+            return file.read()
+    if chunkHashes is not None:
+        content = bytearray()
+        for chunkHash in chunkHashes:
+            with openObject(chunkHash, repo.path) as file:
+                content += file.read()
+        return bytes(content)
+    if filename in commitFiles[NEW]:
+        with repo.openStoredFile(filename, commitSha) as file:
+            return file.read()
+    return "".join(repo.getFile(filename, commitSha)).encode()
+
+
+def getTreeStatus(repo: Repository, jobs: int = 1) -> dict:
+    """
+    Compares the working tree of the repository `repo` with the latest commit,
+    see `getStatus`
+
+    RETURNS
+    -------
+    - changes : dict[str, str]
+        - "A" for newly added, "D" for deleted and "M" for changed files
+    """
+
+    index = loadIndex(repo.path)
+    changes = getStatus(repo, scanTree(repo.path), index, jobs=jobs)
+    if index.get(REFRESHED):
+        writeIndex(index[FILES], repo.path)
+    return changes
+
+
+def diffFile(repo: Repository, filename: str, commitSha: Optional[str] = None) -> dict:
+    """
+    Compares the working copy of the file `filename` with its version during
+    the commit `commitSha`
+
+    PARAMETERS
+    ----------
+    - repo : Repository
+        - the duck repository, see `openRepository`
+    - filename : str
+        - name of the file
+    - commitSha : str | None
+        - default = `None`
+        - sha of the commit, the latest commit if not given
+
+    RETURNS
+    -------
+    - log : dict
+        - change log including the common lines, see `getFileChangeLog`
+
+    RAISES
+    ------
+    - DuckError
+        - if the file does not exist, is not part of the commit or is stored
+          in chunks
+    """
+
+    oldFileLines, curFileLines = readDiffVersions(repo, filename, commitSha)
+    return getFileChangeLog(
+        oldFileLines=oldFileLines, newFileLines=curFileLines, includeCommon=True
+    )
+
+
+def diffFileUnified(
+    repo: Repository,
+    filename: str,
+    commitSha: Optional[str] = None,
+    context: int = DEFAULT_DIFF_CONTEXT,
+):
+    """
+    Compares the working copy of the file `filename` with its version during
+    the commit `commitSha` as a unified diff, see `getUnifiedDiff`
+
+    RETURNS
+    -------
+    - hunks : Iterator[list[str]]
+        - lines of each hunk, starting with its `@@ -l,s +l,s @@` header
+
+    RAISES
+    ------
+    - DuckError
+        - like `diffFile`
+    """
+
+    return getUnifiedDiff(*readDiffVersions(repo, filename, commitSha), context)
+
+
+def diffFileStat(
+    repo: Repository, filename: str, commitSha: Optional[str] = None
+) -> tuple:
+    """
+    Counts the lines of the file `filename` deleted and added since the commit
+    `commitSha`, see `getDiffStat`
+
+    RAISES
+    ------
+    - DuckError
+        - like `diffFile`
+    """
+
+    return getDiffStat(*readDiffVersions(repo, filename, commitSha))
+
+
+def getDiffChunks(
+    repo: Repository, filename: str, commitSha: Optional[str] = None
+) -> Optional[list]:
+    """
+    Returns the hashes of the chunks of the file `filename` during the commit
+    `commitSha`, the latest commit if not given, see `Repository.getFileChunks`
+
+    RAISES
+    ------
+    - DuckError
+        - if the file is not part of the commit
+    """
+
+    commitSha = repo.head if commitSha is None else commitSha
+    if not repo.hasFile(filename, commitSha):
+        raise DuckError(f"{filename} does not exist in commit `{commitSha}`")
+    return repo.getFileChunks(filename, commitSha)
+
+
+def readDiffVersions(
+    repo: Repository, filename: str, commitSha: Optional[str] = None
+) -> tuple:
+    """
+    Returns the lines of the file `filename` during the commit `commitSha`, the
+    latest commit if not given, and of its working copy
+
+    RAISES
+    ------
+    - DuckError
+        - like `diffFile`
+    """
+
+    commitSha = repo.head if commitSha is None else commitSha
+    if not exists(join(repo.path, filename)):
+        raise DuckError(f"{filename} does not exist")
+    if commitSha not in repo.commits:
+        raise DuckError("Not a valid commit SHA")
+    oldFileLines = repo.getFile(filename, commitSha)
+    with open(join(repo.path, filename)) as file:
+        return oldFileLines, file.readlines()
+
+
+def getFileLog(repo: Repository, filename: str) -> list:
+    """
+    Lists the commits that added, changed or deleted the file `filename`
+
+    PARAMETERS
+    ----------
+    - repo : Repository
+        - the duck repository, see `openRepository`
+    - filename : str
+        - name of the file
+
+    RETURNS
+    -------
+    - entries : list[dict]
+        - latest first, the `sha`, `message` and `change` ("A", "D" or "M") of
+          each commit, with the `deleted` and `added` line counts of changes or
+          the `changedChunks` out of all `chunks` of files stored in chunks
+
+    RAISES
+    ------
+    - DuckError
+        - if the file was never committed
+    """
+
+    history = repo.getFileHistory(filename)
+    if len(history) == 0:
+        raise DuckError(f"{filename} was never committed")
+
+    entries = []
+    for touch in range(len(history) - 1, -1, -1):
+        commitSha = repo.timeline[history[touch]]
+        entry = {
+            SHA: commitSha,
+            MESSAGE: repo.getMessage(commitSha),
+            "change": repo.getFileChange(filename, commitSha),
+        }
+        chunkHashes = repo.getFileChunks(filename, commitSha)
+        if entry["change"] != "M":
+            pass
+        elif chunkHashes is not None:
+            previousChunks = repo.getFileChunks(
+                filename, repo.timeline[history[touch - 1]]
+            )
+            entry[CHUNKS] = len(chunkHashes)
+            entry["changedChunks"] = len(set(chunkHashes) - set(previousChunks or ()))
+        else:
+            entry["deleted"], entry["added"] = getFileDeltaCounts(
+                repo.getStoredDelta(filename, commitSha)
+            )
+            # commits of old repositories list unchanged files too
+            if entry["deleted"] == 0 and entry["added"] == 0:
+                continue
+        entries.append(entry)
+    return entries
+
+
+@profiled("blame")
+def blameFile(repo: Repository, filename: str, commitSha: Optional[str] = None) -> list:
+    """
+    Finds the commit that introduced each line of the file `filename` during
+    the commit `commitSha`
+
+    The provenance is built in one pass over the deltas of the file, starting
+    from the latest version of it cached before `commitSha` or from the commit
+    that last added it, and cached for the commit that last touched it, so a
+    blame after a new commit only applies the newest delta.
+
+    PARAMETERS
+    ----------
+    - repo : Repository
+        - the duck repository, see `openRepository`
+    - filename : str
+        - name of the file
+    - commitSha : str | None
+        - default = `None`
+        - sha of the commit, the latest commit if not given
+
+    RETURNS
+    -------
+    - lines : list[tuple[str, str]]
+        - sha of the commit that introduced each line and the line
+
+    RAISES
+    ------
+    - DuckError
+        - if there is no commit `commitSha`, the file is not part of it or is
+          stored in chunks
+    """
+
+    commitSha = repo.head if commitSha is None else commitSha
+    if commitSha not in repo.commits:
+        raise DuckError("Not a valid commit SHA")
+    if not repo.hasFile(filename, commitSha):
+        raise DuckError(f"{filename} does not exist in commit `{commitSha}`")
+    if repo.getFileChunks(filename, commitSha) is not None:
+        raise DuckError(f"{filename} is a binary or large file, it has no lines")
+
+    timeline = repo.timeline
+    history = repo.getFileHistory(filename)
+    touches = history[: bisect_right(history, repo.getPosition(commitSha))]
+    lastSha = timeline[touches[-1]]
+
+    # going back to the latest cached version or the commit that added the file
+    provenance, start = None, len(touches) - 1
+    while start >= 0:
+        touchSha = timeline[touches[start]]
+        provenance = loadBlame(filename, touchSha, repo.path)
+        if provenance is not None or repo.getFileChange(filename, touchSha) == "A":
+            break
+        start -= 1
+
+    cached = provenance is not None and start == len(touches) - 1
+    if provenance is None:
+        provenance = [touchSha] * len(repo.getFile(filename, touchSha))
+    for touch in touches[start + 1 :]:
+        touchSha = timeline[touch]
+        provenance = applyProvenanceDelta(
+            provenance, repo.getStoredDelta(filename, touchSha), touchSha
+        )
+    profileCount("deltas replayed", len(touches) - start - 1)
+    if not cached:
+        writeBlame(filename, lastSha, provenance, repo.path)
+
+    return list(zip(provenance, repo.getFile(filename, lastSha)))
+
+
+def getCommitInfo(repo: Repository, commitSha: str) -> dict:
+    """
+    Summarizes the commit `commitSha`
+
+    PARAMETERS
+    ----------
+    - repo : Repository
+        - the duck repository, see `openRepository`
+    - commitSha : str
+        - sha of the commit
+
+    RETURNS
+    -------
+    - info : dict
+        - `message`, `new` and `old` (deleted) files, the deleted and added line
+          counts of the `changes` of each changed file and the number of
+          `chunks` of each changed file stored in chunks
+
+    RAISES
+    ------
+    - DuckError
+        - if there is no commit `commitSha`
+    """
+
+    if commitSha not in repo.commits:
+        raise DuckError("Not a valid commit SHA")
+
+    commitFiles = repo.commits[commitSha][FILES]
+    changes = dict()
+    for file, fileChangeLog in commitFiles[CHANGES].items():
+        deletedCount, addedCount = getFileDeltaCounts(fileChangeLog)
+        if deletedCount != 0 or addedCount != 0:
+            changes[file] = [deletedCount, addedCount]
+    return {
+        MESSAGE: repo.getMessage(commitSha),
+        NEW: list(commitFiles[NEW]),
+        OLD: list(commitFiles[OLD]),
+        CHANGES: changes,
+        CHUNKS: {
+            file: len(chunkHashes)
+            for file, chunkHashes in commitFiles.get(CHUNKS, dict()).items()
+            if file not in commitFiles[NEW]
+        },
+    }
+
+
+def migrateRepository(
+    repo: Repository, storage: str, indent: bool = False
+) -> Repository:
+    """
+    Converts the repository `repo` between the JSON log file and the SQLite
+    database
+
+    PARAMETERS
+    ----------
+    - repo : Repository
+        - the duck repository, see `openRepository`
+    - storage : str
+        - storage to convert to, one of `STORAGES`
+    - indent : bool
+        - flag for indenting the log file
+
+    RETURNS
+    -------
+    - repo : Repository
+        - the repository reopened from its new storage
+
+    RAISES
+    ------
+    - DuckError
+        - if the storage is unknown
+    """
+
+    if storage not in STORAGES:
+        raise DuckError(f"Unknown storage `{storage}`")
+    if repo.config[STORAGE] == storage:
+        return repo
+
+    path = repo.path
+    storeLegacyCopies(repo)
+    log = repo.exportLog()
+    config = dict(repo.config)
+    config[STORAGE] = storage
+    duckDirPath = join(path, ".duck")
+    if storage == SQLITE:
+        writeDatabase(log, path)
+    else:
+        # a history index left behind by an earlier json storage is stale
+        if exists(join(duckDirPath, HISTORY_FILE_NAME)):
+            remove(join(duckDirPath, HISTORY_FILE_NAME))
+        atomicWrite(
+            join(duckDirPath, LOG_FILE_NAME), encodeLogFile(log, config, indent)
+        )
+        atomicWrite(join(duckDirPath, JOURNAL_FILE_NAME), b"")
+    # the config decides which storage is read, until it is written the old
+    # one is still complete
+    writeConfig(config, path)
+
+    if storage == SQLITE:
+        for name in (LOG_FILE_NAME, JOURNAL_FILE_NAME, HISTORY_FILE_NAME):
+            if exists(join(duckDirPath, name)):
+                remove(join(duckDirPath, name))
+        if exists(join(duckDirPath, COMMITS)):
+            rmtree(join(duckDirPath, COMMITS))
+    else:
+        repo.connection.close()
+        remove(join(duckDirPath, DATABASE_FILE_NAME))
+    return Repository.open(path, reload=True)
+
+
+def collectGarbage(
+    repo: Repository,
+    recompress: bool = False,
+    compression: Optional[str] = None,
+    compressionLevel: Optional[int] = None,
+    repack: bool = True,
+) -> dict:
+    """
+    Deletes the stored files no commit refers to anymore and packs the rest
+    into a single pack file
+
+    PARAMETERS
+    ----------
+    - repo : Repository
+        - the duck repository, see `openRepository`
+    - recompress : bool
+        - flag for rewriting all stored files with the configured codec
+    - compression : str | None
+        - new codec of the repository, one of `CODEC_SUFFIXES`
+    - compressionLevel : int | None
+        - new compression level of the repository
+    - repack : bool
+        - flag for consolidating all stored files into a single pack
+
+    RETURNS
+    -------
+    - result : dict
+        - number of `removed` and `recompressed` stored files
+
+    RAISES
+    ------
+    - DuckError
+        - if the codec is unknown, or compresses the objects of a repository
+          whose snapshot mode links them, see `initRepository`
+    """
+
+    path = repo.path
+    if compression is not None:
+        if compression not in CODEC_SUFFIXES:
+            raise DuckError(f"Unknown compression codec `{compression}`")
+        if repo.config[SNAPSHOT] != COPY and compression != NONE:
+            raise DuckError(
+                f"Snapshot mode `{repo.config[SNAPSHOT]}` needs `--compression none`"
+            )
+        repo.config[COMPRESSION] = compression
+    if compressionLevel is not None:
+        repo.config[COMPRESSION_LEVEL] = compressionLevel
+    if compression is not None or compressionLevel is not None:
+        writeConfig(repo.config, path)
+
+    commitsDirPath = join(path, ".duck", COMMITS)
+    if repack:
+        storeLegacyCopies(repo)
+    referencedHashes = repo.getReferencedHashes()
+
+    removedCount, recompressedCount = 0, 0
+    looseObjects = dict()
+    objectsDirPath = join(path, ".duck", OBJECTS)
+    for prefix in listdir(objectsDirPath) if exists(objectsDirPath) else []:
+        prefixDirPath = join(objectsDirPath, prefix)
+        for name in listdir(prefixDirPath):
+            fileHash = prefix + name.split(".")[0]
+            if fileHash not in referencedHashes or ".tmp-" in name:
+                remove(join(prefixDirPath, name))
+                removedCount += 1
+            elif name.endswith(LOST_SUFFIX):
+                continue
+            elif repack and (repo.config[SNAPSHOT] == COPY or "." in name):
+                # uncompressed snapshots share their data with the working tree,
+                # packing them would copy it
+                looseObjects[fileHash] = join(prefixDirPath, name)
+            elif recompress and recompressStoredFile(
+                getObjectPath(fileHash, path), repo.config
+            ):
+                recompressedCount += 1
+
+    if repack:
+        packedObjects = dict()
+        oldPacks = loadPacks(path)
+        for pack in oldPacks:
+            for fileHash in pack.hashes():
+                if fileHash not in referencedHashes:
+                    removedCount += 1
+                elif fileHash not in packedObjects:
+                    data, codec = pack.readRaw(fileHash)
+                    packedObjects[fileHash] = (bytes(data), codec)
+        for fileHash, objectPath in looseObjects.items():
+            codec = findStoredFile(getObjectPath(fileHash, path))[1]
+            with open(objectPath, "rb") as file:
+                packedObjects[fileHash] = (file.read(), codec)
+        if recompress:
+            for fileHash, (data, codec) in packedObjects.items():
+                packedObjects[fileHash] = (
+                    compress(decompress(data, codec), repo.config),
+                    repo.config[COMPRESSION],
+                )
+                recompressedCount += 1
+        oldPackPaths = [pack.packPath for pack in oldPacks]
+        newPackPath = writePack(packedObjects, path)
+        # the log file has to refer to the moved copies before they are deleted
+        repo.save()
+        for packPath in oldPackPaths:
+            if packPath != newPackPath:
+                remove(packPath[: -len(".pack")] + ".idx")
+                remove(packPath)
+        # reopened once the old packs are gone, so that none of them is cached
+        loadPacks(path, reload=True)
+        for objectPath in looseObjects.values():
+            remove(objectPath)
+        for prefix in listdir(objectsDirPath) if exists(objectsDirPath) else []:
+            if len(listdir(join(objectsDirPath, prefix))) == 0:
+                rmdir(join(objectsDirPath, prefix))
+        if exists(commitsDirPath):
+            rmtree(commitsDirPath)
+    elif recompress and exists(commitsDirPath):
+        # copies stored by repositories created before the object store
+        for commitSha in listdir(commitsDirPath):
+            for name in listdir(join(commitsDirPath, commitSha)):
+                storedPath = join(commitsDirPath, commitSha, name)
+                for suffix in CODEC_SUFFIXES.values():
+                    if suffix and name.endswith(suffix):
+                        storedPath = storedPath[: -len(suffix)]
+                if recompressStoredFile(storedPath, repo.config):
+                    recompressedCount += 1
+
+    # rewriting the log file with the configured codec
+    repo.save()
+    return {"removed": removedCount, "recompressed": recompressedCount}
+
+
+@profiled("check repository")
+def checkRepository(
+    repo: Repository, jobs: int = 1, every: int = 1, objects: bool = True
+) -> dict:
+    """
+    Verifies the repository `repo`: rebuilds the versions of every file along
+    the timeline (see `checkFileHistory`), checks the hash manifests (see
+    `checkManifests`) and every stored object (see `checkObject`)
+
+    PARAMETERS
+    ----------
+    - repo : Repository
+        - the duck repository, see `openRepository`
+    - jobs : int
+        - number of worker processes the files and objects are spread over
+    - every : int
+        - only the versions at every `every`th commit and the latest commit
+          are compared with their hashes
+    - objects : bool
+        - flag for checking the stored objects
+
+    RETURNS
+    -------
+    - result : dict
+        - number of `files`, `versions` and `objects` checked and the
+          `problems` found, each with its `sha`, `file` or `hash` and `problem`
+
+    RAISES
+    ------
+    - DuckError
+        - if `every` is not positive
+    """
+
+    if every < 1:
+        raise DuckError("--every has to be at least 1")
+
+    filenames = repo.getFilenames()
+    problems = checkManifests(repo)
+    versionCount = 0
+    for checkedCount, fileProblems in mapInProcesses(
+        _checkFileTask, [(filename, repo.path, every) for filename in filenames], jobs
+    ):
+        versionCount += checkedCount
+        problems.extend(fileProblems)
+
+    objectHashes = sorted(repo.getStoredHashes()) if objects else []
+    for fileHash, problem in zip(
+        objectHashes,
+        mapInProcesses(
+            _checkObjectTask, [(fileHash, repo.path) for fileHash in objectHashes], jobs
+        ),
+    ):
+        if problem is not None:
+            problems.append({HASH: fileHash, PROBLEM: problem})
+
+    profileCount("versions checked", versionCount)
+    profileCount("objects checked", len(objectHashes))
+    return {
+        FILES: len(filenames),
+        "versions": versionCount,
+        OBJECTS: len(objectHashes),
+        "problems": problems,
+    }
+
+
+def escapeMarkup(text: str) -> str:
+    """
+    Escapes `text`, e.g. a file name or a commit message, so that it is printed
+    as is by `richPrint` and `printTable` instead of being read as rich markup
+
+    In porcelain mode its brackets are swapped for `PORCELAIN_BRACKET`, which
+    `stripMarkup` swaps back after removing the tags, so the text is printed
+    byte for byte.
+    """
+
+    if PORCELAIN:
+        return text.replace("[", PORCELAIN_BRACKET)
+    from rich.markup import escape
+
+    return escape(text)
+
+
+def stripMarkup(text: str) -> str:
+    """
+    Removes the rich markup tags, e.g. `[red]` and `[/red]`, from `text`, leaving
+    the text escaped by `escapeMarkup` untouched
+    """
+
+    return MARKUP_TAG.sub("", text).replace(PORCELAIN_BRACKET, "[")
+
+
+@profiled("print output")
+def richPrint(*objects) -> None:
+    """
+    Prints `objects` to the console, rendering rich markup unless in porcelain mode
+
+    rich is only imported on the first call, so commands that print nothing pay
+    nothing for it.
+    """
+
+    if PORCELAIN:
+        print(*(stripMarkup(str(item)) for item in objects))
+        return None
+    from rich import print as _richPrint
+
+    _richPrint(*objects)
+    return None
+
+
+@profiled("print output")
+def printTable(columns: list, rows: list) -> None:
+    """
+    Prints a table to the console, as tab separated rows without the header in
+    porcelain mode
+
+    PARAMETERS
+    ----------
+    - columns : list[str]
+        - column headers
+    - rows : list[list[str]]
+        - cells of each row, may contain rich markup
+    """
+
+    if PORCELAIN:
+        for row in rows:
+            print("\t".join(stripMarkup(cell) for cell in row))
+        return None
+    from rich.console import Console
+    from rich.table import Table
+
+    table = Table(*columns)
+    for row in rows:
+        table.add_row(*row)
+    Console().print(table)
+    return None
+
+
+def chooseCommit(timeline: list) -> str:
+    """
+    Prompts the user to select one of the commits in `timeline`
+    """
+
+    from inquirer import List as inquirerList, prompt as inquirerPrompt
+
+    chosenCommit = [
+        inquirerList(
+            "commit",
+            message="Select commit for more information",
+            choices=timeline,
+        ),
+    ]
+    answer = inquirerPrompt(chosenCommit)
+    return answer["commit"]
+
+
+def printChunkDiff(
+    filename: str, storedChunks: Optional[list], path: str, config: dict
+) -> None:
+    """
+    Prints how many chunks of the binary or large file `filename` differ from
+    its committed version `storedChunks`, see `storeChunks`
+    """
+
+    _, chunkHashes = storeChunks(join(path, filename), path, config, store=False)
+    if storedChunks is None:
+        richPrint(
+            f"[magenta][INFO]\tBinary file {escapeMarkup(filename)} differs[/magenta]"
+        )
+        return None
+    changedCount = len(set(chunkHashes) - set(storedChunks))
+    richPrint(
+        f"[magenta][INFO]\t{escapeMarkup(filename)} is a binary or large file, {changedCount} of {len(chunkHashes)} chunks differ[/magenta]"
+    )
+    return None
+
+
+def writeUnifiedDiff(filename: str, commitSha: str, hunks) -> None:
+    """
+    Writes the hunks of a unified diff (see `getUnifiedDiff`) straight to the
+    standard output as they are made, colored if it is a terminal
+    """
+
+    color = not PORCELAIN and sys.stdout.isatty()
+    header = f"--- a/{filename}\t{commitSha}\n+++ b/{filename}\n"
+    headerWritten = False
+    for hunk in hunks:
+        if not headerWritten:
+            sys.stdout.write(f"\x1b[1m{header}{ANSI_RESET}" if color else header)
+            headerWritten = True
+        if color:
+            hunk = [
+                (
+                    f"{DIFF_COLORS[line[0]]}{line[:-1]}{ANSI_RESET}\n"
+                    if line[0] in DIFF_COLORS
+                    else line
+                )
+                for line in hunk
+            ]
+        sys.stdout.writelines(hunk)
+    sys.stdout.flush()
+    return None
+
+
+def printBlame(lines: list) -> None:
+    """
+    Writes each line of a blame (see `blameFile`) prefixed by the sha of the
+    commit that introduced it and its line number to the standard output, the
+    shas colored if it is a terminal
+    """
+
+    color = not PORCELAIN and sys.stdout.isatty()
+    shaWidth = max((len(lineSha) for lineSha, _ in lines), default=0)
+    numberWidth = len(str(len(lines)))
+    for batch in range(0, len(lines), DIFF_PRINT_BATCH):
+        output = []
+        for lineNumber, (lineSha, line) in enumerate(
+            lines[batch : batch + DIFF_PRINT_BATCH], batch + 1
+        ):
+            prefix = f"{lineSha:<{shaWidth}} {lineNumber:>{numberWidth}})"
+            if color:
+                prefix = f"{BLAME_COLOR}{prefix}{ANSI_RESET}"
+            if not line.endswith("\n"):
+                # the last line of a file may lack its newline
+                line += "\n"
+            output.append(f"{prefix} {line}")
+        sys.stdout.writelines(output)
+    sys.stdout.flush()
+    return None
+
+
+def printDiffStat(filename: str, deletedCount: int, addedCount: int) -> None:
+    """
+    Prints the deleted and added line counts of the file `filename` like
+    `git diff --stat`
+    """
+
+    changedCount = deletedCount + addedCount
+    if changedCount == 0:
+        richPrint(" 0 files changed")
+        return None
+    # the bar is scaled down to at most `DIFF_STAT_WIDTH` signs
+    scale = min(1, DIFF_STAT_WIDTH / changedCount)
+    pluses, minuses = round(addedCount * scale), round(deletedCount * scale)
+    richPrint(
+        f" {escapeMarkup(filename)} | {changedCount} [green]{'+' * pluses}[/green][red]{'-' * minuses}[/red]"
+    )
+    richPrint(
+        f" 1 file changed, {addedCount} insertions(+), {deletedCount} deletions(-)"
+    )
+    return None
+
+
+def finishProfile(profiler, report: bool, outputPath: Optional[str]) -> None:
     """
+    Prints the `--profile` report of the command and writes its cProfile
+    statistics to `outputPath`
 
-    duckDirPath = join(path, ".duck")
-    with open(join(duckDirPath, LOG_FILE_NAME), "r") as file:
-        duckLogFile = load(file)
-    timeline = duckLogFile[TIMELINE]
+    PARAMETERS
+    ----------
+    - profiler : cProfile.Profile | None
+        - profiler of the command, only started if `outputPath` is given
+    - report : bool
+        - flag for printing the phases and counters, see `Profile.report`
+    - outputPath : str | None
+        - file the statistics are written to, as JSON if it ends with `.json`
+          and in the `pstats` format (e.g. for snakeviz) otherwise
+    """
 
-    # finding first commit that includes this file `filename` before commit `commitSha`
-    firstCommitIndex = -1
-    thisCommitIndex = -1
-    for i in range(len(timeline) - 1, -1, -1):
-        if timeline[i] == commitSha:
-            firstCommitIndex = i
-            thisCommitIndex = i
-        if firstCommitIndex == -1:
-            continue
-        if doesFileExistsInThisCommit(filename, commitSha, duckLogFile):
-            firstCommitIndex = i
-        else:
-            break
+    # taken before the report, so printing it is not part of the statistics
+    statistics = PROFILE.toDict()
+    if profiler is not None:
+        profiler.disable()
+    if report:
+        PROFILE.report()
+    if profiler is None:
+        return None
+    if not outputPath.endswith(".json"):
+        profiler.dump_stats(outputPath)
+        return None
+    from pstats import Stats
 
-    if not exists(join(path, filename)):
-        error(f"[ERROR]\t{filename} does not exist in any commit", info=False)
+    functions = [
+        {
+            "file": file,
+            "line": line,
+            "function": function,
+            "calls": calls,
+            "primitiveCalls": primitiveCalls,
+            "totalSeconds": totalSeconds,
+            "cumulativeSeconds": cumulativeSeconds,
+        }
+        for (file, line, function), (
+            primitiveCalls,
+            calls,
+            totalSeconds,
+            cumulativeSeconds,
+            _,
+        ) in Stats(profiler).stats.items()
+    ]
+    functions.sort(key=lambda entry: -entry["cumulativeSeconds"])
+    with open(outputPath, "w") as file:
+        file.write(dumps(dict(statistics, functions=functions), indent=4))
+    return None
 
-    with open(join(duckDirPath, COMMITS, timeline[firstCommitIndex], filename)) as file:
-        lines = file.readlines()
-        # applying changes at each commit from first commit to this commit
-        for i in range(firstCommitIndex + 1, thisCommitIndex + 1):
-            fileChangeLog = duckLogFile[COMMITS][timeline[i]][FILES][CHANGES][filename]
-            # converting to common file
-            common = [
-                lines[i] for i in range(len(lines)) if str(i) not in fileChangeLog[DEL]
-            ]
-            # adding newly added lines of this commit
-            for change in fileChangeLog[ADD]:
-                common.insert(int(change), fileChangeLog[ADD][change])
-            lines = common
 
-    return lines
+@app.callback()
+def main(
+    porcelain: Annotated[
+        bool,
+        Option(
+            help="Flag indicating whether to print plain text meant for scripts instead of rich tables"
+        ),
+    ] = False,
+    profile: Annotated[
+        bool,
+        Option(
+            help="Flag indicating whether to print the time spent in each phase of the command and counters of the work it did"
+        ),
+    ] = False,
+    profileOutput: Annotated[
+        Optional[str],
+        Option(
+            "--profile-output",
+            help="File the cProfile statistics of the command are written to, as JSON if it ends with `.json` and in the pstats format otherwise",
+        ),
+    ] = None,
+) -> None:
+    """
+    Duck, a version control system.
+    """
+
+    global PORCELAIN, PROFILE
+    PORCELAIN = porcelain
+    if profile or profileOutput is not None:
+        PROFILE = Profile()
+        profiler = None
+        if profileOutput is not None:
+            from cProfile import Profile as CProfile
+
+            profiler = CProfile()
+            profiler.enable()
+        # also runs when the command exits through `error`
+        atExit(finishProfile, profiler, profile, profileOutput)
+    return None
 
 
 @app.command()
@@ -213,56 +5312,56 @@ def init(
             help="Flag indicating whether to indent the log file `.duck/duck.log.json`"
         ),
     ] = False,
+    keyframeInterval: Annotated[
+        int,
+        Option(
+            "--keyframe-interval",
+            help="Number of deltas after which a full snapshot of a file is stored",
+        ),
+    ] = DEFAULT_CONFIG[KEYFRAME_INTERVAL],
+    keyframeDeltaSize: Annotated[
+        int,
+        Option(
+            "--keyframe-delta-size",
+            help="Size in bytes of deltas after which a full snapshot of a file is stored",
+        ),
+    ] = DEFAULT_CONFIG[KEYFRAME_DELTA_SIZE],
+    compression: Annotated[
+        str,
+        Option(help="Codec used for stored files and the log file [none|zlib|lzma]"),
+    ] = DEFAULT_CONFIG[COMPRESSION],
+    compressionLevel: Annotated[
+        int, Option("--compression-level", help="Compression level of the codec")
+    ] = DEFAULT_CONFIG[COMPRESSION_LEVEL],
+    storage: Annotated[
+        str,
+        Option(help="Where the commits are stored [json|sqlite]"),
+    ] = DEFAULT_CONFIG[STORAGE],
+    snapshot: Annotated[
+        str,
+        Option(help="How files are stored without compression [copy|reflink|hardlink]"),
+    ] = DEFAULT_CONFIG[SNAPSHOT],
 ) -> None:
     """
     Initializes the directory at the path `path` as the duck repository.
     """
 
-    if not exists(path):
-        error("[ERROR]\tInvalid path found", info=False)
-    duckDirPath = join(path, ".duck")
-    try:
-        # deletes the ./duck dir if any
-        rmtree(duckDirPath, ignore_errors=False, onerror=None)
-    except:
-        pass
-
-    duckCommitsDirPath = join(duckDirPath, COMMITS)
-    initCommitDirPath = join(duckCommitsDirPath, INIT)
-    mkdir(duckDirPath)
-    mkdir(duckCommitsDirPath)
-    mkdir(initCommitDirPath)
-
-    duckLogFile = dict()
-    duckLogFile[HEAD] = INIT
-    duckLogFile[TIMELINE] = [INIT]
-    files = dict()
-    # TODO(#1): add support for recursively intializing the directories ↴
-    files[NEW] = [file for file in listdir(path) if isfile(join(path, file))]
-    files[OLD] = []
-    files[CHANGES] = dict()
-    init = dict()
-    init[FILES] = files
-    init[MESSAGE] = INITIAL_COMMIT
-    commits = dict()
-    commits[INIT] = init
-    duckLogFile[COMMITS] = commits
-
-    # filling log
-    with open(join(duckDirPath, LOG_FILE_NAME), "w") as log:
-        dump(duckLogFile, log, indent=4 if indent else 0)
-
-    # copying files
-    fileCount = 0
-    for file in listdir(path):
-        if isfile(join(path, file)):
-            originalPath = join(path, file)
-            copiedPath = join(initCommitDirPath, file)
-            copyfile(originalPath, copiedPath)
-            fileCount += 1
+    repo = initRepository(
+        path,
+        {
+            KEYFRAME_INTERVAL: keyframeInterval,
+            KEYFRAME_DELTA_SIZE: keyframeDeltaSize,
+            COMPRESSION: compression,
+            COMPRESSION_LEVEL: compressionLevel,
+            STORAGE: storage,
+            SNAPSHOT: snapshot,
+        },
+        indent,
+    )
+    fileCount = len(repo.commits[INIT][FILES][HASHES])
 
     richPrint(
-        f"[blue][COOKIE]\tInitialized {fileCount} files in directory `{path}`[/blue]"
+        f"[blue][COOKIE]\tInitialized {fileCount} files in directory `{escapeMarkup(path)}`[/blue]"
     )
 
     return None
@@ -278,80 +5377,29 @@ def commit(
             help="Flag indicating whether to indent the log file `.duck/duck.log.json`"
         ),
     ] = False,
+    jobs: Annotated[
+        int, Option("--jobs", "-j", help="Number of processes used for diffing files")
+    ] = cpu_count()
+    or 1,
 ) -> None:
     """
     Commits the current version of the directory at the path `path`.
     """
 
     # TODO(#2): Add support for not commiting if no changes are present
-    duckDirPath = join(path, ".duck")
-    duckLogFilePath = join(duckDirPath, LOG_FILE_NAME)
-
-    if not exists(duckLogFilePath):
-        error(f"[ERROR]\tFirst init the repository using `{EXECUTABLE} init`")
+    result = commitTree(openRepository(path), message, jobs=jobs, indent=indent)
 
-    with open(duckLogFilePath, "r") as file:
-        duckLogFile = load(file)
-
-    head = duckLogFile[HEAD]
-    timeline = duckLogFile[TIMELINE]
-    commitHead = duckLogFile[COMMITS][head]
-
-    # TODO(#1): add support for recursively intializing the directories ↴
-
-    thisFiles = [file for file in listdir(path) if isfile(join(path, file))]
-    headFiles = commitHead[FILES][NEW]
-    headFiles.extend([file for file in commitHead[FILES][CHANGES]])
-    itrFiles = set(thisFiles + headFiles)
-    newFiles = []
-    oldFiles = []
-
-    changeFiles = dict()
-    commitName = f"commit-{len(timeline)}"
-    thisCommitDirPath = join(duckDirPath, COMMITS, commitName)
-    mkdir(thisCommitDirPath)
-
-    for file in itrFiles:
-        if file in thisFiles:
-            if file in headFiles:
-                with open(join(path, file)) as f:
-                    thisFileLines = f.readlines()
-                    fileChangeLog = getFileChangeLog(
-                        applyCommitToFile(file, head, path), thisFileLines
-                    )
-                    if fileChangeLog[ADD] != 0 or fileChangeLog[DEL] != 0:
-                        changeFiles[file] = fileChangeLog
-            else:
-                newFiles.append(file)
-                originalPath = join(path, file)
-                copiedPath = join(thisCommitDirPath, file)
-                copyfile(originalPath, copiedPath)
-        elif file in headFiles:
-            oldFiles.append(file)
-
-    duckLogFile[TIMELINE].append(commitName)
-    duckLogFile[HEAD] = commitName
-    thisCommitDict = dict()
-    thisCommitDict[MESSAGE] = message
-    thisCommitFilesDict = dict()
-    thisCommitFilesDict[NEW] = newFiles
-    thisCommitFilesDict[OLD] = oldFiles
-    thisCommitFilesDict[CHANGES] = changeFiles
-    thisCommitDict[FILES] = thisCommitFilesDict
-    duckLogFile[COMMITS][commitName] = thisCommitDict
-
-    with open(duckLogFilePath, "w") as file:
-        dump(duckLogFile, file, indent=4 if indent else 0)
-
-    console = Console()
-    commitTable = Table("Commit SHA", commitName)
-    commitTable.add_row("Commit Message", message)
-    commitTable.add_row("Committed in directory", path)
-    commitTable.add_row(
-        "Changed [Deleted, Added, Updated] files",
-        f"[[red]{len(oldFiles)}[/red], [green]{len(newFiles)}[/green], [yellow]{len(thisFiles) - len(oldFiles) - len(newFiles)}[/yellow]]",
+    printTable(
+        ["Commit SHA", result[SHA]],
+        [
+            ["Commit Message", escapeMarkup(message)],
+            ["Committed in directory", escapeMarkup(path)],
+            [
+                "Changed [Deleted, Added, Updated] files",
+                f"[[red]{len(result[OLD])}[/red], [green]{len(result[NEW])}[/green], [yellow]{len(result[CHANGES])}[/yellow]]",
+            ],
+        ],
     )
-    console.print(commitTable)
 
     return None
 
@@ -370,64 +5418,21 @@ def rollback(
     """
     Rolls back to the version of the directory during a particular commit and deletes everything after that commit.
     """
-    duckLogFilePath = join(path, ".duck/duck.log.json")
-
-    if not exists(duckLogFilePath):
-        error(f"[ERROR]\tFirst init the repository using `{EXECUTABLE} init`")
 
-    with open(duckLogFilePath, "r") as file:
-        duckLogFile = load(file)
+    repo = openRepository(path)
 
     if commit is None:
-        chosenCommit = [
-            inquirerList(
-                "commit",
-                message="Select commit for more information",
-                choices=duckLogFile[TIMELINE],
-            ),
-        ]
-        answer = inquirerPrompt(chosenCommit)
-        commit = answer["commit"]
-
-    if commit not in duckLogFile[COMMITS]:
-        error("Not a valid commit SHA", info=False)
-
-    commitDict = duckLogFile[COMMITS][commit]
-
-    for file in listdir(path):
-        if file != ".duck":
-            try:
-                rmtree(join(path, file), ignore_errors=False, onerror=None)
-            except:
-                pass
-
-    for file in commitDict[FILES][NEW]:
-        originalPath = join(path, ".duck", COMMITS, commit, file)
-        copiedPath = join(path, file)
-        copyfile(originalPath, copiedPath)
-
-    for file in commitDict[FILES][CHANGES]:
-        with open(join(path, file), "w") as outputFile:
-            outputFile.writelines(applyCommitToFile(file, commit, path))
-
-    duckLogFile[HEAD] = commit
-    persistentCommits = duckLogFile[TIMELINE][: duckLogFile[TIMELINE].index(commit) + 1]
-    deletableCommits = duckLogFile[TIMELINE][duckLogFile[TIMELINE].index(commit) + 1 :]
-    duckLogFile[TIMELINE] = persistentCommits
-    commitsDict = dict()
-    for itr in duckLogFile[TIMELINE]:
-        commitsDict[itr] = duckLogFile[COMMITS][itr]
-    duckLogFile[COMMITS] = commitsDict
-    for itr in deletableCommits:
-        try:
-            rmtree(join(path, ".duck", COMMITS, itr), ignore_errors=False, onerror=None)
-        except:
-            pass
+        commit = chooseCommit(repo.timeline)
 
-    with open(join(path, ".duck", LOG_FILE_NAME), "w") as log:
-        dump(duckLogFile, log, indent=4 if indent else 0)
+    result = rollbackTree(repo, commit, indent)
 
-    richPrint(f"[blue][COOKIE]\tSuccessfully rolled back to commit `{commit}` [/blue]")
+    richPrint(
+        f"[blue][COOKIE]\tSuccessfully rolled back to commit `{escapeMarkup(commit)}` (removed {len(result['removed'])}, rewrote {len(result['rewritten'])} files)[/blue]"
+    )
+    for file in result["lost"]:
+        richPrint(
+            f"[red][WARNING]\tThe version of `{escapeMarkup(file)}` was lost through a hardlink of the working tree, the file was left as it is[/red]"
+        )
 
     return None
 
@@ -439,51 +5444,142 @@ def diff(
     number: Annotated[
         bool, Option(help="Flag indicating whether to show line numbers or not")
     ] = False,
+    commit: Annotated[
+        Optional[str],
+        Option(help="Commit sha to compare with, the latest commit by default"),
+    ] = None,
+    unified: Annotated[
+        bool,
+        Option(
+            "--unified",
+            "-u",
+            help="Flag indicating whether to stream a unified diff of the changed lines only",
+        ),
+    ] = False,
+    context: Annotated[
+        Optional[int],
+        Option(
+            "--context",
+            "-U",
+            help=f"Number of unchanged lines around each change of the unified diff, implies `--unified` [default: {DEFAULT_DIFF_CONTEXT}]",
+        ),
+    ] = None,
+    stat: Annotated[
+        bool,
+        Option(
+            help="Flag indicating whether to only count the deleted and added lines"
+        ),
+    ] = False,
 ) -> None:
     """
-    Spits out the difference between the current file version with the latest committed version.
+    Spits out the difference between the current file version with a committed version.
     """
 
-    # TODO(#4): Add parameter commit which can help compare current file with that commited version.
-
-    duckLogFilePath = join(path, ".duck", LOG_FILE_NAME)
-
-    if not exists(duckLogFilePath):
-        error(f"[ERROR]\tFirst init the repository using `{EXECUTABLE} init`")
-
-    with open(duckLogFilePath, "r") as file:
-        duckLogFile = load(file)
-
+    if not isRepository(path):
+        raise NotARepositoryError(
+            f"First init the repository using `{EXECUTABLE} init`"
+        )
     if not exists(join(path, filename)):
-        error(f"[ERROR]\t{filename} does not exist", info=False)
+        raise DuckError(f"{filename} does not exist")
 
-    with open(join(path, filename)) as file:
-        curFileLines = file.readlines()
+    if unified or context is not None or stat:
+        repo = Repository.open(path)
+        storedChunks = getDiffChunks(repo, filename, commit)
+        if storedChunks is not None or isChunkedFile(join(path, filename), repo.config):
+            printChunkDiff(filename, storedChunks, path, repo.config)
+        elif stat:
+            printDiffStat(filename, *diffFileStat(repo, filename, commit))
+        else:
+            hunks = diffFileUnified(
+                repo,
+                filename,
+                commit,
+                DEFAULT_DIFF_CONTEXT if context is None else context,
+            )
+            writeUnifiedDiff(filename, commit or repo.head, hunks)
+        return None
 
-    fileChangeLog = getFileChangeLog(
-        oldFileLines=applyCommitToFile(filename, duckLogFile[HEAD], path),
-        newFileLines=curFileLines,
-        includeCommon=True,
-    )
+    request = {COMMAND: "diff", FILENAME: filename}
+    if commit is not None:
+        request[COMMIT] = commit
+    # the daemon does not answer for files stored in chunks
+    response = None
+    if not isChunkedFile(join(path, filename), loadConfig(path)):
+        response = queryDaemon(request, path)
+    if response is not None and CHANGE_LOG in response:
+        fileChangeLog = response[CHANGE_LOG]
+        # JSON object keys are strings
+        for key in (DEL, ADD):
+            fileChangeLog[key] = {
+                int(i): line for i, line in fileChangeLog[key].items()
+            }
+    else:
+        repo = Repository.open(path)
+        storedChunks = getDiffChunks(repo, filename, commit)
+        if storedChunks is not None or isChunkedFile(join(path, filename), repo.config):
+            printChunkDiff(filename, storedChunks, path, repo.config)
+            return None
+        fileChangeLog = diffFile(repo, filename, commit)
 
-    comColor = 0
-    delColor = 1
-    addColor = 2
     colorArray = ["white", "red", "green"]
     SymbolArray = ["===", "---", "+++"]
 
-    out = [(comColor, line) for line in fileChangeLog[COM]]
-    for itr in fileChangeLog[DEL]:
-        out.insert(itr, (delColor, fileChangeLog[DEL][itr]))
-    for itr in fileChangeLog[ADD]:
-        out.insert(itr, (addColor, fileChangeLog[ADD][itr]))
-
-    for i, itr in enumerate(out):
-        line = itr[1].rstrip("\n")
-        richPrint(
+    # printed in batches, rendering every line on its own is slow
+    out = []
+    for i, itr in enumerate(iterChangeLogLines(fileChangeLog)):
+        line = escapeMarkup(itr[1].rstrip("\n"))
+        out.append(
             f"[{colorArray[itr[0]]}]{SymbolArray[itr[0]]}{ f' {i}' if number else ''}\t{line}[/{colorArray[itr[0]]}]"
         )
+        if len(out) == DIFF_PRINT_BATCH:
+            richPrint("\n".join(out))
+            out = []
+    if out:
+        richPrint("\n".join(out))
+
+    return None
 
+
+@app.command()
+def log(
+    filename: Annotated[str, Argument(help="Name of the file")],
+    path: Annotated[str, Option(help="Path to the duck repository `.duck`")] = PATH,
+) -> None:
+    """
+    Lists the commits that added, changed or deleted a file, latest first.
+    """
+
+    entries = getFileLog(openRepository(path), filename)
+
+    rows = []
+    for entry in entries:
+        if entry["change"] == "A":
+            change = "[green]added[/green]"
+        elif entry["change"] == "D":
+            change = "[red]deleted[/red]"
+        elif CHUNKS in entry:
+            change = f"changed [yellow]{entry['changedChunks']} of {entry[CHUNKS]} chunks[/yellow]"
+        else:
+            change = f"changed [[red]{entry['deleted']}[/red], [green]{entry['added']}[/green]]"
+        rows.append([entry[SHA], escapeMarkup(entry[MESSAGE]), change])
+    printTable(["Commit SHA", "Message", "Change [Deleted, Added]"], rows)
+    return None
+
+
+@app.command()
+def blame(
+    filename: Annotated[str, Argument(help="Name of the file")],
+    path: Annotated[str, Option(help="Path to the duck repository `.duck`")] = PATH,
+    commit: Annotated[
+        Optional[str],
+        Option(help="Commit sha of the version to blame, the latest commit by default"),
+    ] = None,
+) -> None:
+    """
+    Spits out each line of a committed file along with the commit that introduced it.
+    """
+
+    printBlame(blameFile(openRepository(path), filename, commit))
     return None
 
 
@@ -496,124 +5592,296 @@ def info(
     Spits info of the mentioned commit to the console.
     """
 
-    duckLogFilePath = join(path, ".duck/duck.log.json")
+    repo = openRepository(path)
 
-    if not exists(duckLogFilePath):
-        error(f"[ERROR]\tFirst init the repository using `{EXECUTABLE} init`")
+    if commit is None:
+        commit = chooseCommit(repo.timeline)
 
-    with open(duckLogFilePath, "r") as file:
-        duckLogFile = load(file)
+    commitInfo = getCommitInfo(repo, commit)
 
-    if commit is None:
-        chosenCommit = [
-            inquirerList(
-                "commit",
-                message="Select commit for more information",
-                choices=duckLogFile[TIMELINE],
-            ),
+    richPrint(f"Message: [blue]{escapeMarkup(commitInfo[MESSAGE])}[/blue]")
+    printTable(
+        ["Newly added files"], [[escapeMarkup(file)] for file in commitInfo[NEW]]
+    )
+    printTable(["Deleted files"], [[escapeMarkup(file)] for file in commitInfo[OLD]])
+    changedFileRows = [
+        [
+            escapeMarkup(file),
+            f"[[red]{deletedCount}[/red], [green]{addedCount}[/green]]",
         ]
-        answer = inquirerPrompt(chosenCommit)
-        commit = answer["commit"]
-
-    if commit not in duckLogFile[COMMITS]:
-        error("Not a valid commit SHA", info=False)
-
-    commitDict = duckLogFile[COMMITS][commit]
-
-    console = Console()
-
-    richPrint(f"Message: [blue]{commitDict['message']}[/blue]")
-    newFilesTable = Table("Newly added files")
-    for file in commitDict[FILES][NEW]:
-        newFilesTable.add_row(file)
-    console.print(newFilesTable)
-    oldFilesTable = Table("Deleted files")
-    for file in commitDict[FILES][OLD]:
-        oldFilesTable.add_row(file)
-    console.print(oldFilesTable)
-    changedFileTable = Table("Files", "Changes")
-    for file in commitDict[FILES][CHANGES]:
-        if (
-            len(commitDict[FILES][CHANGES][file][DEL]) == 0
-            and len(commitDict[FILES][CHANGES][file][ADD]) == 0
-        ):
-            continue
-        changedFileTable.add_row(
-            file,
-            f"[[red]{len(commitDict[FILES][CHANGES][file][DEL])}[/red], [green]{len(commitDict[FILES][CHANGES][file][ADD])}[/green]]",
+        for file, (deletedCount, addedCount) in commitInfo[CHANGES].items()
+    ]
+    for file, chunkCount in commitInfo[CHUNKS].items():
+        changedFileRows.append(
+            [escapeMarkup(file), f"[yellow]{chunkCount} chunks[/yellow]"]
         )
-    console.print(changedFileTable)
+    printTable(["Files", "Changes"], changedFileRows)
     return None
 
 
 @app.command()
 def status(
     path: Annotated[str, Option(help="Path to the duck repository `.duck`")] = PATH,
+    jobs: Annotated[
+        int, Option("--jobs", "-j", help="Number of processes used for diffing files")
+    ] = cpu_count()
+    or 1,
 ) -> None:
     """
     Compares the files in current version of repository with the files in the latest committed version.
     """
 
-    duckLogFilePath = join(path, ".duck", LOG_FILE_NAME)
-
-    if not exists(duckLogFilePath):
-        error(f"[ERROR]\tFirst init the repository using `{EXECUTABLE} init`")
-
-    with open(duckLogFilePath, "r") as file:
-        duckLogFile = load(file)
+    if not isRepository(path):
+        raise NotARepositoryError(
+            f"First init the repository using `{EXECUTABLE} init`"
+        )
 
-    head = duckLogFile[HEAD]
-    commitHead = duckLogFile[COMMITS][head]
-    thisFiles = [file for file in listdir(path) if isfile(join(path, file))]
-    headFiles = commitHead[FILES][NEW]
-    headFiles.extend([file for file in commitHead[FILES][CHANGES]])
-    itrFiles = set(thisFiles + headFiles)
-    newFiles = []
-    oldFiles = []
-    changedFiles = []
+    # a running `duck watch` already knows the answer
+    response = queryDaemon({COMMAND: "status"}, path)
+    if response is not None and CHANGES_BY_FILE in response:
+        changes = response[CHANGES_BY_FILE]
+    else:
+        changes = getTreeStatus(Repository.open(path), jobs)
+    newFiles = sorted(file for file, code in changes.items() if code == "A")
+    oldFiles = sorted(file for file, code in changes.items() if code == "D")
+    changedFiles = sorted(file for file, code in changes.items() if code == "M")
 
-    for file in itrFiles:
-        if file in thisFiles:
-            if file in headFiles:
-                with open(join(path, file)) as f:
-                    thisFileLines = f.readlines()
-                    fileChangeLog = getFileChangeLog(
-                        applyCommitToFile(file, head, path), thisFileLines
-                    )
-                    if len(fileChangeLog[ADD]) != 0 or len(fileChangeLog[DEL]) != 0:
-                        changedFiles.append(file)
-            else:
-                newFiles.append(file)
-        elif file in headFiles:
-            oldFiles.append(file)
+    if PORCELAIN:
+        # one `<A|D|M>\t<file>` line per change and nothing for a clean tree, like
+        # `git status --porcelain`
+        for code, files in (("A", newFiles), ("D", oldFiles), ("M", changedFiles)):
+            for file in files:
+                print(f"{code}\t{file}")
+        return None
 
     if len(newFiles) == 0 and len(oldFiles) == 0 and len(changedFiles) == 0:
         richPrint("[blue][COOKIE]\tNothing to commit; everything up to date[/blue]")
         return None
 
-    console = Console()
-
     if len(newFiles) != 0:
-        newFilesTable = Table("Newly Added Files")
-        for file in newFiles:
-            newFilesTable.add_row(f"[red]{file}[/red]")
-        console.print(newFilesTable)
+        printTable(
+            ["Newly Added Files"],
+            [[f"[red]{escapeMarkup(file)}[/red]"] for file in newFiles],
+        )
     if len(oldFiles) != 0:
-        oldFilesTable = Table("Deleted Files")
-        for file in oldFiles:
-            oldFilesTable.add_row(f"[red]{file}[/red]")
-        console.print(oldFilesTable)
+        printTable(
+            ["Deleted Files"],
+            [[f"[red]{escapeMarkup(file)}[/red]"] for file in oldFiles],
+        )
     if len(changedFiles) != 0:
-        changedFileTable = Table("Changed Files")
-        for file in changedFiles:
-            changedFileTable.add_row(f"[red]{file}[/red]")
-        console.print(changedFileTable)
+        printTable(
+            ["Changed Files"],
+            [[f"[red]{escapeMarkup(file)}[/red]"] for file in changedFiles],
+        )
     richPrint(
         f"[magenta][INFO]\tType `{EXECUTABLE} commit --help` for info on how to commit[/magenta]"
     )
     return None
 
 
+@app.command()
+def migrate(
+    storage: Annotated[str, Argument(help="Storage to convert to [json|sqlite]")],
+    path: Annotated[str, Option(help="Path to the duck repository `.duck`")] = PATH,
+    indent: Annotated[
+        bool,
+        Option(
+            help="Flag indicating whether to indent the log file `.duck/duck.log.json`"
+        ),
+    ] = False,
+) -> None:
+    """
+    Converts the repository between the JSON log file and the SQLite database.
+    """
+
+    repo = openRepository(path)
+    if repo.config[STORAGE] == storage:
+        richPrint(f"[blue][COOKIE]\tAlready stored in {storage}[/blue]")
+        return None
+
+    repo = migrateRepository(repo, storage, indent)
+
+    richPrint(
+        f"[blue][COOKIE]\tMigrated {len(repo.timeline)} commits to {storage}[/blue]"
+    )
+    return None
+
+
+@app.command()
+def watch(
+    path: Annotated[str, Option(help="Path to the duck repository `.duck`")] = PATH,
+    jobs: Annotated[
+        int, Option("--jobs", "-j", help="Number of processes used for diffing files")
+    ] = cpu_count()
+    or 1,
+    poll: Annotated[
+        bool,
+        Option(
+            help="Flag indicating whether to poll the tree instead of using inotify"
+        ),
+    ] = False,
+    interval: Annotated[
+        float, Option(help="Seconds between two scans of the tree when polling")
+    ] = WATCH_POLL_INTERVAL,
+) -> None:
+    """
+    Watches the repository and answers `status` and `diff` from memory until interrupted.
+    """
+
+    openRepository(path)
+    socketPath = join(path, ".duck", WATCH_SOCKET_NAME)
+    if queryDaemon({COMMAND: "status"}, path) is not None:
+        raise DuckError("Already watched by another `duck watch`")
+
+    watcher = None
+    if not poll:
+        try:
+            watcher = InotifyWatcher(path)
+        except (OSError, AttributeError):
+            richPrint("[magenta][INFO]\tinotify is not available, polling[/magenta]")
+    if watcher is None:
+        watcher = PollingWatcher(path)
+    cache = StatusCache(path, jobs)
+
+    from selectors import DefaultSelector, EVENT_READ
+    from socket import socket, AF_UNIX, SOCK_STREAM
+
+    if exists(socketPath):
+        remove(socketPath)
+    server = socket(AF_UNIX, SOCK_STREAM)
+    server.bind(socketPath)
+    server.listen()
+    selector = DefaultSelector()
+    selector.register(server, EVENT_READ)
+    if watcher.fileno() is not None:
+        selector.register(watcher.fileno(), EVENT_READ)
+    # `kill` stops the daemon as cleanly as ^C
+    signal(SIGTERM, lambda *_: exit(0))
+
+    richPrint(f"[blue][COOKIE]\tWatching {escapeMarkup(path)}[/blue]")
+    try:
+        while True:
+            events = selector.select(None if watcher.fileno() is not None else interval)
+            # the pending changes are applied before answering, so a request
+            # never sees the tree as it was before a write that already returned
+            try:
+                cache.update(*watcher.changes())
+            except Exception as exception:
+                # until an update succeeds the clients are told to scan the tree
+                richPrint(
+                    f"[red][ERROR]\tUpdating the status failed: {escapeMarkup(repr(exception))}[/red]"
+                )
+            for key, _ in events:
+                if key.fileobj is not server:
+                    continue
+                try:
+                    _answerClient(server.accept()[0], cache)
+                except Exception as exception:
+                    richPrint(
+                        f"[red][ERROR]\tAnswering a client failed: {escapeMarkup(repr(exception))}[/red]"
+                    )
+    except KeyboardInterrupt:
+        pass
+    finally:
+        selector.close()
+        server.close()
+        watcher.close()
+        if exists(socketPath):
+            remove(socketPath)
+    return None
+
+
+@app.command()
+def gc(
+    path: Annotated[str, Option(help="Path to the duck repository `.duck`")] = PATH,
+    recompress: Annotated[
+        bool,
+        Option(
+            help="Flag indicating whether to rewrite all stored files with the configured codec"
+        ),
+    ] = False,
+    compression: Annotated[
+        Optional[str],
+        Option(help="Changes the codec of the repository [none|zlib|lzma]"),
+    ] = None,
+    compressionLevel: Annotated[
+        Optional[int],
+        Option(
+            "--compression-level",
+            help="Changes the compression level of the repository",
+        ),
+    ] = None,
+    repack: Annotated[
+        bool,
+        Option(
+            help="Flag indicating whether to consolidate all stored files into a single pack"
+        ),
+    ] = True,
+) -> None:
+    """
+    Deletes stored files no commit refers to anymore, packs the rest into a single pack file and optionally recompresses them.
+    """
+
+    result = collectGarbage(
+        openRepository(path), recompress, compression, compressionLevel, repack
+    )
+
+    richPrint(
+        f"[blue][COOKIE]\tRemoved {result['removed']} and recompressed {result['recompressed']} stored files[/blue]"
+    )
+    return None
+
+
+@app.command()
+def fsck(
+    path: Annotated[str, Option(help="Path to the duck repository `.duck`")] = PATH,
+    jobs: Annotated[
+        int,
+        Option(
+            "--jobs",
+            "-j",
+            help="Number of processes used for checking files and objects",
+        ),
+    ] = cpu_count()
+    or 1,
+    every: Annotated[
+        int,
+        Option(
+            help="Only compares the versions at every nth commit and the latest commit with their hashes"
+        ),
+    ] = 1,
+    objects: Annotated[
+        bool,
+        Option(help="Flag indicating whether to check every stored object too"),
+    ] = True,
+) -> None:
+    """
+    Rebuilds every version of every file and checks it against the hash recorded by its commit.
+    """
+
+    result = checkRepository(openRepository(path), jobs, every, objects)
+    problems = result["problems"]
+
+    if len(problems) != 0:
+        printTable(
+            ["Commit SHA", "File", "Problem"],
+            [
+                [
+                    escapeMarkup(problem.get(SHA) or ""),
+                    escapeMarkup(problem.get(FILENAME) or problem.get(HASH)),
+                    f"[red]{escapeMarkup(problem[PROBLEM])}[/red]",
+                ]
+                for problem in problems
+            ],
+        )
+        raise DuckError(f"Found {len(problems)} problems")
+
+    richPrint(
+        f"[blue][COOKIE]\tChecked {result['versions']} versions of {result[FILES]} files and {result[OBJECTS]} objects, no problems found[/blue]"
+    )
+    return None
+
+
 def error(message, info=True):
     """
     Prints error to the console
@@ -637,4 +5905,10 @@ def error(message, info=True):
 
 
 if __name__ == "__main__":
-    app()
+    try:
+        app()
+    except DuckError as exception:
+        error(
+            f"[ERROR]\t{escapeMarkup(str(exception))}",
+            info=isinstance(exception, NotARepositoryError),
+        )
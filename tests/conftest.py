@@ -0,0 +1,120 @@
+from json import dumps
+from os import makedirs
+from os.path import join, dirname, realpath
+from subprocess import run, PIPE
+import sys
+
+import pytest
+
+ROOT = dirname(dirname(realpath(__file__)))
+DUCK = join(ROOT, "duck.py")
+sys.path.insert(0, ROOT)
+
+import duck
+
+
+def writeFiles(path: str, files: dict) -> None:
+    """
+    Writes `files`, a map of relative paths to their text content, under `path`
+    """
+
+    for filename, content in files.items():
+        makedirs(dirname(join(path, filename)), exist_ok=True)
+        with open(join(path, filename), "w") as file:
+            file.write(content)
+
+
+def readText(path: str, filename: str) -> str:
+    with open(join(path, filename)) as file:
+        return file.read()
+
+
+def runDuck(path: str, *args: str, porcelain: bool = True):
+    """
+    Runs duck with `args` on the repository at `path` in a new process, like a
+    user would, and returns the completed process
+    """
+
+    command = [sys.executable, DUCK] + (["--porcelain"] if porcelain else [])
+    return run(
+        command + list(args) + ["--path", path], stdout=PIPE, stderr=PIPE, text=True
+    )
+
+
+@pytest.fixture
+def repoPath(tmp_path) -> str:
+    """
+    Path of an initialized duck repository with a few files in a subdirectory
+    """
+
+    path = str(tmp_path / "repo")
+    writeFiles(
+        path,
+        {
+            "a.txt": "one\ntwo\nthree\n",
+            "b.txt": "alpha\nbeta\n",
+            join("src", "c.txt"): "x = 1\ny = 2\n",
+        },
+    )
+    duck.initRepository(path)
+    return path
+
+
+@pytest.fixture
+def legacyRepoPath(tmp_path) -> str:
+    """
+    Path of a repository in the format written by the first versions of duck:
+    an uncompressed log without hash manifests, `del`/`add` change logs, full
+    copies under `.duck/commits` and the changed files of every commit but the
+    latest appended to its `new` list
+    """
+
+    path = str(tmp_path / "legacy")
+    writeFiles(
+        path,
+        {
+            "f.txt": "a\nb\nc\nd\ne\n",
+            "g.txt": "x\n",
+            "h.txt": "n\n",
+            join(".duck", "commits", "commit-init", "f.txt"): "a\nb\nc\n",
+            join(".duck", "commits", "commit-init", "g.txt"): "x\n",
+            join(".duck", "commits", "commit-2", "h.txt"): "n\n",
+        },
+    )
+    makedirs(join(path, ".duck", "commits", "commit-1"))
+    unchanged = {"del": {}, "add": {}}
+    log = {
+        "head": "commit-2",
+        "timeline": ["commit-init", "commit-1", "commit-2"],
+        "commits": {
+            "commit-init": {
+                "files": {"new": ["f.txt", "g.txt"], "old": [], "changes": {}},
+                "message": "initial commit",
+            },
+            "commit-1": {
+                "message": "one",
+                "files": {
+                    "new": ["f.txt", "g.txt"],
+                    "old": [],
+                    "changes": {
+                        "f.txt": {"del": {}, "add": {"3": "d\n"}},
+                        "g.txt": unchanged,
+                    },
+                },
+            },
+            "commit-2": {
+                "message": "two",
+                "files": {
+                    "new": ["h.txt"],
+                    "old": [],
+                    "changes": {
+                        "f.txt": {"del": {}, "add": {"4": "e\n"}},
+                        "g.txt": unchanged,
+                    },
+                },
+            },
+        },
+    }
+    with open(join(path, ".duck", "duck.log.json"), "w") as file:
+        file.write(dumps(log, indent=0))
+    return path
@@ -0,0 +1,149 @@
+import pytest
+
+from conftest import duck, runDuck, writeFiles
+
+
+@pytest.mark.parametrize("mode", [[], ["--unified"], ["--stat"]])
+def test_diff_of_an_unknown_commit(repoPath, mode):
+    result = runDuck(repoPath, "diff", "a.txt", "--commit", "nope", *mode)
+    assert result.returncode == 1
+    assert result.stdout == "[ERROR]\ta.txt does not exist in commit `nope`\n"
+    assert result.stderr == ""
+
+
+@pytest.mark.parametrize("mode", [[], ["--unified"], ["--stat"]])
+def test_diff_of_an_uncommitted_file(repoPath, mode):
+    writeFiles(repoPath, {"new.txt": "new\n"})
+    result = runDuck(repoPath, "diff", "new.txt", *mode)
+    assert result.returncode == 1
+    assert result.stdout == "[ERROR]\tnew.txt does not exist in commit `commit-init`\n"
+
+
+def test_diff_of_a_missing_file(repoPath):
+    result = runDuck(repoPath, "diff", "missing.txt")
+    assert result.returncode == 1
+    assert result.stdout == "[ERROR]\tmissing.txt does not exist\n"
+
+
+BRACKETED = "[v2] [wip] fix [red]x[/red] \\[bold]"
+
+
+def test_porcelain_prints_file_names_as_is(repoPath):
+    writeFiles(repoPath, {"new[draft].txt": "draft\n", "b.txt": "[red]beta[/red]\n"})
+    assert runDuck(repoPath, "status").stdout == "A\tnew[draft].txt\nM\tb.txt\n"
+    assert runDuck(repoPath, "diff", "b.txt").stdout == (
+        "+++\t[red]beta[/red]\n---\talpha\n---\tbeta\n"
+    )
+
+
+def test_porcelain_prints_commit_messages_as_is(repoPath):
+    writeFiles(repoPath, {"new[draft].txt": "draft\n"})
+    assert runDuck(repoPath, "commit", BRACKETED).returncode == 0
+    result = runDuck(repoPath, "log", "new[draft].txt")
+    assert result.stdout == f"commit-1\t{BRACKETED}\tadded\n"
+    result = runDuck(repoPath, "info", "commit-1")
+    assert result.stdout == f"Message: {BRACKETED}\nnew[draft].txt\n"
+
+
+def test_rich_output_prints_user_text_as_is(repoPath):
+    writeFiles(repoPath, {"new[draft].txt": "draft\n"})
+    assert "new[draft].txt" in runDuck(repoPath, "status", porcelain=False).stdout
+    assert runDuck(repoPath, "commit", BRACKETED, porcelain=False).returncode == 0
+    result = runDuck(repoPath, "info", "commit-1", porcelain=False)
+    assert f"Message: {BRACKETED}\n" in result.stdout
+
+
+@pytest.mark.parametrize("porcelain", [True, False])
+def test_escaped_markup_round_trips(monkeypatch, porcelain):
+    from rich.markup import render
+
+    monkeypatch.setattr(duck, "PORCELAIN", porcelain)
+    for text in [BRACKETED, "new[draft].txt", "a\\[red]b", "[/]", "x[#1]"]:
+        markup = f"[red]{duck.escapeMarkup(text)}[/red]"
+        if porcelain:
+            assert duck.stripMarkup(markup) == text
+        else:
+            assert render(markup).plain == text
+
+
+NOT_A_REPOSITORY = (
+    "[ERROR]\tFirst init the repository using `python duck.py init`\n"
+    "[INFO]\tType `python duck.py --help`\n"
+)
+
+
+@pytest.mark.parametrize(
+    "command",
+    [
+        ["commit", "message"],
+        ["rollback", "commit-init"],
+        ["diff", "a.txt"],
+        ["log", "a.txt"],
+        ["blame", "a.txt"],
+        ["info", "commit-init"],
+        ["status"],
+        ["migrate", "sqlite"],
+        ["watch", "--poll"],
+        ["gc"],
+        ["fsck"],
+    ],
+)
+def test_commands_outside_a_repository(tmp_path, command):
+    writeFiles(str(tmp_path), {"a.txt": "a\n"})
+    result = runDuck(str(tmp_path), *command)
+    assert result.returncode == 1
+    assert result.stdout == NOT_A_REPOSITORY
+    assert not (tmp_path / ".duck").exists()
+
+
+HARDLINKED = {duck.COMPRESSION: duck.NONE, duck.SNAPSHOT: duck.HARDLINK}
+
+
+@pytest.mark.parametrize(
+    "command, message, settings",
+    [
+        (["rollback", "nope"], "Not a valid commit SHA", None),
+        (["info", "nope"], "Not a valid commit SHA", None),
+        (["blame", "a.txt", "--commit", "nope"], "Not a valid commit SHA", None),
+        (["blame", "new.txt"], "new.txt does not exist in commit `commit-init`", None),
+        (["log", "new.txt"], "new.txt was never committed", None),
+        (["migrate", "xml"], "Unknown storage `xml`", None),
+        (["gc", "--compression", "rar"], "Unknown compression codec `rar`", None),
+        (["fsck", "--every", "0"], "--every has to be at least 1", None),
+        (
+            ["gc", "--compression", "zlib"],
+            "Snapshot mode `hardlink` needs `--compression none`",
+            HARDLINKED,
+        ),
+    ],
+)
+def test_invalid_arguments(repoPath, command, message, settings):
+    if settings is not None:
+        duck.initRepository(repoPath, settings)
+    config = duck.loadConfig(repoPath)
+    result = runDuck(repoPath, *command)
+    assert result.returncode == 1
+    assert result.stdout == f"[ERROR]\t{message}\n"
+    assert duck.loadConfig(repoPath) == config
+    assert runDuck(repoPath, "fsck").returncode == 0
+
+
+@pytest.mark.parametrize(
+    "option, message",
+    [
+        (["--compression", "rar"], "Unknown compression codec `rar`"),
+        (["--storage", "xml"], "Unknown storage `xml`"),
+        (["--snapshot", "symlink"], "Unknown snapshot mode `symlink`"),
+    ],
+)
+def test_init_with_invalid_settings(tmp_path, option, message):
+    result = runDuck(str(tmp_path), "init", *option)
+    assert result.returncode == 1
+    assert result.stdout.startswith(f"[ERROR]\t{message}\n")
+    assert not (tmp_path / ".duck").exists()
+
+
+def test_init_of_a_missing_directory(tmp_path):
+    result = runDuck(str(tmp_path / "missing"), "init")
+    assert result.returncode == 1
+    assert result.stdout.startswith("[ERROR]\tInvalid path found\n")
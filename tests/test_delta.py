@@ -0,0 +1,60 @@
+from json import dumps, loads
+from random import Random
+
+import pytest
+
+from conftest import duck
+
+
+def randomEdit(random: Random, lines: list) -> list:
+    """
+    Returns a copy of `lines` with a few lines deleted, inserted and duplicated
+    """
+
+    lines = list(lines)
+    for _ in range(random.randrange(1, 6)):
+        position = random.randrange(len(lines) + 1)
+        choice = random.random()
+        if lines and choice < 0.4:
+            del lines[min(position, len(lines) - 1) :][: random.randrange(1, 4)]
+        elif lines and choice < 0.6:
+            lines.insert(position, random.choice(lines))
+        else:
+            lines.insert(position, f"line {random.random()}\n")
+    return lines
+
+
+def storedAsJson(delta: dict) -> dict:
+    # the log file turns the line numbers of `add`/`del` change logs into strings
+    return loads(dumps(delta))
+
+
+PAIRS = [([], []), ([], ["a\n"]), (["a\n"], []), (["a\n", "b\n"], ["b\n", "a\n"])]
+random = Random(0)
+for _ in range(50):
+    old = [f"{random.randrange(8)}\n" for _ in range(random.randrange(30))]
+    PAIRS.append((old, randomEdit(random, old)))
+
+
+@pytest.mark.parametrize("algorithm", sorted(duck.DIFF_ALGORITHMS))
+@pytest.mark.parametrize("old, new", PAIRS)
+def test_deltas_round_trip(algorithm, old, new):
+    delta = storedAsJson(duck.getFileDelta(old, new, algorithm))
+    assert duck.applyFileDelta(old, delta) == new
+
+
+@pytest.mark.parametrize("algorithm", sorted(duck.DIFF_ALGORITHMS))
+@pytest.mark.parametrize("old, new", PAIRS)
+def test_change_logs_of_older_versions_round_trip(algorithm, old, new):
+    changeLog = duck.getFileChangeLog(old, new, algorithm=algorithm)
+    changeLog = storedAsJson(
+        {duck.DEL: changeLog[duck.DEL], duck.ADD: changeLog[duck.ADD]}
+    )
+    delta = storedAsJson(duck.getFileDelta(old, new, algorithm))
+    assert duck.applyFileDelta(old, changeLog) == new
+    assert duck.getFileDeltaCounts(changeLog) == duck.getFileDeltaCounts(delta)
+
+    provenance = [f"commit-{i}" for i in range(len(old))]
+    assert duck.applyProvenanceDelta(
+        provenance, changeLog, "commit-new"
+    ) == duck.applyProvenanceDelta(provenance, delta, "commit-new")
@@ -0,0 +1,69 @@
+from os import replace
+from os.path import join
+
+import pytest
+
+from conftest import duck, readText, runDuck, writeFiles
+
+
+@pytest.fixture
+def linkedRepoPath(tmp_path) -> str:
+    """
+    Path of a repository whose objects are hardlinked to the working tree, with
+    a keyframe for every change so that changed files are linked as well
+    """
+
+    path = str(tmp_path / "linked")
+    writeFiles(path, {"f.txt": "a\n", "g.txt": "x\n"})
+    duck.initRepository(
+        path,
+        {
+            duck.COMPRESSION: duck.NONE,
+            duck.SNAPSHOT: duck.HARDLINK,
+            duck.KEYFRAME_INTERVAL: 1,
+        },
+    )
+    return path
+
+
+def appendText(path: str, filename: str, text: str) -> None:
+    with open(join(path, filename), "a") as file:
+        file.write(text)
+
+
+def test_a_lost_version_does_not_abort(linkedRepoPath):
+    appendText(linkedRepoPath, "f.txt", "b\n")
+    assert runDuck(linkedRepoPath, "status").stdout == "M\tf.txt\n"
+
+    result = runDuck(linkedRepoPath, "commit", "edited")
+    assert result.returncode == 0
+    assert "[0, 0, 1]" in result.stdout
+    assert runDuck(linkedRepoPath, "status").stdout == ""
+
+    result = runDuck(linkedRepoPath, "fsck")
+    assert result.returncode == 1
+    assert "lost" in result.stdout
+
+    result = runDuck(linkedRepoPath, "rollback", "commit-init")
+    assert result.returncode == 0
+    assert "[WARNING]" in result.stdout
+    assert readText(linkedRepoPath, "f.txt") == "a\nb\n"
+    assert readText(linkedRepoPath, "g.txt") == "x\n"
+    assert runDuck(linkedRepoPath, "gc", "--repack").returncode == 0
+
+
+def test_a_damaged_version_is_rebuilt_from_its_delta(linkedRepoPath):
+    writeFiles(linkedRepoPath, {"f.new": "a\nb\n"})
+    replace(join(linkedRepoPath, "f.new"), join(linkedRepoPath, "f.txt"))
+    assert runDuck(linkedRepoPath, "commit", "replaced").returncode == 0
+    appendText(linkedRepoPath, "f.txt", "c\n")
+
+    assert runDuck(linkedRepoPath, "commit", "edited").returncode == 0
+    result = runDuck(linkedRepoPath, "fsck")
+    assert result.returncode == 0, result.stdout
+    repo = duck.Repository.open(linkedRepoPath, reload=True)
+    assert duck.readFile(repo, "f.txt", "commit-1") == b"a\nb\n"
+    assert duck.readFile(repo, "f.txt", "commit-2") == b"a\nb\nc\n"
+
+    assert runDuck(linkedRepoPath, "rollback", "commit-1").returncode == 0
+    assert readText(linkedRepoPath, "f.txt") == "a\nb\n"
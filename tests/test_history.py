@@ -0,0 +1,144 @@
+from hashlib import sha256
+from os import remove
+from os.path import exists
+from random import Random
+
+import pytest
+
+from conftest import duck, writeFiles
+
+INITIAL_FILES = {
+    "a.txt": "one\ntwo\nthree\n",
+    "b.txt": "alpha\nbeta\n",
+    "src/c.txt": "x = 1\ny = 2\n",
+}
+
+
+def randomHistory(seed: int, commitCount: int = 12) -> list:
+    """
+    Returns the changed files of `commitCount` random commits on top of
+    `INITIAL_FILES`: lines inserted and deleted, files added and deleted
+    """
+
+    random = Random(seed)
+    files = dict(INITIAL_FILES)
+    snapshots = []
+    for commitIndex in range(commitCount):
+        changes = dict()
+        for filename in sorted(files):
+            if random.random() < 0.3:
+                lines = files[filename].splitlines(keepends=True)
+                position = random.randrange(len(lines) + 1)
+                if lines and random.random() < 0.5:
+                    del lines[min(position, len(lines) - 1)]
+                else:
+                    lines.insert(position, f"line {commitIndex} {random.random()}\n")
+                changes[filename] = "".join(lines)
+        if random.random() < 0.3:
+            changes[f"new{commitIndex}.txt"] = f"added {commitIndex}\n"
+        if len(files) > 2 and random.random() < 0.2:
+            changes[random.choice(sorted(files))] = None
+        for filename, content in changes.items():
+            if content is None:
+                files.pop(filename, None)
+            else:
+                files[filename] = content
+        snapshots.append((f"commit {commitIndex}", changes, dict(files)))
+    return snapshots
+
+
+@pytest.fixture(params=[duck.JSON, duck.SQLITE])
+def historyRepo(request, tmp_path):
+    """
+    A repository with a random history, with the files of every commit
+    """
+
+    path = str(tmp_path / "history")
+    writeFiles(path, INITIAL_FILES)
+    repo = duck.initRepository(
+        path, {duck.STORAGE: request.param, duck.KEYFRAME_INTERVAL: 4}
+    )
+    versions = {duck.INIT: dict(INITIAL_FILES)}
+    for message, changes, files in randomHistory(len(request.param)):
+        result = duck.commitTree(repo, message, changes)
+        versions[result[duck.SHA]] = files
+    return repo, versions
+
+
+def assertVersions(repo, versions: dict) -> None:
+    for commitSha, files in versions.items():
+        assert repo.getCommitFiles(commitSha) == set(files)
+        assert repo.getManifest(commitSha) == {
+            filename: sha256(content.encode()).hexdigest()
+            for filename, content in files.items()
+        }
+        for filename, content in files.items():
+            assert duck.readFile(repo, filename, commitSha) == content.encode()
+            assert "".join(repo.getFile(filename, commitSha)) == content
+        rebuilt = repo.getFiles(sorted(files), commitSha)
+        assert {
+            filename: "".join(lines) for filename, lines in rebuilt.items()
+        } == files
+
+
+def test_every_version_round_trips(historyRepo):
+    repo, versions = historyRepo
+    assertVersions(repo, versions)
+    assert duck.checkRepository(repo)["problems"] == []
+
+
+def test_manifests_only_list_the_touched_files(historyRepo):
+    repo, versions = historyRepo
+    for commitSha in repo.timeline[1:]:
+        commitFiles = repo.commits[commitSha][duck.FILES]
+        touchedFiles = set(commitFiles[duck.NEW]) | set(commitFiles[duck.CHANGES])
+        assert commitFiles[duck.PARTIAL]
+        assert set(commitFiles[duck.HASHES]) == touchedFiles
+
+
+def test_migrating_keeps_every_version(historyRepo):
+    repo, versions = historyRepo
+    other = duck.SQLITE if repo.config[duck.STORAGE] == duck.JSON else duck.JSON
+    migrated = duck.migrateRepository(repo, other)
+    assert migrated.config[duck.STORAGE] == other
+    assertVersions(migrated, versions)
+    back = duck.migrateRepository(migrated, repo.config[duck.STORAGE])
+    assertVersions(back, versions)
+    assert duck.checkRepository(back)["problems"] == []
+
+
+def test_rollback_restores_every_version(historyRepo):
+    repo, versions = historyRepo
+    for commitSha in reversed(repo.timeline[:-1:3]):
+        duck.rollbackTree(repo, commitSha)
+        assert repo.head == commitSha
+        assert duck.getTreeStatus(repo) == dict()
+        for filename, content in versions[commitSha].items():
+            with open(f"{repo.path}/{filename}") as file:
+                assert file.read() == content
+
+
+def test_the_json_history_index_is_saved_and_kept_up_to_date(tmp_path):
+    path = str(tmp_path / "saved")
+    writeFiles(path, INITIAL_FILES)
+    repo = duck.initRepository(path, {duck.JOURNAL_COMPACT_EVERY: 3})
+    versions = {duck.INIT: dict(INITIAL_FILES)}
+    for message, changes, files in randomHistory(7):
+        versions[duck.commitTree(repo, message, changes)[duck.SHA]] = files
+    duck.rollbackTree(repo, repo.timeline[5])
+    for message, changes, files in randomHistory(8, commitCount=4):
+        duck.commitTree(repo, message, changes)
+    assert exists(repo.historyFilePath)
+
+    reopened = duck.Repository.open(path, reload=True)
+    saved = {
+        filename: reopened.getFileHistory(filename)
+        for filename in reopened.getFilenames()
+    }
+    remove(reopened.historyFilePath)
+    rebuilt = duck.Repository.open(path, reload=True)
+    assert saved == {
+        filename: rebuilt.getFileHistory(filename)
+        for filename in rebuilt.getFilenames()
+    }
+    assertVersions(rebuilt, {sha: versions[sha] for sha in rebuilt.timeline[:6]})
@@ -0,0 +1,31 @@
+from os import stat, utime
+from os.path import join
+
+from conftest import duck, runDuck, writeFiles
+
+
+def test_files_modified_as_the_index_was_written_are_compared(repoPath):
+    index = duck.loadIndex(repoPath)
+    entry = index[duck.FILES]["a.txt"]
+    # same size, mtime and inode, as if modified in the tick the index was written
+    with open(join(repoPath, "a.txt"), "r+") as file:
+        file.write("ONE")
+    utime(join(repoPath, "a.txt"), ns=(entry[duck.MTIME], entry[duck.MTIME]))
+    utime(
+        join(repoPath, ".duck", duck.INDEX_FILE_NAME),
+        ns=(entry[duck.MTIME], entry[duck.MTIME]),
+    )
+    assert runDuck(repoPath, "status").stdout == "M\ta.txt\n"
+
+
+def test_the_index_is_stamped_by_its_mtime(repoPath):
+    writeFiles(repoPath, {"new.txt": "n\n"})
+    assert runDuck(repoPath, "commit", "new").returncode == 0
+    indexPath = join(repoPath, ".duck", duck.INDEX_FILE_NAME)
+    index = duck.loadIndex(repoPath)
+    assert index[duck.TIMESTAMP] == stat(indexPath).st_mtime_ns
+    assert all(
+        entry[duck.MTIME] <= index[duck.TIMESTAMP]
+        for entry in index[duck.FILES].values()
+    )
+    assert runDuck(repoPath, "status").stdout == ""
@@ -0,0 +1,65 @@
+import pytest
+
+from conftest import duck, readText, runDuck, writeFiles
+
+VERSIONS = {
+    "commit-init": {"f.txt": "a\nb\nc\n", "g.txt": "x\n"},
+    "commit-1": {"f.txt": "a\nb\nc\nd\n", "g.txt": "x\n"},
+    "commit-2": {"f.txt": "a\nb\nc\nd\ne\n", "g.txt": "x\n", "h.txt": "n\n"},
+}
+
+
+def assertVersions(repo) -> None:
+    for commitSha, files in VERSIONS.items():
+        for filename, content in files.items():
+            assert duck.readFile(repo, filename, commitSha).decode() == content
+
+
+def test_every_version_is_read(legacyRepoPath):
+    assertVersions(duck.openRepository(legacyRepoPath))
+
+
+def test_status_of_an_unchanged_tree_is_clean(legacyRepoPath):
+    result = runDuck(legacyRepoPath, "status")
+    assert result.returncode == 0
+    assert result.stdout == ""
+
+
+def test_status_and_diff_of_a_changed_file(legacyRepoPath):
+    writeFiles(legacyRepoPath, {"f.txt": "a\nb\nc\nd\ne\nf\n"})
+    assert runDuck(legacyRepoPath, "status").stdout == "M\tf.txt\n"
+    result = runDuck(legacyRepoPath, "diff", "f.txt", "--stat")
+    assert result.returncode == 0
+    assert "1 insertions(+), 0 deletions(-)" in result.stdout
+
+
+def test_blame(legacyRepoPath):
+    lines = duck.blameFile(duck.openRepository(legacyRepoPath), "f.txt")
+    assert [sha for sha, _ in lines] == ["commit-init"] * 3 + ["commit-1", "commit-2"]
+
+
+def test_commit_on_top_of_a_legacy_history(legacyRepoPath):
+    repo = duck.openRepository(legacyRepoPath)
+    duck.commitTree(repo, "three", {"f.txt": "a\nc\nd\ne\n", "h.txt": "n\nm\n"})
+    assert duck.readFile(repo, "f.txt").decode() == "a\nc\nd\ne\n"
+    assert duck.readFile(repo, "h.txt").decode() == "n\nm\n"
+    assertVersions(duck.openRepository(legacyRepoPath))
+    assert duck.checkRepository(repo)["problems"] == []
+
+
+def test_rollback(legacyRepoPath):
+    repo = duck.openRepository(legacyRepoPath)
+    duck.rollbackTree(repo, "commit-1")
+    assert readText(legacyRepoPath, "f.txt") == "a\nb\nc\nd\n"
+    with pytest.raises(FileNotFoundError):
+        readText(legacyRepoPath, "h.txt")
+
+
+def test_gc_moves_the_copies_into_the_object_store(legacyRepoPath):
+    duck.collectGarbage(duck.openRepository(legacyRepoPath))
+    assertVersions(duck.Repository.open(legacyRepoPath, reload=True))
+
+
+def test_migrate_to_sqlite(legacyRepoPath):
+    repo = duck.migrateRepository(duck.openRepository(legacyRepoPath), duck.SQLITE)
+    assertVersions(repo)
@@ -0,0 +1,58 @@
+import sys
+from os.path import dirname, exists, join
+from subprocess import run, PIPE
+
+from conftest import ROOT, duck, writeFiles
+
+
+def test_optional_modules_are_imported_lazily():
+    modules = ["concurrent.futures", "mmap", "socket", "gzip"]
+    result = run(
+        [
+            sys.executable,
+            "-c",
+            f"import duck, sys; print([m for m in {modules} if m in sys.modules])",
+        ],
+        cwd=ROOT,
+        stdout=PIPE,
+        text=True,
+    )
+    assert result.stdout == "[]\n"
+
+
+def test_a_single_task_runs_in_this_process():
+    # a lambda can not be sent to a worker process
+    assert duck.mapInProcesses(lambda task: task * 2, [21], jobs=4) == [42]
+    assert duck.mapInProcesses(lambda task: task, [], jobs=4) == []
+
+
+def test_objects_are_synced_before_the_commit_record(repoPath, monkeypatch):
+    events = []
+    monkeypatch.setattr(duck, "syncDirectory", events.append)
+
+    def recordingOpen(filePath, *args, **kwargs):
+        if str(filePath).endswith(duck.JOURNAL_FILE_NAME):
+            events.append(duck.JOURNAL_FILE_NAME)
+        return open(filePath, *args, **kwargs)
+
+    monkeypatch.setattr(duck, "open", recordingOpen, raising=False)
+    writeFiles(repoPath, {"new.txt": "new\n"})
+    repo = duck.openRepository(repoPath)
+    duck.commitTree(repo, "new")
+    objectPath = duck.getObjectPath(repo.getFileHash("new.txt", repo.head), repoPath)
+    assert events.index(dirname(objectPath)) < events.index(duck.JOURNAL_FILE_NAME)
+
+
+def test_gc_runs_repeatedly_in_one_process(repoPath):
+    repo = duck.openRepository(repoPath)
+    # a new file has an object of its own, the rollback makes it garbage
+    duck.commitTree(repo, "new", {"new.txt": "new\n"})
+    duck.collectGarbage(repo)
+    duck.rollbackTree(repo, duck.INIT)
+    # nothing in between reopens the packs
+    for _ in range(3):
+        duck.collectGarbage(repo)
+        assert len(duck.listPackNames(repoPath)) == 1
+    assert duck.readFile(repo, "b.txt", duck.INIT) == b"alpha\nbeta\n"
+    assert not exists(join(repoPath, "new.txt"))
+    assert duck.checkRepository(repo)["problems"] == []
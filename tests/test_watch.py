@@ -0,0 +1,74 @@
+from os import walk
+from os.path import join
+from subprocess import Popen, PIPE
+from time import sleep, monotonic
+import sys
+
+import pytest
+
+from conftest import DUCK, duck, runDuck, writeFiles
+
+
+def waitFor(condition, timeout: float = 10) -> None:
+    deadline = monotonic() + timeout
+    while not condition():
+        if monotonic() > deadline:
+            raise TimeoutError
+        sleep(0.05)
+
+
+@pytest.fixture
+def watchedRepoPath(repoPath):
+    """
+    Path of the repository `repoPath` watched by a polling `duck watch`
+    """
+
+    daemon = Popen(
+        [sys.executable, DUCK, "watch", "--poll", "--interval", "0.05"]
+        + ["--path", repoPath, "--jobs", "1"],
+        stdout=PIPE,
+        stderr=PIPE,
+        text=True,
+    )
+    waitFor(lambda: duck.queryDaemon({duck.COMMAND: "status"}, repoPath) is not None)
+    yield repoPath
+    daemon.terminate()
+    stdout, stderr = daemon.communicate(timeout=10)
+    assert daemon.returncode == 0, stdout + stderr
+
+
+def daemonStatus(path: str) -> dict:
+    return duck.queryDaemon({duck.COMMAND: "status"}, path)[duck.CHANGES_BY_FILE]
+
+
+def diffAdded(path: str, filename: str) -> list:
+    response = duck.queryDaemon({duck.COMMAND: "diff", duck.FILENAME: filename}, path)
+    return list(response[duck.CHANGE_LOG][duck.ADD].values())
+
+
+def test_status_follows_the_tree(watchedRepoPath):
+    writeFiles(watchedRepoPath, {"a.txt": "one\n2\nthree\n", "new.txt": "new\n"})
+    waitFor(lambda: daemonStatus(watchedRepoPath) == {"a.txt": "M", "new.txt": "A"})
+    assert runDuck(watchedRepoPath, "status").stdout == "A\tnew.txt\nM\ta.txt\n"
+
+
+def test_gc_while_watching(watchedRepoPath):
+    assert runDuck(watchedRepoPath, "gc").returncode == 0
+    # the daemon opens the pack to read the stored version of b.txt
+    assert diffAdded(watchedRepoPath, "b.txt") == []
+    writeFiles(watchedRepoPath, {"d.txt": "delta\n"})
+    assert runDuck(watchedRepoPath, "commit", "add d.txt").returncode == 0
+
+    # d.txt moves from a loose object into a new pack replacing the old one
+    assert runDuck(watchedRepoPath, "gc").returncode == 0
+    assert list(walk(join(watchedRepoPath, ".duck", "objects")))[1:] == []
+    writeFiles(watchedRepoPath, {"d.txt": "delta\nepsilon\n"})
+    waitFor(lambda: daemonStatus(watchedRepoPath) == {"d.txt": "M"})
+    assert diffAdded(watchedRepoPath, "d.txt") == ["epsilon\n"]
+
+
+def test_a_second_watch_is_refused(watchedRepoPath):
+    result = runDuck(watchedRepoPath, "watch", "--poll")
+    assert result.returncode == 1
+    assert result.stdout == "[ERROR]\tAlready watched by another `duck watch`\n"
+    assert daemonStatus(watchedRepoPath) == dict()